@@ -0,0 +1,174 @@
+"""扫描 / 排序 / 重命名 / 保存各阶段的基准测试
+
+用法：
+    python -m benchmarks.run_benchmarks --sizes 1000 10000 --output results.json
+    python -m benchmarks.run_benchmarks --sizes 10000 --compare results.json --fail-on-regression
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from benchmarks.synthetic_drive import generate_drive
+from src.core.copy_engine import CopyEngine, CopyTask
+from src.core.file_manager import FileManager
+from src.core.naming import parse_name, parse_names
+from src.core.rename_planner import apply_steps, plan_renames
+from src.core.scanner import iter_media_files
+from src.core.sort_engine import SortKeys
+
+
+def _timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    value = func(*args, **kwargs)
+    return time.perf_counter() - start, value
+
+
+def bench_size(work_dir, file_count, args):
+    """对一个规模的模拟U盘跑完整流程，返回 {阶段: 秒}"""
+    drive = os.path.join(work_dir, f"drive_{file_count}")
+    results = {}
+    results["generate"], media = _timed(
+        generate_drive, drive, file_count, depth=args.depth, fanout=args.fanout,
+        min_size=args.min_size, max_size=args.max_size,
+        sparse_large_count=args.sparse_large, sparse_large_size=args.sparse_size)
+
+    results["scan"], entries = _timed(lambda: list(iter_media_files(drive)))
+
+    names = [entry.name for entry in entries]
+    parse_name.cache_clear()
+    results["parse_cold"], _ = _timed(parse_names, names)
+    results["parse_warm"], _ = _timed(parse_names, names)
+
+    manager = FileManager()
+    results["sort_by_prefix"], ordered = _timed(manager.sort_by_prefix, entries)
+    results["plan_names"], _ = _timed(manager.plan_names, ordered)
+    # 各字段的名次只计算一次，之后换用其他字段组合重新排序
+    keys = SortKeys.from_entries(entries)
+    results["sort_keys"], _ = _timed(keys.prepare, "folder,prefix,name,size,mtime")
+    results["sort_resort"], _ = _timed(keys.sort, range(len(entries)), "-mtime,name")
+
+    mapping = manager.rename_mapping(ordered)
+    results["rename_plan"], steps = _timed(plan_renames, mapping)
+    results["rename_apply"], _ = _timed(apply_steps, steps)
+    # 再改回原来的文件名
+    results["rename_revert_plan"], revert = _timed(plan_renames, [(dst, src) for src, dst in mapping])
+    apply_steps(revert)
+
+    if not args.skip_copy:
+        backup_dir = os.path.join(work_dir, f"backup_{file_count}")
+        target_dir = os.path.join(work_dir, f"target_{file_count}")
+        os.makedirs(backup_dir)
+        os.makedirs(target_dir)
+        engine = CopyEngine(read_workers=args.read_workers, buffer_size=args.buffer_mb * 1024 * 1024)
+        new_names = manager.plan_names(ordered)
+        backup_tasks = [CopyTask(entry.path, os.path.join(backup_dir, name), entry.size)
+                        for entry, name in zip(ordered, new_names)]
+        report = engine.copy(backup_tasks, "backup")
+        results["save_backup"] = report.elapsed
+        results["save_backup_mb_per_s"] = report.mb_per_s
+        copy_tasks = [CopyTask(task.dst, os.path.join(target_dir, os.path.basename(task.dst)), task.size)
+                      for task in backup_tasks]
+        report = engine.copy(copy_tasks, "copy_back")
+        results["save_copy_back"] = report.elapsed
+        results["save_copy_back_mb_per_s"] = report.mb_per_s
+
+    results["files"] = len(entries)
+    shutil.rmtree(drive, ignore_errors=True)
+    return results
+
+
+def compare(current, previous, threshold):
+    """对比两次结果，返回回退的 (规模, 阶段, 之前, 现在) 列表"""
+    regressions = []
+    for size, stages in current["results"].items():
+        old_stages = previous.get("results", {}).get(size)
+        if not old_stages:
+            continue
+        for stage, value in stages.items():
+            old = old_stages.get(stage)
+            if old is None or stage in ("files", "generate") or not old:
+                continue
+            higher_is_better = stage.endswith("_per_s")
+            ratio = value / old
+            worse = ratio < 1 - threshold if higher_is_better else ratio > 1 + threshold
+            # 太短的阶段受计时噪声影响大，忽略 1ms 以内的差异
+            if worse and (higher_is_better or abs(value - old) > 0.001):
+                regressions.append((size, stage, old, value))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.run_benchmarks")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000],
+                        help="模拟U盘的文件数量（可指定多个，例如 1000 10000 100000）")
+    parser.add_argument("--depth", type=int, default=2, help="嵌套目录层数")
+    parser.add_argument("--fanout", type=int, default=4, help="每层子目录数")
+    parser.add_argument("--min-size", type=int, default=0, help="普通文件最小字节数")
+    parser.add_argument("--max-size", type=int, default=4096, help="普通文件最大字节数")
+    parser.add_argument("--sparse-large", type=int, default=0, help="稀疏大文件数量")
+    parser.add_argument("--sparse-size", type=int, default=256 * 1024 * 1024, help="稀疏大文件字节数")
+    parser.add_argument("--read-workers", type=int, default=4, help="复制引擎读线程数")
+    parser.add_argument("--buffer-mb", type=int, default=8, help="复制引擎缓冲区大小（MB）")
+    parser.add_argument("--skip-copy", action="store_true", help="跳过保存（备份 + 复制回）阶段")
+    parser.add_argument("--work-dir", help="生成模拟U盘的目录（默认系统临时目录）")
+    parser.add_argument("--output", help="把结果写入 JSON 文件")
+    parser.add_argument("--compare", metavar="JSON", help="与之前保存的结果对比")
+    parser.add_argument("--threshold", type=float, default=0.2, help="判定为回退的变化比例（默认 20%%）")
+    parser.add_argument("--fail-on-regression", action="store_true", help="发现回退时以非零状态退出")
+    args = parser.parse_args(argv)
+
+    work_dir = tempfile.mkdtemp(prefix="udisk_bench_", dir=args.work_dir)
+    try:
+        output = {
+            "meta": {
+                "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "args": vars(args),
+            },
+            "results": {},
+        }
+        for size in args.sizes:
+            print(f"== {size} 个文件 ==", flush=True)
+            stages = bench_size(work_dir, size, args)
+            output["results"][str(size)] = stages
+            for stage, value in stages.items():
+                unit = "" if stage == "files" else (" MB/s" if stage.endswith("_per_s") else " s")
+                print(f"  {stage:<24}{value:.4f}{unit}" if unit else f"  {stage:<24}{value}")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(output, f, ensure_ascii=False, indent=2)
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            previous = json.load(f)
+        shape_keys = ("depth", "fanout", "min_size", "max_size", "sparse_large", "sparse_size",
+                      "read_workers", "buffer_mb")
+        old_args = previous.get("meta", {}).get("args", {})
+        changed = [key for key in shape_keys if key in old_args and old_args[key] != getattr(args, key)]
+        if changed:
+            print("注意：两次运行的参数不同（" + "、".join(changed) + "），结果可能不可比")
+        regressions = compare(output, previous, args.threshold)
+        for size, stage, old, new in regressions:
+            print(f"回退：{size} 个文件 {stage}: {old:.4f} -> {new:.4f}")
+        if not regressions:
+            print("没有发现性能回退")
+        if regressions and args.fail_on_regression:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
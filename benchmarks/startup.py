@@ -0,0 +1,166 @@
+"""冷启动基准测试：从启动进程到窗口可以操作、到后台初始化完成的耗时
+
+每次运行都启动一个新的 Python 进程（包括解释器启动和模块导入），使用 fake 设备后端
+把生成的模拟U盘目录当作唯一的U盘。记录的时间点（秒，从启动进程算起）：
+
+- first_paint：窗口第一次绘制
+- interactive：第一次绘制之后主线程第一次空闲（可以响应输入）
+- finished：MainWindow.startup_finished，即U盘检测、备份列表和首次扫描全部完成
+- max_stall：从窗口显示到 finished 之间主线程最长一次没有响应的时间
+
+用法：
+    python -m benchmarks.startup --files 5000 --runs 5
+    python -m benchmarks.startup --files 5000 --target 1.5 --fail-over-target
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+HEARTBEAT_MS = 10  # 检测主线程卡顿的计时器间隔
+METRICS = ("first_paint", "interactive", "finished", "max_stall")
+
+
+def child(backup_dir, spawned_at, timeout):
+    """在子进程中启动主窗口，把各时间点以一行 JSON 输出到标准输出"""
+    from PyQt6.QtCore import QEvent, QObject, QTimer
+    from PyQt6.QtWidgets import QApplication
+    from src.ui.main_window import MainWindow
+
+    marks = {"imported": time.time()}
+    app = QApplication(sys.argv[:1])
+    window = MainWindow()
+    window.backup_dir = backup_dir
+    window.backup_dir_label.setText(backup_dir)
+    marks["constructed"] = time.time()
+
+    class PaintWatcher(QObject):
+        def eventFilter(self, obj, event):
+            if event.type() == QEvent.Type.Paint and "first_paint" not in marks:
+                marks["first_paint"] = time.time()
+                QTimer.singleShot(0, lambda: marks.setdefault("interactive", time.time()))
+            return False
+
+    stall = {"max": 0.0, "last": None}
+
+    def beat():
+        now = time.time()
+        if stall["last"] is not None:
+            stall["max"] = max(stall["max"], now - stall["last"])
+        stall["last"] = now
+
+    def finish():
+        # 先停止心跳再退出：关闭窗口时等待后台线程结束不属于启动过程
+        heartbeat.stop()
+        marks["finished"] = time.time()
+        marks["files"] = window.file_model.rowCount()
+        marks["max_stall"] = max(stall["max"] - HEARTBEAT_MS / 1000, 0.0)
+        app.quit()
+
+    watcher = PaintWatcher()
+    app.installEventFilter(watcher)
+    heartbeat = QTimer()
+    heartbeat.setInterval(HEARTBEAT_MS)
+    heartbeat.timeout.connect(beat)
+    window.startup_finished.connect(finish)
+    QTimer.singleShot(int(timeout * 1000), app.quit)
+
+    window.show()
+    heartbeat.start()
+    app.exec()
+    window.close()
+
+    result = {name: value - spawned_at for name, value in marks.items() if name not in ("files", "max_stall")}
+    result["max_stall"] = marks.get("max_stall", max(stall["max"] - HEARTBEAT_MS / 1000, 0.0))
+    result["files"] = marks.get("files")
+    print(json.dumps(result))
+    return 0 if "finished" in marks else 1
+
+
+def run_once(args, drive, backup_dir):
+    env = dict(os.environ, UDISK_DRIVE_BACKEND="fake", UDISK_FAKE_DRIVES=drive)
+    if args.platform:
+        env["QT_QPA_PLATFORM"] = args.platform
+    spawned_at = time.time()
+    proc = subprocess.run([sys.executable, "-m", "benchmarks.startup", "--child", backup_dir,
+                           "--spawned-at", repr(spawned_at), "--timeout", str(args.timeout)],
+                          cwd=PROJECT_ROOT, env=env, capture_output=True, text=True)
+    lines = proc.stdout.strip().splitlines()
+    if proc.returncode != 0 or not lines:
+        raise RuntimeError(f"启动失败或超时（{args.timeout} 秒）：{proc.stderr.strip()[-500:]}")
+    return json.loads(lines[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.startup")
+    parser.add_argument("--files", type=int, default=5000, help="模拟U盘的文件数量")
+    parser.add_argument("--depth", type=int, default=2, help="嵌套目录层数")
+    parser.add_argument("--fanout", type=int, default=4, help="每层子目录数")
+    parser.add_argument("--runs", type=int, default=5, help="启动次数，结果取中位数")
+    parser.add_argument("--target", type=float, default=1.5, help="interactive 的目标秒数")
+    parser.add_argument("--fail-over-target", action="store_true", help="中位数超过目标时以非零状态退出")
+    parser.add_argument("--timeout", type=float, default=60.0, help="单次启动的最长等待秒数")
+    parser.add_argument("--platform", default="offscreen",
+                        help="QT_QPA_PLATFORM（默认 offscreen，传空字符串显示真实窗口）")
+    parser.add_argument("--work-dir", help="生成模拟U盘的目录（默认系统临时目录）")
+    parser.add_argument("--output", help="把结果写入 JSON 文件")
+    parser.add_argument("--child", metavar="BACKUP_DIR", help=argparse.SUPPRESS)
+    parser.add_argument("--spawned-at", type=float, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        return child(args.child, args.spawned_at, args.timeout)
+
+    from benchmarks.synthetic_drive import generate_drive
+
+    work_dir = tempfile.mkdtemp(prefix="udisk_startup_", dir=args.work_dir)
+    try:
+        drive = os.path.join(work_dir, "drive")
+        backup_dir = os.path.join(work_dir, "backup")
+        os.makedirs(backup_dir)
+        generate_drive(drive, args.files, depth=args.depth, fanout=args.fanout)
+        # 第一次运行时扫描索引为空，之后的运行使用已有的索引（与日常使用相同）
+        runs = []
+        for run in range(args.runs):
+            result = run_once(args, drive, backup_dir)
+            runs.append(result)
+            print(f"  第 {run + 1} 次：" + "  ".join(f"{name} {result[name]:.3f}s" for name in METRICS),
+                  flush=True)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    median = {name: statistics.median(result[name] for result in runs) for name in METRICS}
+    print("中位数：" + "  ".join(f"{name} {value:.3f}s" for name, value in median.items()))
+    over = median["interactive"] > args.target
+    print(f"interactive {median['interactive']:.3f}s {'超过' if over else '未超过'}目标 {args.target:.3f}s")
+
+    if args.output:
+        output = {
+            "meta": {
+                "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "args": {key: value for key, value in vars(args).items()
+                         if key not in ("child", "spawned_at")},
+            },
+            "runs": runs,
+            "median": median,
+        }
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(output, f, ensure_ascii=False, indent=2)
+
+    return 1 if over and args.fail_over_target else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,81 @@
+"""生成用于基准测试的模拟U盘目录树"""
+import os
+import random
+from typing import List
+
+from src.core.scanner import MEDIA_EXTENSIONS
+
+_WORDS = ["爱", "夜曲", "晴天", "稻香", "Love", "Song", "Road", "Summer", "Rain", "Live",
+          "Remix", "青花瓷", "告白气球", "Mix", "Night", "Dream", "Blue", "月亮", "Hello", "Star"]
+
+
+def _random_title(rng: random.Random) -> str:
+    return " ".join(rng.choice(_WORDS) for _ in range(rng.randint(1, 3)))
+
+
+def _file_name(rng: random.Random, index: int, prefixed_ratio: float) -> str:
+    ext = rng.choice(MEDIA_EXTENSIONS[:5])  # 以音频格式为主
+    title = f"{_random_title(rng)} {index}"
+    roll = rng.random()
+    if roll < prefixed_ratio:
+        # 前缀格式混合："012. " / "12-" / "12 "
+        number = rng.randint(1, 999)
+        style = rng.choice(("{:03d}. ", "{}-", "{} "))
+        return style.format(number) + title + ext
+    return title + ext
+
+
+def generate_drive(root: str, file_count: int, depth: int = 2, fanout: int = 4,
+                   prefixed_ratio: float = 0.7, min_size: int = 0, max_size: int = 4096,
+                   sparse_large_count: int = 0, sparse_large_size: int = 256 * 1024 * 1024,
+                   non_media_ratio: float = 0.05, seed: int = 1) -> List[str]:
+    """在 root 下生成 file_count 个媒体文件，返回生成的媒体文件路径
+
+    - depth/fanout 控制嵌套目录的层数和每层子目录数，文件随机分布在各层目录中；
+    - prefixed_ratio 为带数字前缀的文件比例，其余是没有前缀的名称；
+    - 普通文件大小在 [min_size, max_size] 之间（内容为随机字节的重复）；
+    - sparse_large_count 个文件会被扩展为 sparse_large_size 大小的稀疏文件，
+      用于测试大文件复制而不占用实际磁盘空间；
+    - non_media_ratio 比例的额外非媒体文件用于检验扫描过滤。
+    """
+    rng = random.Random(seed)
+    os.makedirs(root, exist_ok=True)
+
+    directories = [root]
+    frontier = [root]
+    for level in range(depth):
+        next_frontier = []
+        for parent in frontier:
+            for i in range(fanout):
+                path = os.path.join(parent, f"folder_{level}_{i}")
+                os.makedirs(path, exist_ok=True)
+                next_frontier.append(path)
+        directories.extend(next_frontier)
+        frontier = next_frontier
+
+    pattern = bytes(rng.getrandbits(8) for _ in range(4096))
+    media = []
+    used = set()
+    for index in range(file_count):
+        directory = rng.choice(directories)
+        name = _file_name(rng, index, prefixed_ratio)
+        path = os.path.join(directory, name)
+        if path in used:
+            continue
+        used.add(path)
+        size = rng.randint(min_size, max_size) if max_size > 0 else 0
+        with open(path, "wb") as f:
+            if size:
+                repeats, remainder = divmod(size, len(pattern))
+                f.write(pattern * repeats + pattern[:remainder])
+        media.append(path)
+
+    for path in rng.sample(media, min(sparse_large_count, len(media))):
+        with open(path, "r+b") as f:
+            f.truncate(sparse_large_size)
+
+    for index in range(int(file_count * non_media_ratio)):
+        with open(os.path.join(rng.choice(directories), f"notes_{index}.txt"), "w") as f:
+            f.write("not media")
+    return media
+
@@ -0,0 +1,221 @@
+"""命令行入口：不启动界面，直接对U盘或普通目录排序、重命名、同步
+
+用法示例：
+    python -m src.cli E:\\ --order prefix --mode rename --dry-run
+    python -m src.cli /mnt/usb --order-file order.txt --mode sync --json
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from src.core.capacity import plan_capacity, probe_volume
+from src.core.copy_engine import CopyEngine
+from src.core.file_manager import FileManager
+from src.core.instrumentation import tracer
+from src.core.metadata import SORT_KEYS
+from src.core.scan_index import default_index_path
+from src.core.sort_engine import parse_spec
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m src.cli",
+                                     description="U盘音乐文件排序工具（命令行版）")
+    parser.add_argument("drive", help="U盘根目录（或用于测试的普通目录）")
+    order = parser.add_mutually_exclusive_group()
+    order.add_argument("--order", choices=("prefix", "keep") + tuple(SORT_KEYS), default="prefix",
+                       help="排序方式：prefix=按文件名序号，keep=保持目录项顺序，"
+                            "album/artist/title/track/duration=按音频标签（默认 prefix）")
+    order.add_argument("--sort-by", metavar="FIELDS",
+                       help="按字段组合排序，例如 folder,prefix,name 或 -mtime,name"
+                            "（字段：folder/prefix/name/size/mtime，文件名按自然顺序、中文按拼音，前加 - 为降序）")
+    order.add_argument("--order-file", metavar="FILE",
+                       help="按文件中列出的文件名顺序排序（每行一个文件名或路径）")
+    parser.add_argument("--mode", choices=("list", "rename", "sync", "stage", "backup", "reorder", "image"),
+                        default="list",
+                        help="list=只输出顺序，rename=按行号原地重命名，"
+                             "sync=增量同步到根目录，stage=在U盘内经暂存目录按顺序移回根目录，"
+                             "backup=按新文件名备份，"
+                             "reorder=直接重写 FAT/exFAT 目录表中的顺序，"
+                             "image=按顺序生成 FAT32 镜像文件（默认 list）")
+    parser.add_argument("--source", metavar="DIR",
+                        help="sync 模式下的内容来源目录（默认就是U盘本身）")
+    parser.add_argument("--backup-dir", metavar="DIR", help="backup 模式的目标目录")
+    parser.add_argument("--volume", metavar="IMAGE",
+                        help="reorder 模式下卷的镜像文件或设备路径（drive 为其挂载点）；"
+                             "Windows 上省略时直接锁定 drive 所在的卷。image 模式下为输出的镜像文件")
+    parser.add_argument("--image-size", type=int, metavar="MB", help="image 模式下镜像（卷）的大小，单位 MB")
+    parser.add_argument("--cluster-size", type=int, default=32768,
+                        help="image 模式下的簇大小（字节，默认 32768）")
+    parser.add_argument("--no-verify", action="store_true", help="image 模式下写入后不回读校验")
+    parser.add_argument("--verify-copy", action="store_true",
+                        help="复制文件后回读校验，不一致时自动重新复制")
+    parser.add_argument("--hash", action="store_true", help="sync 时同时比较首尾快速哈希")
+    parser.add_argument("--index", action="store_true",
+                        help="使用持久化索引缓存读取的标签（索引保存在 --backup-dir 或用户目录中）")
+    parser.add_argument("--volume-key", help="使用索引时的卷标识（默认取目录的绝对路径）")
+    parser.add_argument("--dry-run", action="store_true", help="只输出计划，不修改任何文件")
+    parser.add_argument("--json", action="store_true", help="以 JSON 格式输出结果和各阶段耗时")
+    parser.add_argument("--trace", metavar="FILE",
+                        help="把各阶段和逐文件耗时导出为 Chrome Trace 文件（chrome://tracing 可打开）")
+    return parser
+
+
+def check_capacity(result, args, path, items, reclaim=()):
+    """写入前检查 path 所在卷放得下 items；放不下时（非 dry-run）直接退出，不修改任何文件"""
+    plan = plan_capacity(items, probe_volume(path), reclaim)
+    result["capacity"] = {"need_bytes": plan.need.total, "available_bytes": plan.available,
+                          "cluster_size": plan.target.cluster_size, "problems": plan.problems}
+    if plan.problems and not args.dry_run:
+        raise SystemExit("\n".join(plan.problems) + "\n没有修改任何文件")
+
+
+def run(args):
+    timings = {}
+    result = {"drive": args.drive, "mode": args.mode, "dry_run": args.dry_run}
+
+    def timed(stage, func, *func_args, **func_kwargs):
+        start = time.perf_counter()
+        value = func(*func_args, **func_kwargs)
+        timings[stage] = time.perf_counter() - start
+        return value
+
+    index_path = default_index_path(args.backup_dir) if args.index else None
+    manager = FileManager(engine=CopyEngine(verify=args.verify_copy), index_path=index_path)
+    volume_key = args.volume_key or os.path.abspath(args.drive)
+
+    source = args.source if args.mode == "sync" and args.source else args.drive
+    entries = timed("scan", manager.scan, source)
+    scanned = entries
+    result["files"] = len(entries)
+
+    if args.order_file:
+        names = manager.read_order_file(args.order_file)
+        entries, missing = timed("sort", manager.order_by_list, entries, names)
+        result["missing"] = missing
+    elif args.sort_by:
+        entries = timed("sort", manager.sort_by_fields, entries, args.sort_by)
+    elif args.order == "prefix":
+        entries = timed("sort", manager.sort_by_prefix, entries)
+    elif args.order in SORT_KEYS:
+        entries = timed("sort", manager.sort_by_tags, entries, args.order, source,
+                        volume_key if source == args.drive else None)
+
+    new_names = timed("plan_names", manager.plan_names, entries)
+    result["order"] = [{"path": entry.path, "target": name} for entry, name in zip(entries, new_names)]
+    items = [(name, entry.size) for entry, name in zip(entries, new_names)]
+
+    if args.mode == "rename":
+        steps = timed("plan", manager.plan_rename, entries)
+        result["steps"] = [list(step) for step in steps]
+        if not args.dry_run:
+            timed("apply", manager.rename, args.drive, entries)
+    elif args.mode == "sync":
+        if source != args.drive:
+            existing = timed("scan_target", manager.scan, args.drive)
+        else:
+            existing = scanned
+        timed("capacity", check_capacity, result, args, args.drive, items, [entry.size for entry in existing])
+        plan = timed("plan", manager.plan_sync, args.drive, entries, existing, args.hash)
+        result["plan"] = {
+            "unchanged": len(plan.unchanged),
+            "renames": [list(pair) for pair in plan.renames],
+            "copies": [{"src": task.src, "dst": task.dst, "size": task.size} for task in plan.copies],
+            "deletes": plan.deletes,
+            "copy_bytes": plan.copy_bytes,
+        }
+        if not args.dry_run:
+            report = timed("apply", manager.sync, plan, args.drive)
+            result["copy"] = report.to_dict()
+    elif args.mode == "stage":
+        timed("capacity", check_capacity, result, args, args.drive, items, [entry.size for entry in scanned])
+        plan = timed("plan", manager.plan_staging, args.drive, entries)
+        result["plan"] = {
+            "moves": len(plan.moves),
+            "copies": plan.copy_count,
+            "copy_bytes": plan.copy_bytes,
+        }
+        if not args.dry_run:
+            report = timed("apply", manager.stage, plan, args.drive)
+            result["copy"] = report.to_dict()
+    elif args.mode == "backup":
+        if not args.backup_dir:
+            raise SystemExit("backup 模式需要指定 --backup-dir")
+        if os.path.isdir(args.backup_dir):
+            timed("capacity", check_capacity, result, args, args.backup_dir, items)
+        if not args.dry_run:
+            report = timed("apply", manager.backup, entries, args.backup_dir)
+            result["copy"] = report.to_dict()
+    elif args.mode == "reorder":
+        if not args.dry_run:
+            missing = timed("apply", manager.reorder_in_place, args.drive, entries,
+                            args.volume, args.backup_dir)
+            result.setdefault("missing", []).extend(missing)
+    elif args.mode == "image":
+        if not args.volume or not args.image_size:
+            raise SystemExit("image 模式需要指定 --volume 和 --image-size")
+        if not args.dry_run:
+            builder = timed("apply", manager.write_image, entries, args.volume,
+                            args.image_size * 1024 * 1024, args.cluster_size, verify=not args.no_verify)
+            result["image"] = {"path": args.volume, "written_bytes": builder.image_size,
+                               "clusters": builder.cluster_count}
+
+    result["timings"] = timings
+    return result
+
+
+def print_text(result):
+    for item in result["order"]:
+        print(f"{item['target']}\t<- {item['path']}")
+    if "steps" in result:
+        print(f"\n重命名步骤：{len(result['steps'])}")
+    if "plan" in result and "moves" in result["plan"]:
+        plan = result["plan"]
+        print(f"\n暂存重排：移动 {plan['moves']}，复制 {plan['copies']}（{plan['copy_bytes'] / (1024 * 1024):.1f}MB）")
+    elif "plan" in result:
+        plan = result["plan"]
+        print(f"\n同步计划：保持不变 {plan['unchanged']}，重命名 {len(plan['renames'])}，"
+              f"复制 {len(plan['copies'])}（{plan['copy_bytes'] / (1024 * 1024):.1f}MB），"
+              f"删除 {len(plan['deletes'])}")
+    for problem in result.get("capacity", {}).get("problems", ()):
+        print(f"警告：{problem}", file=sys.stderr)
+    for name in result.get("missing", ()):
+        print(f"警告：排序列表中的文件不存在：{name}", file=sys.stderr)
+    if "copy" in result:
+        print(f"复制速度：{result['copy']['mb_per_s']:.1f} MB/s")
+        if result["copy"]["verified"]:
+            print(f"回读校验：{result['copy']['verified']} 个文件，重新复制 {result['copy']['mismatches']} 次")
+    if result["dry_run"]:
+        print("（dry-run：没有修改任何文件）")
+    print("耗时：" + "，".join(f"{stage} {seconds * 1000:.1f}ms" for stage, seconds in result["timings"].items()))
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.sort_by:
+        try:
+            parse_spec(args.sort_by)
+        except ValueError as e:
+            parser.error(str(e))
+    if not os.path.isdir(args.drive):
+        print(f"目录不存在：{args.drive}", file=sys.stderr)
+        return 2
+    result = run(args)
+    if args.trace:
+        tracer.export_chrome_trace(args.trace)
+    if args.json:
+        json.dump(result, sys.stdout, ensure_ascii=False, indent=2)
+        sys.stdout.write("\n")
+    else:
+        print_text(result)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,57 @@
+"""备份目录的组织：每次备份放在以开始时间命名的会话子目录中（如 20240501-203015）
+
+备份目录根部的文件（旧版本直接放在根部的备份、目录表备份 *.fatdir.json 等）单独作为一组。
+以 . 开头的文件和目录（扫描索引数据库等）不算作备份。
+"""
+import os
+import time
+from typing import List, NamedTuple, Optional, Tuple
+
+SESSION_FORMAT = "%Y%m%d-%H%M%S"
+
+
+class BackupEntry(NamedTuple):
+    """备份目录中的一个文件"""
+    name: str
+    path: str
+    size: int
+    mtime: float
+
+
+def new_session_dir(backup_dir: str, when: Optional[float] = None) -> str:
+    """本次备份使用的会话目录路径（不创建目录），同一秒内的多次备份依次加后缀"""
+    base = os.path.join(backup_dir, time.strftime(SESSION_FORMAT, time.localtime(when)))
+    path = base
+    suffix = 2
+    while os.path.exists(path):
+        path = f"{base}-{suffix}"
+        suffix += 1
+    return path
+
+
+def is_hidden(name: str) -> bool:
+    return name.startswith(".")
+
+
+def scan_backup_dir(path: str) -> Tuple[List[str], List[BackupEntry]]:
+    """读取一层目录，返回 (子目录名, 文件)，均按名称排序
+
+    使用 os.scandir 自带的类型和 stat 信息（Windows 上无需逐个文件额外调用）。
+    """
+    dirs = []
+    files = []
+    with os.scandir(path) as it:
+        for entry in it:
+            if is_hidden(entry.name):
+                continue
+            try:
+                if entry.is_dir():
+                    dirs.append(entry.name)
+                elif entry.is_file():
+                    st = entry.stat()
+                    files.append(BackupEntry(entry.name, entry.path, st.st_size, st.st_mtime))
+            except OSError:
+                continue
+    dirs.sort()
+    files.sort()
+    return dirs, files
@@ -0,0 +1,194 @@
+"""容量规划：在读写任何文件之前确认按顺序写入的文件放得下，放不下时按顺序分到几个U盘
+
+文件在卷上按簇分配，每个文件占用 ceil(大小 / 簇大小) 个簇，空文件不占簇。文件名还要占用目录项
+（每项 32 字节）：FAT 为 1 个短文件名项 + 每 13 个 UTF-16 字符 1 个长文件名项，
+exFAT 为文件项 + 流扩展项 + 每 15 个字符 1 个文件名项。写入U盘的文件都放在根目录中：
+FAT32 和 exFAT 的根目录同样按簇分配；FAT16 的根目录大小固定（512 项），文件多时会先于容量用完。
+其他文件系统（NTFS 等）按每个文件 1KB 的文件记录估算。
+
+写入前会删除的原有文件所占的簇计为可用空间（它们的目录项留作删除标记，不计入）。
+"""
+import os
+import shutil
+from typing import Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from src.core.instrumentation import tracer
+from src.core.usb_handler import USBHandler
+
+DIR_ENTRY_SIZE = 32
+DEFAULT_CLUSTER_SIZE = 4096          # 无法读取簇大小时使用
+FAT16_ROOT_ENTRIES = 512
+FAT_MAX_FILE_SIZE = 0xFFFFFFFF       # FAT16/FAT32 单个文件不能超过 4GB
+RECORD_SIZE = 1024                   # NTFS 等文件系统每个文件的文件记录
+
+_FAT = ("FAT", "FAT12", "FAT16", "FAT32")
+_FIXED_ROOT = ("FAT", "FAT12", "FAT16")
+
+
+def _mb(size: int) -> str:
+    return f"{size / (1024 * 1024):.1f}MB"
+
+
+class Volume(NamedTuple):
+    """写入目标所在的卷"""
+    path: str
+    cluster_size: int
+    free_space: int
+    filesystem: str = ""   # "FAT32"、"exFAT"、"NTFS" 等，未知时为空
+
+
+def probe_volume(path: str, filesystem: str = "") -> Volume:
+    """读取 path 所在卷的簇大小和可用空间"""
+    info = USBHandler.get_drive_info(os.path.join(path, ""))
+    cluster_size = info.get("cluster_size") or DEFAULT_CLUSTER_SIZE
+    return Volume(path, cluster_size, shutil.disk_usage(path).free, filesystem)
+
+
+def name_entries(name: str, filesystem: str) -> int:
+    """一个文件名占用的目录项数，不使用目录项的文件系统返回 0"""
+    units = len(name.encode("utf-16-le")) // 2
+    fs = filesystem.upper()
+    if fs == "EXFAT":
+        return 2 + -(-units // 15)
+    if fs in _FAT:
+        return 1 + -(-units // 13)   # 与 fat_image 相同，总是写长文件名
+    return 0
+
+
+class Footprint(NamedTuple):
+    """一组文件写入同一目录后在卷上的占用"""
+    files: int
+    data_bytes: int          # 文件内容的字节数
+    cluster_bytes: int       # 文件内容按簇取整后的字节数
+    directory_entries: int
+    directory_bytes: int     # 目录项（或文件记录）占用的字节数，按簇取整
+    largest: int             # 最大的文件
+
+    @property
+    def total(self) -> int:
+        return self.cluster_bytes + self.directory_bytes
+
+
+def _directory_bytes(files: int, entries: int, cluster_size: int, filesystem: str) -> int:
+    fs = filesystem.upper()
+    if fs in _FIXED_ROOT:
+        return 0   # 根目录区在数据区之外，另见 FAT16_ROOT_ENTRIES
+    if fs in _FAT or fs == "EXFAT":
+        return -(-entries * DIR_ENTRY_SIZE // cluster_size) * cluster_size
+    return files * RECORD_SIZE
+
+
+def footprint(items: Iterable[Tuple[str, int]], cluster_size: int, filesystem: str = "") -> Footprint:
+    """[(文件名, 大小)] 全部写入同一目录后的占用"""
+    files = data = clusters = entries = largest = 0
+    for name, size in items:
+        files += 1
+        data += size
+        clusters += -(-size // cluster_size)
+        entries += name_entries(name, filesystem)
+        largest = max(largest, size)
+    return Footprint(files, data, clusters * cluster_size, entries,
+                     _directory_bytes(files, entries, cluster_size, filesystem), largest)
+
+
+class CapacityPlan:
+    """写入前的空间检查，problems 为空表示放得下"""
+
+    def __init__(self, target: Volume, need: Footprint, reclaimable: int):
+        self.target = target
+        self.need = need
+        self.reclaimable = reclaimable          # 写入前删除的原有文件释放的字节数
+        self.backup: Optional[Volume] = None
+        self.backup_need: Optional[Footprint] = None
+        self.problems: List[str] = []
+
+    @property
+    def ok(self) -> bool:
+        return not self.problems
+
+    @property
+    def available(self) -> int:
+        return self.target.free_space + self.reclaimable
+
+    def summary(self) -> str:
+        text = (f"{self.need.files} 个文件共 {_mb(self.need.data_bytes)}，"
+                f"在 {self.target.path} 上占用 {_mb(self.need.total)}（簇大小 {self.target.cluster_size} 字节），"
+                f"可用 {_mb(self.available)}")
+        if self.backup_need is not None:
+            text += f"；备份需要 {_mb(self.backup_need.total)}，备份目录可用 {_mb(self.backup.free_space)}"
+        return text
+
+
+def _volume_problems(volume: Volume, need: Footprint, available: int) -> List[str]:
+    fs = volume.filesystem.upper()
+    problems = []
+    if fs in _FAT and need.largest > FAT_MAX_FILE_SIZE:
+        problems.append(f"{volume.path} 为 {volume.filesystem}，不能存放超过 4GB 的文件")
+    if fs in _FIXED_ROOT and need.directory_entries > FAT16_ROOT_ENTRIES:
+        problems.append(f"{volume.path} 为 {volume.filesystem}，根目录最多 {FAT16_ROOT_ENTRIES} 个目录项，"
+                        f"这些文件需要 {need.directory_entries} 个")
+    if need.total > available:
+        problems.append(f"{volume.path} 空间不足：需要 {_mb(need.total)}，可用 {_mb(available)}")
+    return problems
+
+
+def plan_capacity(items: Sequence[Tuple[str, int]], target: Volume,
+                  reclaim: Iterable[int] = (), backup: Optional[Volume] = None) -> CapacityPlan:
+    """检查 [(最终文件名, 大小)] 能否写入 target，不读写任何文件
+
+    reclaim 为写入前会从 target 上删除的文件大小；提供 backup 时同时检查备份目录能否放下全部文件。
+    """
+    with tracer.span("capacity.plan", files=len(items)):
+        need = footprint(items, target.cluster_size, target.filesystem)
+        reclaimable = sum(-(-size // target.cluster_size) for size in reclaim) * target.cluster_size
+        plan = CapacityPlan(target, need, reclaimable)
+        plan.problems.extend(_volume_problems(target, need, plan.available))
+        if backup is not None:
+            plan.backup = backup
+            plan.backup_need = footprint(items, backup.cluster_size, backup.filesystem)
+            plan.problems.extend(_volume_problems(backup, plan.backup_need, backup.free_space))
+    return plan
+
+
+class SplitPlan(NamedTuple):
+    """按顺序分到几个卷：parts[i] 为写入 volumes[i] 的 [start, end) 范围"""
+    volumes: List[Volume]
+    parts: List[Tuple[int, int]]
+    remaining: int             # 所有卷都装满后还剩下的文件数
+
+    @property
+    def ok(self) -> bool:
+        return self.remaining == 0
+
+
+def split_across(items: Sequence[Tuple[str, int]], volumes: Sequence[Tuple[Volume, int]]) -> SplitPlan:
+    """把 [(最终文件名, 大小)] 按顺序切成连续的几段，依次装入各个卷
+
+    volumes 为 [(卷, 可用字节)]，可用字节通常是可用空间加上写入前删除的原有文件。
+    每个卷尽量装满再换下一个：文件保持原来的先后顺序，第一个卷放最前面的一段，以此类推。
+    用不到的卷得到空范围。单个文件比某个卷还大时，这个卷被跳过。
+    """
+    parts = []
+    start = 0
+    with tracer.span("capacity.split", files=len(items), volumes=len(volumes)):
+        for volume, available in volumes:
+            fs = volume.filesystem.upper()
+            cluster = volume.cluster_size
+            files = clusters = entries = 0
+            end = start
+            while end < len(items):
+                name, size = items[end]
+                if fs in _FAT and size > FAT_MAX_FILE_SIZE:
+                    break
+                item_entries = entries + name_entries(name, volume.filesystem)
+                if fs in _FIXED_ROOT and item_entries > FAT16_ROOT_ENTRIES:
+                    break
+                item_clusters = clusters + -(-size // cluster)
+                total = item_clusters * cluster + _directory_bytes(files + 1, item_entries, cluster, volume.filesystem)
+                if total > available:
+                    break
+                files, clusters, entries = files + 1, item_clusters, item_entries
+                end += 1
+            parts.append((start, end))
+            start = end
+    return SplitPlan(list(volume for volume, _ in volumes), parts, len(items) - start)
@@ -0,0 +1,762 @@
+import hashlib
+import os
+import queue
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from src.core.instrumentation import tracer
+
+DEFAULT_BUFFER_SIZE = 8 * 1024 * 1024      # 单次读写缓冲区大小
+DEFAULT_PREFETCH_BYTES = 128 * 1024 * 1024  # 预读到内存中的数据上限
+DEFAULT_READ_WORKERS = 4
+CHECKPOINT_BYTES = 64 * 1024 * 1024         # 可暂停/续传时，大文件每复制这么多数据检查一次
+VERIFY_RETRIES = 2                          # 回读校验不一致时重新复制的次数
+
+
+class CopyTask(NamedTuple):
+    """一个复制任务"""
+    src: str
+    dst: str
+    size: int
+    offset: int = 0  # 续传时已复制的字节数，从这里继续写入
+
+
+class VerifyError(IOError):
+    """回读校验不一致，重新复制后仍然不一致"""
+
+
+class TransferCancelled(Exception):
+    """复制被用户取消"""
+
+
+class TransferControl:
+    """复制过程的暂停、取消和进度检查点
+
+    写线程在每个文件开始前以及大文件每复制 CHECKPOINT_BYTES 后调用 checkpoint()：
+    暂停时在这里等待，取消时抛出 TransferCancelled。
+    on_file_done(task) / on_chunk_done(task, offset) 在写线程中调用，用于记录续传进度，
+    调用 on_chunk_done 之前已经把目标文件的数据刷到磁盘。
+    """
+
+    def __init__(self):
+        self._running = threading.Event()
+        self._running.set()
+        self._cancelled = threading.Event()
+        self.on_file_done: Optional[Callable[[CopyTask], None]] = None
+        self.on_chunk_done: Optional[Callable[[CopyTask, int], None]] = None
+
+    @property
+    def paused(self) -> bool:
+        return not self._running.is_set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def pause(self):
+        self._running.clear()
+
+    def resume(self):
+        self._running.set()
+
+    def cancel(self):
+        self._cancelled.set()
+        self._running.set()  # 唤醒暂停中的写线程
+
+    def checkpoint(self):
+        self._running.wait()
+        if self._cancelled.is_set():
+            raise TransferCancelled("已取消")
+
+
+class StageReport:
+    """一个复制阶段的统计结果"""
+
+    def __init__(self, stage: str):
+        self.stage = stage
+        self.files = 0
+        self.bytes = 0
+        self.elapsed = 0.0       # 阶段总耗时（墙钟时间）
+        self.read_seconds = 0.0  # 所有读线程累计读取耗时
+        self.write_seconds = 0.0  # 所有写线程累计写入耗时
+        self.verified = 0         # 回读校验通过的文件数
+        self.verify_seconds = 0.0  # 所有校验线程累计回读耗时
+        self.mismatches = 0       # 回读校验不一致（已重新复制）的次数
+
+    @staticmethod
+    def _rate(nbytes: int, seconds: float) -> float:
+        return nbytes / (1024 * 1024) / seconds if seconds > 0 else 0.0
+
+    @property
+    def mb_per_s(self) -> float:
+        return self._rate(self.bytes, self.elapsed)
+
+    @property
+    def read_mb_per_s(self) -> float:
+        return self._rate(self.bytes, self.read_seconds)
+
+    @property
+    def write_mb_per_s(self) -> float:
+        return self._rate(self.bytes, self.write_seconds)
+
+    def to_dict(self) -> dict:
+        return {
+            "stage": self.stage,
+            "files": self.files,
+            "bytes": self.bytes,
+            "elapsed": self.elapsed,
+            "mb_per_s": self.mb_per_s,
+            "read_mb_per_s": self.read_mb_per_s,
+            "write_mb_per_s": self.write_mb_per_s,
+            "verified": self.verified,
+            "verify_seconds": self.verify_seconds,
+            "mismatches": self.mismatches,
+        }
+
+
+class FanoutReport:
+    """一次多盘写入的结果：每个目标一份 StageReport，写入失败的目标记录错误信息"""
+
+    def __init__(self, stage: str, targets: Sequence[str]):
+        self.stage = stage
+        self.reports: Dict[str, StageReport] = {target: StageReport(stage) for target in targets}
+        self.errors: Dict[str, str] = {}
+        self.elapsed = 0.0
+        self.source_bytes = 0     # 从源文件读取的字节数（每个文件只读一次）
+        self.read_seconds = 0.0
+
+    @property
+    def succeeded(self) -> List[str]:
+        return [target for target in self.reports if target not in self.errors]
+
+    def to_dict(self) -> dict:
+        return {
+            "stage": self.stage,
+            "elapsed": self.elapsed,
+            "source_bytes": self.source_bytes,
+            "targets": {target: report.to_dict() for target, report in self.reports.items()},
+            "errors": dict(self.errors),
+        }
+
+
+class _FanoutBuffer:
+    """多盘写入的共享缓冲区：一个生产者，多个按相同顺序读取的消费者
+
+    每个数据项在所有消费者都读取后释放；缓冲的数据超过 limit 时生产者等待最慢的消费者。
+    """
+
+    def __init__(self, consumers: int, limit: int):
+        self._cond = threading.Condition()
+        self._items: Dict[int, list] = {}  # 序号 -> [数据项, 尚未读取的消费者数, 字节数]
+        self._head = 0
+        self._bytes = 0
+        self._limit = limit
+        self._consumers = consumers
+        self._closed = False
+        self.error: Optional[BaseException] = None
+
+    def put(self, item, nbytes: int) -> bool:
+        """放入数据项；所有消费者都已退出时返回 False"""
+        with self._cond:
+            while self._consumers and self._bytes and self._bytes + nbytes > self._limit:
+                self._cond.wait()
+            if not self._consumers:
+                return False
+            self._items[self._head] = [item, self._consumers, nbytes]
+            self._head += 1
+            self._bytes += nbytes
+            self._cond.notify_all()
+            return True
+
+    def get(self, seq: int):
+        """取第 seq 个数据项，生产者结束后返回 None"""
+        with self._cond:
+            while seq >= self._head and not self._closed:
+                self._cond.wait()
+            if seq >= self._head:
+                return None
+            return self._items[seq][0]
+
+    def _release(self, seq: int):
+        entry = self._items.get(seq)
+        if entry is None:
+            return
+        entry[1] -= 1
+        if entry[1] <= 0:
+            del self._items[seq]
+            self._bytes -= entry[2]
+
+    def done(self, seq: int):
+        with self._cond:
+            self._release(seq)
+            self._cond.notify_all()
+
+    def leave(self, seq: int):
+        """消费者提前退出：释放从 seq 开始它尚未读取的数据"""
+        with self._cond:
+            self._consumers -= 1
+            for pending in range(seq, self._head):
+                self._release(pending)
+            self._cond.notify_all()
+
+    def close(self, error: Optional[BaseException] = None):
+        with self._cond:
+            self._closed = True
+            self.error = error
+            self._cond.notify_all()
+
+
+def _new_digest():
+    return hashlib.blake2b(digest_size=16)
+
+
+def _read_back_digest(path: str, block_size: int) -> bytes:
+    """回读目标文件并计算哈希，尽量从设备而不是页缓存读取"""
+    with open(path, "rb", buffering=0) as f:
+        try:
+            os.fsync(f.fileno())  # 脏页不能丢弃，先写到设备上
+        except OSError:
+            pass  # Windows 上只读句柄不能刷新
+        fadvise = getattr(os, "posix_fadvise", None)
+        if fadvise is not None:
+            try:
+                fadvise(f.fileno(), 0, 0, os.POSIX_FADV_DONTNEED)
+            except (OSError, ValueError):
+                pass
+        digest = _new_digest()
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.digest()
+
+
+class _Verifier:
+    """每个写线程配一个回读校验线程：写线程写下一个文件的同时回读校验上一个文件"""
+
+    def __init__(self, stage: str, block_size: int, name: str):
+        self.stage = stage
+        self.block_size = block_size
+        self.verified = 0
+        self.seconds = 0.0
+        self.mismatches: List[CopyTask] = []
+        self._queue: "queue.Queue" = queue.Queue()
+        self._discard = False
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, task: CopyTask, digest: bytes):
+        self._queue.put((task, digest))
+
+    def check(self, task: CopyTask, digest: bytes) -> bool:
+        started = time.perf_counter()
+        try:
+            ok = _read_back_digest(task.dst, self.block_size) == digest
+        except OSError as e:
+            tracer.event(f"{self.stage}.verify_failed", path=task.dst, error=str(e))
+            ok = False
+        elapsed = time.perf_counter() - started
+        self.seconds += elapsed
+        tracer.file_op(f"{self.stage}.verify", task.dst, started, elapsed, task.size)
+        if ok:
+            self.verified += 1
+        else:
+            tracer.event(f"{self.stage}.mismatch", path=task.dst)
+        return ok
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            if not self._discard and not self.check(*item):
+                self.mismatches.append(item[0])
+
+    def finish(self, discard: bool = False) -> List[CopyTask]:
+        """等待队列中的文件校验完，返回不一致的任务；discard 为 True 时跳过尚未校验的文件"""
+        self._discard = discard
+        self._queue.put(None)
+        self._thread.join()
+        return self.mismatches
+
+
+def _device_of(path: str) -> int:
+    """返回目标路径所在设备号，用于给每个目标设备分配一个顺序写线程"""
+    directory = os.path.dirname(os.path.abspath(path))
+    while directory and not os.path.exists(directory):
+        parent = os.path.dirname(directory)
+        if parent == directory:
+            break
+        directory = parent
+    try:
+        return os.stat(directory).st_dev
+    except OSError:
+        return 0
+
+
+def _kernel_copy(fsrc, fdst, size: int, start: int = 0, step: Optional[int] = None,
+                 on_step: Optional[Callable[[int], None]] = None) -> bool:
+    """尝试在内核中完成复制（copy_file_range / sendfile），不支持时返回 False
+
+    两个文件都已定位到 start；给出 step 时每复制 step 字节调用一次 on_step(当前偏移)。
+    """
+    in_fd, out_fd = fsrc.fileno(), fdst.fileno()
+    for name in ("copy_file_range", "sendfile"):
+        func = getattr(os, name, None)
+        if func is None:
+            continue
+        copied = start
+        reported = start
+        try:
+            while copied < size:
+                count = size - copied
+                if step:
+                    count = min(count, reported + step - copied)
+                if name == "copy_file_range":
+                    sent = func(in_fd, out_fd, count)
+                else:
+                    sent = func(out_fd, in_fd, copied, count)
+                if sent == 0:
+                    break
+                copied += sent
+                if step and copied - reported >= step and copied < size:
+                    reported = copied
+                    on_step(copied)
+        except OSError:
+            if copied == start:
+                continue  # 该文件系统不支持，换下一种方式
+            raise
+        if copied > start:
+            if name == "sendfile":
+                fsrc.seek(copied)  # sendfile 带偏移量时不会移动源文件位置
+            # 文件在复制过程中变短时，剩余部分交给普通读写处理
+            return copied >= size
+    return False
+
+
+class CopyEngine:
+    """并行读取、按设备顺序写入的复制引擎
+
+    - 读线程池按任务顺序预读较小的文件，总预读量受 prefetch_bytes 限制；
+    - 每个目标设备只有一个写线程，按任务顺序依次写入，避免U盘上的随机写；
+    - 预读不到的大文件由写线程直接流式复制，优先使用 copy_file_range/sendfile，
+      否则使用 buffer_size 大小的缓冲区循环读写；
+    - verify 为 True 时在读取源文件的同时计算哈希（源文件不再额外读取），每个写线程配一个
+      校验线程，在写下一个文件的同时回读上一个文件比较哈希；不一致的文件在该设备的其余文件
+      写完后重新复制，最多 VERIFY_RETRIES 次。校验需要经过用户态的数据，此时不使用内核复制。
+    """
+
+    def __init__(self, read_workers: int = DEFAULT_READ_WORKERS,
+                 buffer_size: int = DEFAULT_BUFFER_SIZE,
+                 prefetch_bytes: int = DEFAULT_PREFETCH_BYTES,
+                 use_kernel_copy: bool = True, verify: bool = False):
+        self.read_workers = max(1, read_workers)
+        self.buffer_size = buffer_size
+        self.prefetch_bytes = prefetch_bytes
+        self.use_kernel_copy = use_kernel_copy
+        self.verify = verify
+        # 每个文件复制完成后调用 listener(阶段, CopyTask)，在写线程中执行
+        self.listeners: List[Callable[[str, CopyTask], None]] = []
+
+    @staticmethod
+    def make_tasks(pairs) -> List[CopyTask]:
+        """由 (源路径, 目标路径) 列表生成复制任务"""
+        return [CopyTask(src, dst, os.path.getsize(src)) for src, dst in pairs]
+
+    def copy(self, tasks: List[CopyTask], stage: str = "copy",
+             progress: Optional[Callable[[int, int, int, int, str], None]] = None,
+             control: Optional[TransferControl] = None) -> StageReport:
+        """执行复制任务
+
+        progress(已完成文件数, 总文件数, 已复制字节数, 总字节数, 当前文件名) 会在写线程中调用。
+        任意一个文件复制失败时停止其余任务并抛出该异常；通过 control 取消时抛出 TransferCancelled；
+        重新复制后回读校验仍不一致时抛出 VerifyError。
+        offset 不为 0 的任务从该位置续传，字节数只统计本次复制的部分。
+        """
+        report = StageReport(stage)
+        verify = self.verify  # 复制过程中修改 verify 只影响下一次复制
+        total_files = len(tasks)
+        total_bytes = sum(task.size - task.offset for task in tasks)
+        lock = threading.Lock()
+        stop = threading.Event()
+        errors = []
+        budget = threading.BoundedSemaphore(max(1, self.prefetch_bytes // self.buffer_size))
+        start = time.perf_counter()
+
+        def on_done(task: CopyTask, started: float, read_seconds: float, write_seconds: float):
+            tracer.file_op(f"{stage}.file", task.dst, started, time.perf_counter() - started, task.size)
+            if control is not None and control.on_file_done is not None:
+                control.on_file_done(task)
+            with lock:
+                report.files += 1
+                report.bytes += task.size - task.offset
+                report.read_seconds += read_seconds
+                report.write_seconds += write_seconds
+                done_files, done_bytes = report.files, report.bytes
+            if progress:
+                progress(done_files, total_files, done_bytes, total_bytes, os.path.basename(task.dst))
+            for listener in self.listeners:
+                listener(stage, task)
+
+        def on_verified(verifier: _Verifier, retried: int):
+            with lock:
+                report.verified += verifier.verified
+                report.verify_seconds += verifier.seconds
+                report.mismatches += retried
+
+        # 按目标设备分组，组内保持原有顺序
+        groups: Dict[int, List[CopyTask]] = {}
+        for task in tasks:
+            groups.setdefault(_device_of(task.dst), []).append(task)
+
+        with ThreadPoolExecutor(max_workers=self.read_workers,
+                                thread_name_prefix="copy-reader") as readers:
+            writers = [threading.Thread(target=self._writer_loop,
+                                        args=(group, readers, budget, stop, errors, on_done, control,
+                                              on_verified, stage, verify),
+                                        name=f"copy-writer-{dev}", daemon=True)
+                       for dev, group in groups.items()]
+            for writer in writers:
+                writer.start()
+            for writer in writers:
+                writer.join()
+
+        report.elapsed = time.perf_counter() - start
+        tracer.record(stage, start, report.elapsed, args=report.to_dict())
+        tracer.count(f"{stage}.files", report.files)
+        tracer.count(f"{stage}.bytes", report.bytes)
+        # 读、写累计耗时用于判断瓶颈在源盘还是目标盘
+        tracer.count(f"{stage}.read_seconds", report.read_seconds)
+        tracer.count(f"{stage}.write_seconds", report.write_seconds)
+        if verify:
+            tracer.count(f"{stage}.verified", report.verified)
+            tracer.count(f"{stage}.mismatches", report.mismatches)
+        if errors:
+            tracer.event(f"{stage}.failed", error=str(errors[0]))
+            raise errors[0]
+        return report
+
+    def fanout(self, sources: List[Tuple[str, str]], targets: List[str], stage: str = "fanout",
+               progress: Optional[Callable[[str, int, int, int, int], None]] = None,
+               prepare: Optional[Callable[[str], None]] = None,
+               control: Optional[TransferControl] = None) -> FanoutReport:
+        """把 [(源路径, 目标文件名)] 按顺序写入多个目标目录，每个源文件只读取一次
+
+        一个读线程按顺序读取数据块放入共享缓冲区，每个目标一个写线程按顺序写入，
+        缓冲区中最多保留约 prefetch_bytes 的数据：最慢的目标落后太多时读线程等它追上，
+        其他目标最多领先这么多。某个目标写入失败时只停止该目标，其余目标继续。
+
+        prepare(目标) 在该目标的写线程中、开始写入之前调用（例如删除U盘上的旧文件）。
+        progress(目标, 已完成文件数, 总文件数, 已写入字节数, 总字节数) 在写线程中调用。
+        读取源文件失败时抛出该异常，通过 control 取消时抛出 TransferCancelled。
+        """
+        report = FanoutReport(stage, targets)
+        total_files = len(sources)
+        sizes = [os.path.getsize(src) for src, _ in sources]
+        total_bytes = sum(sizes)
+        buffer = _FanoutBuffer(len(targets), max(self.buffer_size, self.prefetch_bytes))
+        start = time.perf_counter()
+
+        def read_sources():
+            error = None
+            try:
+                for index, (src, _) in enumerate(sources):
+                    if not buffer.put(("open", index), 0):
+                        return  # 所有目标都已失败
+                    with open(src, "rb", buffering=0) as fsrc:
+                        while True:
+                            if control is not None:
+                                control.checkpoint()
+                            t0 = time.perf_counter()
+                            chunk = fsrc.read(self.buffer_size)
+                            report.read_seconds += time.perf_counter() - t0
+                            if not chunk:
+                                break
+                            report.source_bytes += len(chunk)
+                            if not buffer.put(("data", chunk), len(chunk)):
+                                return
+                    if not buffer.put(("close", index), 0):
+                        return
+            except BaseException as e:
+                error = e
+            finally:
+                buffer.close(error)
+
+        def write_target(target: str):
+            target_report = report.reports[target]
+            seq = 0
+            fdst = None
+            try:
+                if prepare is not None:
+                    prepare(target)
+                started = 0.0
+                while True:
+                    item = buffer.get(seq)
+                    if item is None:
+                        if buffer.error is not None:
+                            raise buffer.error
+                        break
+                    try:
+                        kind, value = item
+                        if kind == "open":
+                            if control is not None:
+                                control.checkpoint()
+                            started = time.perf_counter()
+                            dst = os.path.join(target, sources[value][1])
+                            fdst = open(dst, "wb", buffering=0)
+                        elif kind == "data":
+                            t0 = time.perf_counter()
+                            view = memoryview(value)
+                            while view:
+                                written = fdst.write(view)
+                                view = view[written:]
+                            target_report.write_seconds += time.perf_counter() - t0
+                        else:
+                            fdst.close()
+                            fdst = None
+                            src, name = sources[value]
+                            dst = os.path.join(target, name)
+                            shutil.copystat(src, dst)
+                            tracer.file_op(f"{stage}.file", dst, started, time.perf_counter() - started,
+                                           sizes[value])
+                            target_report.files += 1
+                            target_report.bytes += sizes[value]
+                            if progress:
+                                progress(target, target_report.files, total_files,
+                                         target_report.bytes, total_bytes)
+                            for listener in self.listeners:
+                                listener(stage, CopyTask(src, dst, sizes[value]))
+                    finally:
+                        buffer.done(seq)
+                        seq += 1
+            except BaseException as e:
+                buffer.leave(seq)
+                report.errors[target] = str(e)
+                tracer.event(f"{stage}.failed", target=target, error=str(e))
+            finally:
+                if fdst is not None:
+                    fdst.close()
+                target_report.elapsed = time.perf_counter() - start
+
+        reader = threading.Thread(target=read_sources, name="fanout-reader", daemon=True)
+        writers = [threading.Thread(target=write_target, args=(target,), name=f"fanout-writer-{index}",
+                                    daemon=True)
+                   for index, target in enumerate(targets)]
+        reader.start()
+        for writer in writers:
+            writer.start()
+        for writer in writers:
+            writer.join()
+        reader.join()
+
+        report.elapsed = time.perf_counter() - start
+        tracer.record(stage, start, report.elapsed, args=report.to_dict())
+        tracer.count(f"{stage}.source_bytes", report.source_bytes)
+        tracer.count(f"{stage}.targets_failed", len(report.errors))
+        if buffer.error is not None:
+            raise buffer.error
+        if control is not None and control.cancelled:
+            raise TransferCancelled("已取消")
+        return report
+
+    def distribute(self, parts: List[Tuple[str, List[Tuple[str, str]]]], stage: str = "distribute",
+                   progress: Optional[Callable[[str, int, int, int, int], None]] = None,
+                   prepare: Optional[Callable[[str], None]] = None,
+                   control: Optional[TransferControl] = None) -> FanoutReport:
+        """把 [(目标, [(源路径, 目标文件名)])] 依次写入各自的目标（一个列表按顺序分到几个U盘）
+
+        各部分的源文件不同，同时写入只会让源U盘在几个读取位置之间来回跳，因此逐个目标进行。
+        参数和返回值与 fanout() 相同；某个目标失败时记录错误并继续下一个。
+        """
+        report = FanoutReport(stage, [target for target, _ in parts])
+        start = time.perf_counter()
+        for target, sources in parts:
+            part = self.fanout(sources, [target], stage, progress=progress, prepare=prepare, control=control)
+            report.reports[target] = part.reports[target]
+            report.errors.update(part.errors)
+            report.source_bytes += part.source_bytes
+            report.read_seconds += part.read_seconds
+        report.elapsed = time.perf_counter() - start
+        return report
+
+    def _chunks_for(self, size: int) -> int:
+        return max(1, -(-size // self.buffer_size))
+
+    def _prefetch(self, task: CopyTask, stop: threading.Event, verify: bool = False):
+        """在读线程中把整个文件读入内存（调用方已预留预读额度），校验时同时计算哈希"""
+        if stop.is_set():
+            return None, 0.0, None
+        started = time.perf_counter()
+        chunks = []
+        digest = _new_digest() if verify else None
+        with open(task.src, "rb", buffering=0) as fsrc:
+            while True:
+                chunk = fsrc.read(self.buffer_size)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+                if digest is not None:
+                    digest.update(chunk)
+        return chunks, time.perf_counter() - started, digest.digest() if digest is not None else None
+
+    def _writer_loop(self, group: List[CopyTask], readers: ThreadPoolExecutor,
+                     budget: threading.BoundedSemaphore, stop: threading.Event,
+                     errors: list, on_done, control: Optional[TransferControl] = None,
+                     on_verified=None, stage: str = "copy", verify: bool = False):
+        pending = []  # [(task, future 或 None, 预留额度)]
+        verifier = None
+        if verify:
+            verifier = _Verifier(stage, self.buffer_size, f"{threading.current_thread().name}-verify")
+        next_index = 0
+        max_chunks = max(1, self.prefetch_bytes // self.buffer_size)
+
+        def schedule():
+            nonlocal next_index
+            # 按顺序为后续文件提交预读，直到额度不足
+            while next_index < len(group):
+                task = group[next_index]
+                chunks = self._chunks_for(task.size)
+                if chunks > max_chunks // 2 or task.offset:
+                    pending.append((task, None, 0))  # 大文件和续传的文件由写线程流式复制
+                else:
+                    acquired = 0
+                    while acquired < chunks and budget.acquire(blocking=False):
+                        acquired += 1
+                    if acquired < chunks:
+                        for _ in range(acquired):
+                            budget.release()
+                        if pending:
+                            return  # 额度不足，等前面的文件写完再预读
+                        # 没有任何待写文件时直接流式复制，避免饿死
+                        pending.append((task, None, 0))
+                    else:
+                        pending.append((task, readers.submit(self._prefetch, task, stop, verify), chunks))
+                next_index += 1
+
+        try:
+            schedule()
+            while pending and not stop.is_set():
+                task, future, reserved = pending.pop(0)
+                started = time.perf_counter()
+                try:
+                    if control is not None:
+                        control.checkpoint()
+                    if future is not None:
+                        chunks, read_seconds, digest = future.result()
+                        if chunks is None:
+                            break  # 其他写线程出错，预读已放弃：不要覆盖目标文件
+                        write_seconds = self._write_chunks(task, chunks)
+                    else:
+                        read_seconds, write_seconds, digest = self._stream_copy(task, control, verify)
+                    shutil.copystat(task.src, task.dst)
+                finally:
+                    for _ in range(reserved):
+                        budget.release()
+                if verifier is not None:
+                    verifier.submit(task, digest)
+                on_done(task, started, read_seconds, write_seconds)
+                schedule()
+            if verifier is not None and not stop.is_set():
+                self._retry_mismatches(verifier.finish(), verifier, on_verified)
+        except BaseException as e:
+            errors.append(e)
+            stop.set()
+        finally:
+            if verifier is not None:
+                verifier.finish(discard=True)
+            for _, future, reserved in pending:
+                if future is not None:
+                    future.cancel()
+                    try:
+                        future.result()
+                    except BaseException:
+                        pass
+                for _ in range(reserved):
+                    budget.release()
+
+    def _retry_mismatches(self, mismatches: List[CopyTask], verifier: _Verifier, on_verified):
+        """重新复制回读不一致的文件并立即校验（覆盖写入不会改变目录项的顺序）"""
+        retried = 0
+        for task in mismatches:
+            for attempt in range(VERIFY_RETRIES + 1):
+                if attempt == VERIFY_RETRIES:
+                    on_verified(verifier, retried)
+                    raise VerifyError(f"校验失败：{task.dst} 重新复制 {VERIFY_RETRIES} 次后仍与源文件不一致")
+                retried += 1
+                task = task._replace(offset=0)
+                _, _, digest = self._stream_copy(task, verify=True)
+                shutil.copystat(task.src, task.dst)
+                if verifier.check(task, digest):
+                    break
+        on_verified(verifier, retried)
+
+    def _write_chunks(self, task: CopyTask, chunks) -> float:
+        started = time.perf_counter()
+        with open(task.dst, "wb", buffering=0) as fdst:
+            for chunk in chunks:
+                view = memoryview(chunk)
+                while view:
+                    written = fdst.write(view)
+                    view = view[written:]
+        return time.perf_counter() - started
+
+    def _stream_copy(self, task: CopyTask, control: Optional[TransferControl] = None, verify: bool = False):
+        """流式复制单个大文件，返回 (读耗时, 写耗时, 源文件哈希或 None)
+
+        task.offset 不为 0 时保留目标文件已有的前半部分，从该位置继续复制。
+        有 control 时每复制 CHECKPOINT_BYTES 检查一次暂停/取消，并在数据落盘后报告进度。
+        """
+        digest = _new_digest() if verify else None
+        started = time.perf_counter()
+        with open(task.src, "rb", buffering=0) as fsrc, \
+                open(task.dst, "r+b" if task.offset else "wb", buffering=0) as fdst:
+            on_step = None
+            if control is not None:
+                def on_step(offset: int):
+                    os.fsync(fdst.fileno())
+                    if control.on_chunk_done is not None:
+                        control.on_chunk_done(task, offset)
+                    control.checkpoint()
+            if task.offset:
+                if digest is not None:
+                    # 续传部分之前的数据已在目标中，校验需要完整文件的哈希
+                    remaining = task.offset
+                    while remaining:
+                        block = fsrc.read(min(self.buffer_size, remaining))
+                        if not block:
+                            break
+                        digest.update(block)
+                        remaining -= len(block)
+                fsrc.seek(task.offset)
+                fdst.seek(task.offset)
+                fdst.truncate()
+            step = CHECKPOINT_BYTES if control is not None else None
+            if (self.use_kernel_copy and digest is None
+                    and _kernel_copy(fsrc, fdst, task.size, task.offset, step, on_step)):
+                elapsed = time.perf_counter() - started
+                return elapsed, elapsed, None
+            read_seconds = 0.0
+            write_seconds = 0.0
+            buf = bytearray(self.buffer_size)
+            view = memoryview(buf)
+            position = reported = fsrc.tell()
+            while True:
+                t0 = time.perf_counter()
+                n = fsrc.readinto(buf)
+                t1 = time.perf_counter()
+                read_seconds += t1 - t0
+                if not n:
+                    break
+                out = view[:n]
+                if digest is not None:
+                    digest.update(out)
+                while out:
+                    written = fdst.write(out)
+                    out = out[written:]
+                write_seconds += time.perf_counter() - t1
+                position += n
+                if on_step is not None and position - reported >= CHECKPOINT_BYTES:
+                    reported = position
+                    on_step(position)
+        return read_seconds, write_seconds, digest.digest() if digest is not None else None
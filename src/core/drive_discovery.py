@@ -0,0 +1,331 @@
+"""U盘发现：可替换的后端 + 设备信息缓存 + 插拔通知
+
+后端只负责列出当前的可移动卷，返回与 USBHandler.get_usb_drives 相同格式的字典：
+    {'letter': 根目录（Windows 为 "E:\\"，Linux 为挂载点）, 'name': 卷标,
+     'serial': 卷序列号（未知时为 None）, 'filesystem': 文件系统}
+
+- Win32Backend：按 GetLogicalDrives 的位图只探测存在的盘符，已探测过的盘符直接使用缓存；
+  插拔事件由界面的 WM_DEVICECHANGE 消息驱动（native_events = True）。
+- LinuxBackend：读取 /proc/self/mountinfo 和 /sys/block/*/removable，
+  通过 poll() 等待 mountinfo 变化得到插拔（挂载/卸载）事件。
+- FakeBackend：测试用，可以手动添加/移除设备，也可以通过环境变量把普通目录当作U盘。
+
+通过环境变量 UDISK_DRIVE_BACKEND=win32/linux/fake 可以强制选择后端，
+fake 后端从 UDISK_FAKE_DRIVES（os.pathsep 分隔的目录列表）读取设备。
+"""
+import os
+import re
+import select
+import string
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from src.core import usb_handler
+from src.core.instrumentation import tracer
+
+DEFAULT_NAME = "可移动磁盘"
+
+
+class DriveBackend:
+    """发现后端的接口"""
+
+    name = "base"
+    native_events = False  # True 表示插拔事件由界面的系统消息提供，不需要等待线程
+
+    def list_drives(self) -> List[dict]:
+        raise NotImplementedError
+
+    def invalidate(self):
+        """丢弃缓存的设备信息，下次 list_drives 时重新读取"""
+
+    def wait_for_change(self, timeout: float) -> bool:
+        """等待设备变化，最多 timeout 秒；发生变化时返回 True"""
+        time.sleep(timeout)
+        return False
+
+    def close(self):
+        """释放后端持有的资源"""
+
+
+class Win32Backend(DriveBackend):
+    """Windows：GetLogicalDrives + GetDriveType + GetVolumeInformation"""
+
+    name = "win32"
+    native_events = True
+
+    def __init__(self):
+        self._cache: Dict[str, Optional[dict]] = {}  # 盘符 -> 驱动器信息（非U盘为 None）
+
+    def invalidate(self):
+        self._cache.clear()
+
+    def list_drives(self) -> List[dict]:
+        if not usb_handler._load_win32():
+            raise OSError("Win32 后端需要 pywin32")
+        mask = usb_handler.win32api.GetLogicalDrives()
+        letters = [f"{letter}:\\" for bit, letter in enumerate(string.ascii_uppercase) if mask >> bit & 1]
+        for letter in list(self._cache):
+            if letter not in letters:
+                del self._cache[letter]
+        drives = []
+        for letter in letters:
+            if letter not in self._cache:
+                try:
+                    self._cache[letter] = self._probe(letter)
+                except Exception as e:
+                    # 读卡器中没有卡等情况：不缓存，下次事件时重试
+                    tracer.event("discovery.failed", drive=letter, error=str(e))
+                    continue
+            if self._cache[letter] is not None:
+                drives.append(dict(self._cache[letter]))
+        return drives
+
+    @staticmethod
+    def _probe(letter: str) -> Optional[dict]:
+        win32api, win32file = usb_handler.win32api, usb_handler.win32file
+        if win32file.GetDriveType(letter) != win32file.DRIVE_REMOVABLE:
+            return None
+        volume_info = win32api.GetVolumeInformation(letter)
+        return {
+            'letter': letter,
+            'name': volume_info[0] or DEFAULT_NAME,
+            'serial': volume_info[1] & 0xFFFFFFFF,
+            'filesystem': volume_info[4],
+        }
+
+
+_LINUX_FILESYSTEMS = {"vfat": "FAT", "msdos": "FAT", "exfat": "EXFAT", "ntfs": "NTFS", "ntfs3": "NTFS"}
+
+
+def _mountinfo_unescape(text: str) -> str:
+    """mountinfo 中的空格等字符写作 \\040 这样的八进制转义"""
+    return re.sub(r"\\([0-7]{3})", lambda m: chr(int(m.group(1), 8)), text)
+
+
+def _udev_unescape(text: str) -> str:
+    """/dev/disk/by-label 中的特殊字符写作 \\x20 这样的十六进制转义（UTF-8 字节）"""
+    raw = re.sub(rb"\\x([0-9a-fA-F]{2})", lambda m: bytes([int(m.group(1), 16)]),
+                 text.encode("utf-8", "surrogateescape"))
+    return raw.decode("utf-8", "replace")
+
+
+def _serial_from_uuid(uuid: str) -> Optional[int]:
+    """FAT/exFAT 的 UUID 就是卷序列号（如 1234-ABCD），其他文件系统返回 None"""
+    digits = uuid.replace("-", "")
+    if len(digits) != 8:
+        return None
+    try:
+        return int(digits, 16)
+    except ValueError:
+        return None
+
+
+class LinuxBackend(DriveBackend):
+    """Linux：/proc/self/mountinfo 列出已挂载的块设备，/sys/block/*/removable 判断是否可移动
+
+    USB 移动硬盘的 removable 通常为 0，因此设备路径经过 USB 总线的也算作U盘。
+    各路径可以替换，便于在测试中使用准备好的目录。
+    """
+
+    name = "linux"
+
+    def __init__(self, mountinfo: str = "/proc/self/mountinfo", sys_root: str = "/sys",
+                 dev_root: str = "/dev"):
+        self.mountinfo = mountinfo
+        self.sys_root = sys_root
+        self.dev_root = dev_root
+        self._cache: Dict[Tuple[str, str], Optional[dict]] = {}  # (设备, 挂载点) -> 驱动器信息
+        self._watch_file = None
+        self._poller = None
+
+    def invalidate(self):
+        self._cache.clear()
+
+    def _mounts(self) -> Iterable[Tuple[str, str, str]]:
+        """(设备, 挂载点, 文件系统类型)，只包含来源是设备文件的挂载（跳过 proc、tmpfs 等）"""
+        with open(self.mountinfo, encoding="utf-8", errors="surrogateescape") as f:
+            for line in f:
+                fields = line.split()
+                try:
+                    separator = fields.index("-", 6)
+                except ValueError:
+                    continue
+                if len(fields) < separator + 3:
+                    continue
+                source = fields[separator + 2]
+                if source.startswith("/"):
+                    yield source, _mountinfo_unescape(fields[4]), fields[separator + 1]
+
+    def list_drives(self) -> List[dict]:
+        mounts = list(self._mounts())
+        present = {(source, mount_point) for source, mount_point, _ in mounts}
+        for key in list(self._cache):
+            if key not in present:
+                del self._cache[key]
+        drives = []
+        seen = set()
+        for source, mount_point, fstype in mounts:
+            if source in seen:
+                continue  # 同一设备的多个挂载点只取第一个
+            key = (source, mount_point)
+            if key not in self._cache:
+                try:
+                    self._cache[key] = self._probe(source, mount_point, fstype)
+                except OSError as e:
+                    tracer.event("discovery.failed", drive=mount_point, error=str(e))
+                    continue
+            if self._cache[key] is not None:
+                seen.add(source)
+                drives.append(dict(self._cache[key]))
+        return drives
+
+    def _probe(self, source: str, mount_point: str, fstype: str) -> Optional[dict]:
+        device = os.path.realpath(source)
+        if not self._is_removable(os.path.basename(device)):
+            return None
+        label = self._lookup(os.path.join(self.dev_root, "disk", "by-label"), device)
+        uuid = self._lookup(os.path.join(self.dev_root, "disk", "by-uuid"), device)
+        return {
+            'letter': mount_point,
+            'name': _udev_unescape(label) if label else (os.path.basename(mount_point) or DEFAULT_NAME),
+            'serial': _serial_from_uuid(uuid) if uuid else None,
+            'filesystem': _LINUX_FILESYSTEMS.get(fstype, fstype.upper()),
+        }
+
+    def _is_removable(self, device_name: str) -> bool:
+        path = os.path.realpath(os.path.join(self.sys_root, "class", "block", device_name))
+        if not os.path.exists(path):
+            return False
+        if os.path.exists(os.path.join(path, "partition")):
+            path = os.path.dirname(path)  # 分区的上级目录是整块磁盘
+        try:
+            with open(os.path.join(self.sys_root, "block", os.path.basename(path), "removable")) as f:
+                if f.read().strip() == "1":
+                    return True
+        except OSError:
+            pass
+        return "/usb" in path
+
+    @staticmethod
+    def _lookup(directory: str, device: str) -> Optional[str]:
+        """在 /dev/disk/by-* 中查找指向 device 的链接名"""
+        try:
+            names = os.listdir(directory)
+        except OSError:
+            return None
+        for name in names:
+            if os.path.realpath(os.path.join(directory, name)) == device:
+                return name
+        return None
+
+    def wait_for_change(self, timeout: float) -> bool:
+        # 挂载表变化时 mountinfo 会产生 POLLPRI/POLLERR 事件，需要重新读取一遍才会清除
+        if self._poller is None:
+            self._watch_file = open(self.mountinfo, "rb")
+            self._watch_file.read()
+            self._poller = select.poll()
+            self._poller.register(self._watch_file, select.POLLPRI | select.POLLERR)
+        if not self._poller.poll(timeout * 1000):
+            return False
+        self._watch_file.seek(0)
+        self._watch_file.read()
+        return True
+
+    def close(self):
+        if self._watch_file is not None:
+            self._watch_file.close()
+            self._watch_file = None
+            self._poller = None
+
+
+class FakeBackend(DriveBackend):
+    """测试用后端：设备由调用方添加和移除"""
+
+    name = "fake"
+
+    def __init__(self, drives: Iterable[dict] = ()):
+        self._lock = threading.Lock()
+        self._drives: Dict[str, dict] = {}
+        self._changed = threading.Event()
+        for drive in drives:
+            self._drives[drive['letter']] = dict(drive)
+
+    @classmethod
+    def from_env(cls) -> "FakeBackend":
+        """从 UDISK_FAKE_DRIVES 读取设备目录"""
+        paths = [path for path in os.environ.get("UDISK_FAKE_DRIVES", "").split(os.pathsep) if path]
+        return cls({'letter': path, 'name': os.path.basename(path.rstrip("\\/")) or DEFAULT_NAME,
+                    'serial': None, 'filesystem': "FAT32"} for path in paths)
+
+    def add(self, letter: str, name: str = DEFAULT_NAME, serial: Optional[int] = None,
+            filesystem: str = "FAT32"):
+        with self._lock:
+            self._drives[letter] = {'letter': letter, 'name': name, 'serial': serial,
+                                    'filesystem': filesystem}
+        self._changed.set()
+
+    def remove(self, letter: str):
+        with self._lock:
+            self._drives.pop(letter, None)
+        self._changed.set()
+
+    def list_drives(self) -> List[dict]:
+        with self._lock:
+            return [dict(drive) for drive in self._drives.values()]
+
+    def wait_for_change(self, timeout: float) -> bool:
+        if not self._changed.wait(timeout):
+            return False
+        self._changed.clear()
+        return True
+
+
+def default_backend() -> DriveBackend:
+    """按环境变量或当前平台选择后端"""
+    name = os.environ.get("UDISK_DRIVE_BACKEND", "").lower()
+    if name == "fake":
+        return FakeBackend.from_env()
+    if name == "win32" or (not name and os.name == "nt"):
+        return Win32Backend()
+    if name == "linux" or (not name and os.path.exists("/proc/self/mountinfo")):
+        return LinuxBackend()
+    return FakeBackend()
+
+
+class DriveDiscovery:
+    """缓存当前的U盘列表，refresh() 返回新增和移除的设备"""
+
+    def __init__(self, backend: Optional[DriveBackend] = None):
+        self.backend = backend or default_backend()
+        self._drives: Dict[str, dict] = {}
+
+    @property
+    def native_events(self) -> bool:
+        return self.backend.native_events
+
+    def drives(self) -> List[dict]:
+        return list(self._drives.values())
+
+    def get(self, letter: str) -> Optional[dict]:
+        return self._drives.get(letter)
+
+    def refresh(self, full: bool = False) -> Tuple[List[dict], List[dict]]:
+        """重新列出设备；full=True 时先丢弃缓存的设备信息
+
+        返回 (新增的设备, 移除的设备)，信息发生变化的设备同时出现在两者中。
+        """
+        if full:
+            self.backend.invalidate()
+        with tracer.span("discovery.refresh", backend=self.backend.name):
+            current = {drive['letter']: drive for drive in self.backend.list_drives()}
+        added = [drive for letter, drive in current.items() if self._drives.get(letter) != drive]
+        removed = [drive for letter, drive in self._drives.items() if current.get(letter) != drive]
+        self._drives = dict(sorted(current.items()))
+        return added, removed
+
+    def wait_for_change(self, timeout: float) -> bool:
+        return self.backend.wait_for_change(timeout)
+
+    def close(self):
+        self.backend.close()
@@ -0,0 +1,113 @@
+"""查找U盘中内容相同的文件（同一首歌被反复同步成不同的文件名）
+
+逐级缩小候选范围，尽量少读数据：
+1. 按文件大小分组，大小唯一的文件不可能重复；
+2. 同样大小的文件计算首尾快速哈希（sync.quick_hash，只读首尾各 64KB）；
+3. 快速哈希仍然相同、且比首尾两块更大的文件才读取全部内容计算完整哈希。
+
+可以限制读取的文件数和字节数，超出预算时停止并返回已确认的结果（complete 为 False）。
+"""
+import hashlib
+from typing import Callable, Dict, List, Optional
+
+from src.core.instrumentation import tracer
+from src.core.scanner import ScanEntry
+from src.core.sync import QUICK_HASH_CHUNK, quick_hash
+
+FULL_HASH_BLOCK = 1024 * 1024
+
+
+class BudgetExceeded(Exception):
+    """读取的文件数或字节数超出预算"""
+
+
+class DuplicateReport:
+    """查找结果：每组中第一个文件保留，其余为重复"""
+
+    def __init__(self):
+        self.groups: List[List[ScanEntry]] = []
+        self.files_read = 0
+        self.bytes_read = 0
+        self.complete = True
+
+    def duplicates(self) -> List[ScanEntry]:
+        return [entry for group in self.groups for entry in group[1:]]
+
+    @property
+    def wasted_bytes(self) -> int:
+        return sum(entry.size for entry in self.duplicates())
+
+    def summary(self) -> str:
+        text = (f"发现 {len(self.groups)} 组重复文件，可去掉 {len(self.duplicates())} 个"
+                f"（{self.wasted_bytes / (1024 * 1024):.1f}MB）")
+        if not self.complete:
+            text += "；已达到读取上限，部分文件未比较完"
+        return text
+
+
+def full_hash(path: str, block_size: int = FULL_HASH_BLOCK) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def find_duplicates(entries: List[ScanEntry], max_files: Optional[int] = None,
+                    max_bytes: Optional[int] = None,
+                    progress: Optional[Callable[[int, int], None]] = None,
+                    cancelled: Optional[Callable[[], bool]] = None) -> DuplicateReport:
+    """在 entries 中查找内容相同的文件，每组按 entries 中的顺序排列（保留第一个）
+
+    progress(已读取文件数, 已读取字节数)。空文件不参与比较；无法读取的文件跳过。
+    """
+    report = DuplicateReport()
+
+    def charge(nbytes: int):
+        if cancelled is not None and cancelled():
+            raise BudgetExceeded()
+        if max_files is not None and report.files_read + 1 > max_files:
+            raise BudgetExceeded()
+        if max_bytes is not None and report.bytes_read + nbytes > max_bytes:
+            raise BudgetExceeded()
+        report.files_read += 1
+        report.bytes_read += nbytes
+        if progress:
+            progress(report.files_read, report.bytes_read)
+
+    def split(group: List[ScanEntry], key: Callable[[ScanEntry], str], cost: Callable[[ScanEntry], int]):
+        buckets: Dict[str, List[ScanEntry]] = {}
+        for entry in group:
+            charge(cost(entry))
+            try:
+                buckets.setdefault(key(entry), []).append(entry)
+            except OSError as e:
+                tracer.event("duplicates.failed", path=entry.path, error=str(e))
+        return [bucket for bucket in buckets.values() if len(bucket) > 1]
+
+    with tracer.span("duplicates", files=len(entries)):
+        by_size: Dict[int, List[ScanEntry]] = {}
+        for entry in entries:
+            if entry.size:
+                by_size.setdefault(entry.size, []).append(entry)
+        candidates = [group for group in by_size.values() if len(group) > 1]
+        # 小文件先比较：同样的预算能确认更多文件
+        candidates.sort(key=lambda group: group[0].size)
+        try:
+            for group in candidates:
+                size = group[0].size
+                for quick_group in split(group, lambda e: quick_hash(e.path, e.size),
+                                         lambda e: min(e.size, 2 * QUICK_HASH_CHUNK)):
+                    if size <= 2 * QUICK_HASH_CHUNK:
+                        report.groups.append(quick_group)  # 首尾两块已覆盖整个文件
+                        continue
+                    report.groups.extend(split(quick_group, lambda e: full_hash(e.path), lambda e: e.size))
+        except BudgetExceeded:
+            report.complete = False
+        position = {id(entry): index for index, entry in enumerate(entries)}
+        for group in report.groups:
+            group.sort(key=lambda entry: position[id(entry)])
+        report.groups.sort(key=lambda group: position[id(group[0])])
+        tracer.count("duplicates.bytes_read", report.bytes_read)
+        tracer.count("duplicates.groups", len(report.groups))
+    return report
@@ -0,0 +1,387 @@
+"""按顺序生成完整的 FAT32 文件系统镜像，并以大块顺序写入U盘或镜像文件
+
+完整重写时，通过文件系统驱动逐个复制文件会产生大量分散的小块写入，廉价闪存上很慢。
+这里直接生成整个卷：根目录项按列表顺序排列，文件数据按同样顺序占用连续的簇，
+然后从卷开头到最后一个文件一次性顺序写出（空闲区域不写），最后回读校验。
+"""
+import hashlib
+import os
+import queue
+import struct
+import sys
+import threading
+import time
+from array import array
+from typing import BinaryIO, Callable, Iterator, List, NamedTuple, Optional, Tuple
+
+from src.core.fat_volume import _lfn_checksum
+from src.core.instrumentation import tracer
+
+SECTOR_SIZE = 512
+RESERVED_SECTORS = 32
+FAT_COUNT = 2
+ROOT_CLUSTER = 2
+MIN_FAT32_CLUSTERS = 65525
+MAX_CLUSTER_SIZE = 64 * 1024
+DEFAULT_CLUSTER_SIZE = 32 * 1024     # U盘原有的簇大小不能用于 FAT32 时使用
+MAX_FILE_SIZE = 0xFFFFFFFF
+DEFAULT_BLOCK_SIZE = 8 * 1024 * 1024  # 顺序写入的块大小
+_END_OF_CHAIN = 0x0FFFFFFF
+_SHORT_NAME_CHARS = set("ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789!#$%&'()-@^_`{}~")
+
+
+class ImageFile(NamedTuple):
+    """写入镜像根目录的一个文件"""
+    src: str
+    name: str
+    size: int
+    mtime: float
+
+
+def _fat_datetime(timestamp: float) -> Tuple[int, int]:
+    t = time.localtime(max(timestamp, 315532800))  # FAT 日期从 1980 年开始
+    year = min(max(t.tm_year, 1980), 2107)
+    date = ((year - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday
+    clock = (t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2)
+    return date, clock
+
+
+def _short_names(names: List[str]) -> List[bytes]:
+    """为每个长文件名生成唯一的 8.3 短文件名（"BASIS~N.EXT"）"""
+    used = set()
+    result = []
+    for name in names:
+        stem, ext = os.path.splitext(name)
+        basis = "".join(c for c in stem.upper() if c in _SHORT_NAME_CHARS)[:6] or "FILE"
+        ext = "".join(c for c in ext[1:].upper() if c in _SHORT_NAME_CHARS)[:3]
+        number = 1
+        while True:
+            tail = f"~{number}"
+            short = (basis[:8 - len(tail)] + tail).ljust(8).encode("ascii") + ext.ljust(3).encode("ascii")
+            if short not in used:
+                break
+            number += 1
+        used.add(short)
+        result.append(short)
+    return result
+
+
+def _lfn_entries(name: str, checksum: int) -> List[bytes]:
+    """长文件名目录项，按在目录中的物理顺序（最后一段在前）返回"""
+    units = name.encode("utf-16-le")
+    count = -(-len(units) // 26)
+    padded = units + b"\x00\x00" if len(units) % 26 else units
+    padded = padded.ljust(count * 26, b"\xff")
+    entries = []
+    for ordinal in range(1, count + 1):
+        part = padded[(ordinal - 1) * 26:ordinal * 26]
+        entry = bytearray(32)
+        entry[0] = ordinal | (0x40 if ordinal == count else 0)
+        entry[1:11] = part[0:10]
+        entry[11] = 0x0F
+        entry[13] = checksum
+        entry[14:26] = part[10:22]
+        entry[28:32] = part[22:26]
+        entries.append(bytes(entry))
+    return entries[::-1]
+
+
+def fat32_cluster_size(cluster_size: Optional[int], total_size: int) -> int:
+    """生成 FAT32 时使用的簇大小
+
+    沿用U盘原有的簇大小；不是合法的 FAT32 簇大小时（例如 exFAT 常用的 128KB 以上）改为 32KB。
+    簇数低于 FAT32 的下限时逐步减小簇大小。
+    """
+    if (not cluster_size or cluster_size % SECTOR_SIZE or cluster_size & (cluster_size - 1)
+            or cluster_size > MAX_CLUSTER_SIZE):
+        cluster_size = DEFAULT_CLUSTER_SIZE
+    # 保留区和两份 FAT 表约占 2%
+    while cluster_size > SECTOR_SIZE and total_size // cluster_size * 49 // 50 < MIN_FAT32_CLUSTERS:
+        cluster_size //= 2
+    return cluster_size
+
+
+def boot_hidden_sectors(boot: bytes) -> int:
+    """从卷原有的引导扇区读取分区起始位置（以 512 字节扇区计）
+
+    FAT 和 NTFS 为 BPB 中的隐藏扇区数（偏移 28），exFAT 为 PartitionOffset（偏移 64），
+    都以该卷自身的扇区大小计。
+    """
+    if boot[3:11] == b"EXFAT   ":
+        bytes_per_sector = 1 << boot[108]
+        offset = struct.unpack_from("<Q", boot, 64)[0]
+    else:
+        bytes_per_sector = struct.unpack_from("<H", boot, 11)[0] or SECTOR_SIZE
+        offset = struct.unpack_from("<I", boot, 28)[0]
+    return offset * bytes_per_sector // SECTOR_SIZE
+
+
+class FatImageBuilder:
+    """FAT32 镜像布局
+
+    total_size 为卷（分区）的字节数，cluster_size 尽量与U盘原有的簇大小保持一致
+    （见 fat32_cluster_size）。文件放在根目录中，目录项和数据都按 files 的顺序排列。
+    """
+
+    def __init__(self, files: List[ImageFile], total_size: int, cluster_size: int,
+                 label: str = "NO NAME", volume_id: Optional[int] = None, hidden_sectors: int = 0):
+        if cluster_size % SECTOR_SIZE or cluster_size & (cluster_size - 1) or cluster_size > MAX_CLUSTER_SIZE:
+            raise ValueError(f"无效的簇大小：{cluster_size}")
+        for item in files:
+            if item.size > MAX_FILE_SIZE:
+                raise ValueError(f"FAT32 不支持超过 4GB 的文件：{item.name}")
+        self.files = files
+        self.cluster_size = cluster_size
+        self.label = label
+        self.volume_id = volume_id if volume_id is not None else int(time.time()) & 0xFFFFFFFF
+        self.hidden_sectors = hidden_sectors
+        self._layout(total_size)
+
+    def _layout(self, total_size: int):
+        spc = self.cluster_size // SECTOR_SIZE
+        self.total_sectors = total_size // SECTOR_SIZE
+        # FAT 表大小和簇数互相依赖，迭代到稳定
+        fat_sectors = 1
+        while True:
+            data_sectors = self.total_sectors - RESERVED_SECTORS - FAT_COUNT * fat_sectors
+            clusters = data_sectors // spc
+            needed = -(-(clusters + 2) * 4 // SECTOR_SIZE)
+            if needed <= fat_sectors:
+                break
+            fat_sectors = needed
+        if clusters < MIN_FAT32_CLUSTERS:
+            raise ValueError(f"卷太小（{clusters} 个簇），无法使用 {self.cluster_size} 字节的簇创建 FAT32")
+        self.fat_sectors = fat_sectors
+        self.cluster_count = clusters
+        self.heap_offset = (RESERVED_SECTORS + FAT_COUNT * fat_sectors) * SECTOR_SIZE
+
+        self.root_data = self._build_root_directory()
+        root_clusters = max(1, -(-len(self.root_data) // self.cluster_size))
+        self.root_data = self.root_data.ljust(root_clusters * self.cluster_size, b"\x00")
+        self.root_clusters = root_clusters
+
+        # 文件按顺序占用连续的簇
+        self.first_clusters = []
+        next_cluster = ROOT_CLUSTER + root_clusters
+        for item in self.files:
+            count = -(-item.size // self.cluster_size)
+            self.first_clusters.append(next_cluster if count else 0)
+            next_cluster += count
+        self.used_clusters = next_cluster - 2
+        if self.used_clusters > clusters:
+            need = self.used_clusters * self.cluster_size / (1024 * 1024)
+            raise ValueError(f"空间不足：需要 {need:.1f}MB，卷只有 {clusters * self.cluster_size / (1024 * 1024):.1f}MB")
+        # 写入范围：从卷开头到最后一个已用簇
+        self.image_size = self.heap_offset + self.used_clusters * self.cluster_size
+
+    def _build_root_directory(self) -> bytes:
+        # 此时还不知道文件的起始簇，先按顺序生成，簇号在 _root_with_clusters 中填入
+        entries = []
+        if self._label_bytes() != b"NO NAME    ":
+            label = bytearray(32)
+            label[0:11] = self._label_bytes()
+            label[11] = 0x08
+            entries.append(bytes(label))
+        self._short_offsets = []
+        for item, short in zip(self.files, _short_names([f.name for f in self.files])):
+            entries.extend(_lfn_entries(item.name, _lfn_checksum(short)))
+            entry = bytearray(32)
+            entry[0:11] = short
+            entry[11] = 0x20  # 存档
+            date, clock = _fat_datetime(item.mtime)
+            struct.pack_into("<HHHH", entry, 14, clock, date, date, 0)
+            struct.pack_into("<HHHI", entry, 22, clock, date, 0, item.size)
+            self._short_offsets.append(len(entries) * 32)
+            entries.append(bytes(entry))
+        return b"".join(entries)
+
+    def _label_bytes(self) -> bytes:
+        # 卷标使用 OEM 代码页（中文 Windows 为 GBK），截断时不能拆开双字节字符
+        label = b""
+        for char in self.label.upper():
+            encoded = char.encode("gbk", errors="ignore")
+            if len(label) + len(encoded) > 11:
+                break
+            label += encoded
+        return (label or b"NO NAME").ljust(11)
+
+    def _root_with_clusters(self) -> bytes:
+        data = bytearray(self.root_data)
+        for offset, cluster in zip(self._short_offsets, self.first_clusters):
+            struct.pack_into("<H", data, offset + 20, cluster >> 16)
+            struct.pack_into("<H", data, offset + 26, cluster & 0xFFFF)
+        return bytes(data)
+
+    # ---- 各区域 ----
+
+    def boot_region(self) -> bytes:
+        """保留区：引导扇区、FSInfo 及其备份"""
+        spc = self.cluster_size // SECTOR_SIZE
+        boot = bytearray(SECTOR_SIZE)
+        boot[0:3] = b"\xEB\x58\x90"
+        boot[3:11] = b"MSWIN4.1"
+        struct.pack_into("<HBHBHHBHHHII", boot, 11, SECTOR_SIZE, spc, RESERVED_SECTORS, FAT_COUNT,
+                         0, 0, 0xF8, 0, 63, 255, self.hidden_sectors, self.total_sectors)
+        struct.pack_into("<IHHIHH", boot, 36, self.fat_sectors, 0, 0, ROOT_CLUSTER, 1, 6)
+        boot[64] = 0x80
+        boot[66] = 0x29
+        struct.pack_into("<I", boot, 67, self.volume_id)
+        boot[71:82] = self._label_bytes()
+        boot[82:90] = b"FAT32   "
+        boot[510:512] = b"\x55\xAA"
+
+        fsinfo = bytearray(SECTOR_SIZE)
+        struct.pack_into("<I", fsinfo, 0, 0x41615252)
+        struct.pack_into("<III", fsinfo, 484, 0x61417272, self.cluster_count - self.used_clusters,
+                         self.used_clusters + 2)
+        struct.pack_into("<I", fsinfo, 508, 0xAA550000)
+
+        third = bytearray(SECTOR_SIZE)
+        third[510:512] = b"\x55\xAA"
+        region = bytearray(RESERVED_SECTORS * SECTOR_SIZE)
+        for base in (0, 6):  # 第 6 扇区开始是备份
+            region[base * SECTOR_SIZE:(base + 3) * SECTOR_SIZE] = boot + fsinfo + third
+        return bytes(region)
+
+    def fat_table(self) -> bytes:
+        """一份完整的 FAT 表：根目录和各文件都是连续的簇链"""
+        total_entries = self.fat_sectors * SECTOR_SIZE // 4
+        last_used = self.used_clusters + 1
+        table = array("I", range(1, last_used + 2))  # 簇 i 指向 i + 1
+        table.frombytes(bytes(4 * (total_entries - len(table))))
+        table[0] = 0x0FFFFFF8
+        table[1] = _END_OF_CHAIN
+        table[ROOT_CLUSTER + self.root_clusters - 1] = _END_OF_CHAIN
+        for item, first in zip(self.files, self.first_clusters):
+            if first:
+                table[first + -(-item.size // self.cluster_size) - 1] = _END_OF_CHAIN
+        if sys.byteorder != "little":
+            table.byteswap()
+        return table.tobytes()
+
+    def iter_chunks(self, block_size: int) -> Iterator[bytes]:
+        """按卷中的顺序生成从开头到最后一个已用簇的全部内容"""
+        yield self.boot_region()
+        fat = self.fat_table()
+        for _ in range(FAT_COUNT):
+            yield fat
+        yield self._root_with_clusters()
+        for item in self.files:
+            remaining = item.size
+            with open(item.src, "rb", buffering=0) as f:
+                while remaining > 0:
+                    chunk = f.read(min(block_size, remaining))
+                    if not chunk:
+                        raise IOError(f"文件在写入过程中变短：{item.src}")
+                    remaining -= len(chunk)
+                    yield chunk
+            tail = item.size % self.cluster_size
+            if tail:
+                yield bytes(self.cluster_size - tail)
+
+    # ---- 写入 ----
+
+    def write(self, target: BinaryIO, progress: Optional[Callable[[str, int, int], None]] = None,
+              block_size: int = DEFAULT_BLOCK_SIZE, verify: bool = True, read_ahead: int = 4):
+        """以 block_size 大小的块顺序写入 target（镜像文件或已锁定的卷）
+
+        读取源文件和写入在两个线程中进行，最多预读 read_ahead 块。verify 为 True 时
+        写完后回读比较每一块的哈希。progress(阶段, 已完成字节数, 总字节数)，阶段为 "write" 或 "verify"。
+        """
+        blocks: "queue.Queue" = queue.Queue(maxsize=max(1, read_ahead))
+        stop = threading.Event()
+        errors = []
+
+        def produce():
+            buffer = bytearray()
+            try:
+                for chunk in self.iter_chunks(block_size):
+                    buffer += chunk
+                    while len(buffer) >= block_size:
+                        blocks.put(bytes(buffer[:block_size]))
+                        del buffer[:block_size]
+                        if stop.is_set():
+                            return
+                if buffer:
+                    blocks.put(bytes(buffer))
+            except BaseException as e:
+                errors.append(e)
+            finally:
+                blocks.put(None)
+
+        digests = []
+        done = 0
+        reader = threading.Thread(target=produce, name="fat-image-reader", daemon=True)
+        with tracer.span("fat_image.write", bytes=self.image_size):
+            reader.start()
+            try:
+                target.seek(0)
+                while True:
+                    block = blocks.get()
+                    if block is None:
+                        break
+                    if len(block) % SECTOR_SIZE:
+                        block += bytes(SECTOR_SIZE - len(block) % SECTOR_SIZE)
+                    view = memoryview(block)
+                    while view:
+                        written = target.write(view)
+                        view = view[written:]
+                    digests.append((len(block), hashlib.blake2b(block, digest_size=16).digest()))
+                    done += len(block)
+                    if progress:
+                        progress("write", min(done, self.image_size), self.image_size)
+            finally:
+                stop.set()
+                while reader.is_alive():
+                    try:
+                        blocks.get(timeout=0.1)
+                    except queue.Empty:
+                        pass
+                reader.join()
+            if errors:
+                raise errors[0]
+            target.flush()
+            try:
+                os.fsync(target.fileno())
+            except (OSError, ValueError):
+                pass
+        tracer.count("fat_image.bytes", done)
+
+        if verify:
+            with tracer.span("fat_image.verify"):
+                self.verify(target, digests, progress)
+
+    def verify(self, target: BinaryIO, digests: List[Tuple[int, bytes]],
+               progress: Optional[Callable[[str, int, int], None]] = None):
+        """回读并比较写入的每一块"""
+        fadvise = getattr(os, "posix_fadvise", None)
+        if fadvise is not None:
+            try:
+                fadvise(target.fileno(), 0, 0, os.POSIX_FADV_DONTNEED)  # 尽量从设备而不是页缓存读取
+            except (OSError, ValueError):
+                pass
+        target.seek(0)
+        offset = 0
+        for length, digest in digests:
+            data = target.read(length)
+            if len(data) != length or hashlib.blake2b(data, digest_size=16).digest() != digest:
+                raise IOError(f"校验失败：偏移 {offset} 处的数据与写入的不一致")
+            offset += length
+            if progress:
+                progress("verify", min(offset, self.image_size), self.image_size)
+
+
+def image_files(pairs) -> List[ImageFile]:
+    """由 (源路径, 目标文件名) 列表生成镜像文件列表"""
+    files = []
+    for src, name in pairs:
+        st = os.stat(src)
+        files.append(ImageFile(src, name, st.st_size, st.st_mtime))
+    return files
+
+
+def write_image_file(path: str, builder: FatImageBuilder, total_size: int, **kwargs):
+    """写入镜像文件（文件大小设为整个卷的大小，空闲区域为稀疏空洞）"""
+    with open(path, "w+b", buffering=0) as f:
+        builder.write(f, **kwargs)
+        f.truncate(total_size)
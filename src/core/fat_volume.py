@@ -0,0 +1,488 @@
+"""直接读写 FAT16 / FAT32 / exFAT 卷的目录表，原地调整目录项顺序
+
+车载、音箱等播放器按目录项在目录表中的物理顺序播放文件。调整顺序只需要重写
+目录所在的几个簇（每个文件几十个字节），不需要移动任何文件数据。
+
+卷可以是镜像文件，也可以是已锁定的设备（Windows 下见 USBHandler.locked_volume）。
+所有读写都按扇区对齐，因此也适用于要求对齐访问的原始设备。
+"""
+import base64
+import json
+import os
+import struct
+import time
+from typing import BinaryIO, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from src.core.instrumentation import tracer
+
+DIR_ENTRY_SIZE = 32
+BACKUP_SUFFIX = ".fatdir.json"
+
+# GetVolumeInformation 返回的、可以原地调整目录顺序的文件系统名称（大写）
+SUPPORTED_FILESYSTEMS = ("FAT", "FAT16", "FAT32", "EXFAT")
+
+# FAT 目录项
+_ATTR_VOLUME_ID = 0x08
+_ATTR_DIRECTORY = 0x10
+_ATTR_LFN = 0x0F
+_DELETED = 0xE5
+
+# exFAT 目录项类型
+_EXFAT_FILE = 0x85
+_EXFAT_STREAM = 0xC0
+_EXFAT_NAME = 0xC1
+_EXFAT_NO_FAT_CHAIN = 0x02
+
+
+class DirRecord(NamedTuple):
+    """目录中的一条记录（一个文件或子目录占用的全部目录项）"""
+    name: str
+    is_dir: bool
+    size: int
+    first_cluster: int
+    contiguous: bool  # exFAT 的 NoFatChain：数据占用连续的簇，不查 FAT 表
+    raw: bytes        # FAT：长文件名目录项 + 短文件名目录项；exFAT：整个目录项集合
+    movable: bool     # 卷标、"."、".."、位图等系统目录项固定在最前面
+
+
+class DirectoryTable(NamedTuple):
+    """一个目录的目录表"""
+    extents: List[Tuple[int, int]]  # 目录表在卷中的 (偏移, 长度)
+    data: bytes
+    records: List[DirRecord]
+    dropped: int                    # 已删除或孤立的目录项数量（重写时会被清除）
+
+
+def _lfn_checksum(short_name: bytes) -> int:
+    total = 0
+    for byte in short_name:
+        total = (((total & 1) << 7) + (total >> 1) + byte) & 0xFF
+    return total
+
+
+def _exfat_checksum(entry_set: bytes) -> int:
+    total = 0
+    for index, byte in enumerate(entry_set):
+        if index in (2, 3):
+            continue
+        total = (((total << 15) | (total >> 1)) + byte) & 0xFFFF
+    return total
+
+
+def _lfn_chars(entry: bytes) -> str:
+    raw = entry[1:11] + entry[14:26] + entry[28:32]
+    text = raw.decode("utf-16-le", errors="replace")
+    end = text.find("\x00")
+    return text if end < 0 else text[:end]
+
+
+def _short_name(entry: bytes, encoding: str) -> str:
+    base = bytearray(entry[0:8])
+    if base[0] == 0x05:
+        base[0] = _DELETED  # 0x05 表示首字节实际为 0xE5
+    name = bytes(base).rstrip(b" ").decode(encoding, errors="replace")
+    ext = entry[8:11].rstrip(b" ").decode(encoding, errors="replace")
+    case = entry[12]
+    if case & 0x08:
+        name = name.lower()
+    if case & 0x10:
+        ext = ext.lower()
+    return f"{name}.{ext}" if ext else name
+
+
+class FatVolume:
+    """FAT16 / FAT32 / exFAT 卷
+
+    fileobj 需要支持 seek/read（以及写入时的 write），通常以 buffering=0 打开。
+    oem_encoding 用于解码没有长文件名的 8.3 短文件名（中文 Windows 为 GBK）。
+    """
+
+    def __init__(self, fileobj: BinaryIO, writable: bool = False, oem_encoding: str = "gbk"):
+        self.f = fileobj
+        self.writable = writable
+        self.oem_encoding = oem_encoding
+        self.sector_size = 512
+        self._fat_cache: Dict[int, bytes] = {}
+        self._parse_boot_sector()
+
+    @classmethod
+    def open(cls, path: str, writable: bool = False, **kwargs) -> "FatVolume":
+        """打开镜像文件（或 Linux 下的块设备）"""
+        return cls(open(path, "r+b" if writable else "rb", buffering=0), writable, **kwargs)
+
+    def close(self):
+        self.f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    # ---- 底层读写（按扇区对齐） ----
+
+    def _read(self, offset: int, length: int) -> bytes:
+        start = offset - offset % self.sector_size
+        end = -(-(offset + length) // self.sector_size) * self.sector_size
+        self.f.seek(start)
+        data = self.f.read(end - start)
+        return data[offset - start:offset - start + length]
+
+    def _write(self, offset: int, data: bytes):
+        if not self.writable:
+            raise PermissionError("卷以只读方式打开")
+        if offset % self.sector_size or len(data) % self.sector_size:
+            raise ValueError("写入位置和长度必须按扇区对齐")
+        self.f.seek(offset)
+        view = memoryview(data)
+        while view:
+            written = self.f.write(view)
+            view = view[written:]
+
+    def flush(self):
+        self.f.flush()
+        try:
+            os.fsync(self.f.fileno())
+        except (OSError, ValueError):
+            pass  # Windows 原始设备句柄不支持 fsync，卸载卷时会写回
+
+    # ---- 引导扇区 ----
+
+    def _parse_boot_sector(self):
+        self.f.seek(0)
+        boot = self.f.read(4096)  # 扇区大小未知，按最大扇区读取，保证原始设备上的读取对齐
+        if len(boot) < 512:
+            raise ValueError("不是有效的 FAT 卷：引导扇区不完整")
+        if boot[3:11] == b"EXFAT   ":
+            self._parse_exfat(boot)
+            return
+        if boot[510:512] != b"\x55\xaa":
+            raise ValueError("不是有效的 FAT 卷：缺少引导扇区签名")
+        (bytes_per_sector, sectors_per_cluster, reserved, fat_count, root_entries,
+         total16, _, fat_size16) = struct.unpack_from("<HBHBHHBH", boot, 11)
+        total32, fat_size32, _, _, root_cluster = struct.unpack_from("<IIHHI", boot, 32)
+        if bytes_per_sector not in (512, 1024, 2048, 4096) or sectors_per_cluster == 0 \
+                or sectors_per_cluster & (sectors_per_cluster - 1):
+            raise ValueError("不是有效的 FAT 卷：扇区或簇大小无效")
+        fat_size = fat_size16 or fat_size32
+        total_sectors = total16 or total32
+        root_dir_sectors = -(-root_entries * DIR_ENTRY_SIZE // bytes_per_sector)
+        first_data_sector = reserved + fat_count * fat_size + root_dir_sectors
+        self.cluster_count = (total_sectors - first_data_sector) // sectors_per_cluster
+        if self.cluster_count < 4085:
+            raise ValueError("不支持 FAT12 卷")
+        self.fs_type = "FAT16" if self.cluster_count < 65525 else "FAT32"
+        self.sector_size = bytes_per_sector
+        self.cluster_size = bytes_per_sector * sectors_per_cluster
+        self.fat_offset = reserved * bytes_per_sector
+        self.heap_offset = first_data_sector * bytes_per_sector
+        if self.fs_type == "FAT16":
+            self.root_cluster = 0
+            self.root_region = ((reserved + fat_count * fat_size) * bytes_per_sector,
+                                root_dir_sectors * bytes_per_sector)
+        else:
+            self.root_cluster = root_cluster
+            self.root_region = None
+
+    def _parse_exfat(self, boot: bytes):
+        fat_offset, _, heap_offset, cluster_count, root_cluster = struct.unpack_from("<IIIII", boot, 80)
+        sector_shift, cluster_shift = boot[108], boot[109]
+        if not 9 <= sector_shift <= 12 or sector_shift + cluster_shift > 25:
+            raise ValueError("不是有效的 exFAT 卷：扇区或簇大小无效")
+        self.fs_type = "exFAT"
+        self.sector_size = 1 << sector_shift
+        self.cluster_size = self.sector_size << cluster_shift
+        self.fat_offset = fat_offset * self.sector_size
+        self.heap_offset = heap_offset * self.sector_size
+        self.cluster_count = cluster_count
+        self.root_cluster = root_cluster
+        self.root_region = None
+
+    # ---- 簇链 ----
+
+    def cluster_offset(self, cluster: int) -> int:
+        if not 2 <= cluster < self.cluster_count + 2:
+            raise ValueError(f"簇号超出范围：{cluster}")
+        return self.heap_offset + (cluster - 2) * self.cluster_size
+
+    def _fat_entry(self, cluster: int) -> int:
+        width = 2 if self.fs_type == "FAT16" else 4
+        position = self.fat_offset + cluster * width
+        sector = position - position % self.sector_size
+        block = self._fat_cache.get(sector)
+        if block is None:
+            block = self._read(sector, self.sector_size)
+            self._fat_cache[sector] = block
+        value = int.from_bytes(block[position - sector:position - sector + width], "little")
+        if self.fs_type == "FAT32":
+            value &= 0x0FFFFFFF
+        return value
+
+    def _is_end(self, value: int) -> bool:
+        if self.fs_type == "FAT16":
+            return value >= 0xFFF8
+        if self.fs_type == "FAT32":
+            return value >= 0x0FFFFFF8
+        return value == 0xFFFFFFFF
+
+    def cluster_chain(self, first: int) -> List[int]:
+        """沿 FAT 表读取簇链"""
+        chain = []
+        cluster = first
+        while True:
+            if len(chain) > self.cluster_count:
+                raise ValueError("FAT 表中的簇链有环")
+            chain.append(cluster)
+            value = self._fat_entry(cluster)
+            if self._is_end(value):
+                return chain
+            if not 2 <= value < self.cluster_count + 2:
+                raise ValueError(f"簇链损坏：簇 {cluster} 指向 {value:#x}")
+            cluster = value
+
+    def _extents(self, clusters: List[int]) -> List[Tuple[int, int]]:
+        """把簇列表合并成连续的 (偏移, 长度) 区段"""
+        extents = []
+        for cluster in clusters:
+            offset = self.cluster_offset(cluster)
+            if extents and extents[-1][0] + extents[-1][1] == offset:
+                extents[-1] = (extents[-1][0], extents[-1][1] + self.cluster_size)
+            else:
+                extents.append((offset, self.cluster_size))
+        return extents
+
+    def _record_extents(self, record: DirRecord) -> List[Tuple[int, int]]:
+        if record.contiguous:
+            count = max(1, -(-record.size // self.cluster_size))
+            return self._extents(list(range(record.first_cluster, record.first_cluster + count)))
+        return self._extents(self.cluster_chain(record.first_cluster))
+
+    # ---- 目录表 ----
+
+    def _root_extents(self) -> List[Tuple[int, int]]:
+        if self.root_region is not None:
+            return [self.root_region]
+        return self._extents(self.cluster_chain(self.root_cluster))
+
+    def read_directory(self, path: str = "") -> DirectoryTable:
+        """读取目录表；path 为相对卷根目录的路径，"" 表示根目录"""
+        extents = self._root_extents()
+        table = self._load_table(extents)
+        for part in (p for p in path.replace("\\", "/").split("/") if p):
+            record = _find_record(table.records, part)
+            if record is None or not record.is_dir:
+                raise FileNotFoundError(f"目录不存在：{path}")
+            table = self._load_table(self._record_extents(record))
+        return table
+
+    def list_directory(self, path: str = "") -> List[DirRecord]:
+        """按目录项顺序返回目录中的文件和子目录（不含系统目录项）"""
+        return [record for record in self.read_directory(path).records if record.movable]
+
+    def _load_table(self, extents: List[Tuple[int, int]]) -> DirectoryTable:
+        data = b"".join(self._read(offset, length) for offset, length in extents)
+        if self.fs_type == "exFAT":
+            records, dropped = self._parse_exfat_entries(data)
+        else:
+            records, dropped = self._parse_fat_entries(data)
+        return DirectoryTable(extents, data, records, dropped)
+
+    def _parse_fat_entries(self, data: bytes) -> Tuple[List[DirRecord], int]:
+        records = []
+        dropped = 0
+        lfn = []  # 尚未匹配到短文件名目录项的长文件名目录项
+        for pos in range(0, len(data) - DIR_ENTRY_SIZE + 1, DIR_ENTRY_SIZE):
+            entry = data[pos:pos + DIR_ENTRY_SIZE]
+            if entry[0] == 0x00:
+                break
+            if entry[0] == _DELETED:
+                dropped += 1 + len(lfn)
+                lfn = []
+                continue
+            attr = entry[11]
+            if attr & 0x3F == _ATTR_LFN:
+                if entry[0] & 0x40:
+                    dropped += len(lfn)
+                    lfn = []
+                lfn.append(entry)
+                continue
+
+            long_name = None
+            if lfn:
+                checksum = _lfn_checksum(entry[0:11])
+                count = lfn[0][0] & 0x1F
+                ordinals = [e[0] & 0x1F for e in lfn]
+                if lfn[0][0] & 0x40 and ordinals == list(range(count, 0, -1)) \
+                        and all(e[13] == checksum for e in lfn):
+                    long_name = "".join(_lfn_chars(e) for e in reversed(lfn))
+                else:
+                    dropped += len(lfn)  # 与短文件名不匹配的孤立长文件名
+                    lfn = []
+            name = long_name or _short_name(entry, self.oem_encoding)
+            is_dir = bool(attr & _ATTR_DIRECTORY)
+            system = bool(attr & _ATTR_VOLUME_ID) or name in (".", "..")
+            first_cluster = (struct.unpack_from("<H", entry, 20)[0] << 16) | struct.unpack_from("<H", entry, 26)[0]
+            size = struct.unpack_from("<I", entry, 28)[0]
+            records.append(DirRecord(name, is_dir, size, first_cluster, False,
+                                     b"".join(lfn) + entry, not system))
+            lfn = []
+        return records, dropped + len(lfn)
+
+    def _parse_exfat_entries(self, data: bytes) -> Tuple[List[DirRecord], int]:
+        records = []
+        dropped = 0
+        pos = 0
+        while pos + DIR_ENTRY_SIZE <= len(data):
+            entry_type = data[pos]
+            if entry_type == 0x00:
+                break
+            if not entry_type & 0x80:
+                dropped += 1  # 未使用的目录项
+                pos += DIR_ENTRY_SIZE
+                continue
+            if entry_type == _EXFAT_FILE:
+                count = 1 + data[pos + 1]
+                entry_set = data[pos:pos + count * DIR_ENTRY_SIZE]
+                if count < 3 or len(entry_set) < count * DIR_ENTRY_SIZE \
+                        or struct.unpack_from("<H", entry_set, 2)[0] != _exfat_checksum(entry_set) \
+                        or entry_set[DIR_ENTRY_SIZE] != _EXFAT_STREAM:
+                    raise ValueError(f"exFAT 目录项集合损坏（偏移 {pos}），请先用磁盘检查修复")
+                stream = entry_set[DIR_ENTRY_SIZE:2 * DIR_ENTRY_SIZE]
+                name_length = stream[3]
+                name = b"".join(entry_set[i + 2:i + DIR_ENTRY_SIZE]
+                                for i in range(2 * DIR_ENTRY_SIZE, len(entry_set), DIR_ENTRY_SIZE)
+                                if entry_set[i] == _EXFAT_NAME)
+                name = name.decode("utf-16-le", errors="replace")[:name_length]
+                attributes = struct.unpack_from("<H", entry_set, 4)[0]
+                first_cluster, size = struct.unpack_from("<IQ", stream, 20)
+                records.append(DirRecord(name, bool(attributes & _ATTR_DIRECTORY), size, first_cluster,
+                                         bool(stream[1] & _EXFAT_NO_FAT_CHAIN), entry_set, True))
+            else:
+                # 位图、大写表、卷标等系统目录项（普通的主目录项可能带有次级目录项）
+                count = 1
+                if entry_type not in (0x81, 0x82, 0x83) and not entry_type & 0x40:
+                    count += data[pos + 1]
+                entry_set = data[pos:pos + count * DIR_ENTRY_SIZE]
+                records.append(DirRecord("", False, 0, 0, False, entry_set, False))
+            pos += len(entry_set)
+        return records, dropped
+
+    # ---- 重排 ----
+
+    def reorder_directory(self, path: str, names: Iterable[str],
+                          backup_path: Optional[str] = None) -> Tuple[List[str], List[str]]:
+        """按 names 的顺序重写目录表，不移动任何文件数据
+
+        names 中没有提到的文件按原有顺序排在后面；系统目录项保持在最前面；
+        已删除的目录项会被清除。backup_path 不为 None 时先把原目录表保存到该文件，
+        可用 restore_backup 恢复。返回 (新的文件顺序, names 中找不到的名称)。
+        """
+        started = time.perf_counter()
+        table = self.read_directory(path)
+        fixed = [record for record in table.records if not record.movable]
+        movable = [record for record in table.records if record.movable]
+        ordered, missing = order_records(movable, names)
+
+        new_data = b"".join(record.raw for record in fixed + ordered)
+        if len(new_data) > len(table.data):
+            raise ValueError("重排后的目录表超出原有大小")  # 只会删掉目录项，正常情况下不会发生
+        new_data += bytes(len(table.data) - len(new_data))
+
+        if new_data != table.data:
+            if backup_path:
+                self._save_backup(backup_path, table)
+            self._write_extents(table.extents, new_data)
+            self.flush()
+        tracer.file_op("fat_reorder.dir", path or "/", started, time.perf_counter() - started,
+                       len(table.data))
+        return [record.name for record in ordered], missing
+
+    def _write_extents(self, extents: List[Tuple[int, int]], data: bytes):
+        pos = 0
+        for offset, length in extents:
+            self._write(offset, data[pos:pos + length])
+            pos += length
+
+    def _save_backup(self, backup_path: str, table: DirectoryTable):
+        backup = {
+            "fs_type": self.fs_type,
+            "extents": table.extents,
+            "data": base64.b64encode(table.data).decode("ascii"),
+        }
+        with open(backup_path, "w", encoding="utf-8") as f:
+            json.dump(backup, f)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def restore_backup(self, backup_path: str):
+        """用 reorder_directory 保存的备份恢复目录表"""
+        with open(backup_path, "r", encoding="utf-8") as f:
+            backup = json.load(f)
+        if backup["fs_type"] != self.fs_type:
+            raise ValueError("备份与当前卷的文件系统类型不一致")
+        self._write_extents([tuple(extent) for extent in backup["extents"]],
+                            base64.b64decode(backup["data"]))
+        self.flush()
+
+
+def _find_record(records: List[DirRecord], name: str) -> Optional[DirRecord]:
+    folded = name.casefold()
+    fallback = None
+    for record in records:
+        if not record.movable:
+            continue
+        if record.name == name:
+            return record
+        if fallback is None and record.name.casefold() == folded:
+            fallback = record
+    return fallback
+
+
+def order_records(records: List[DirRecord], names: Iterable[str]) -> Tuple[List[DirRecord], List[str]]:
+    """按文件名列表排列目录记录（FAT 文件名不区分大小写），未提到的记录按原顺序排在最后"""
+    by_name = {}
+    by_folded = {}
+    for index, record in enumerate(records):
+        by_name.setdefault(record.name, index)
+        by_folded.setdefault(record.name.casefold(), index)
+    ordered = []
+    used = set()
+    missing = []
+    for name in names:
+        base = os.path.basename(name.replace("\\", "/"))
+        index = by_name.get(base)
+        if index is None:
+            index = by_folded.get(base.casefold())
+        if index is None:
+            missing.append(name)
+            continue
+        if index in used:
+            continue
+        used.add(index)
+        ordered.append(records[index])
+    ordered.extend(record for index, record in enumerate(records) if index not in used)
+    return ordered, missing
+
+
+def reorder_paths(volume: FatVolume, drive_root: str, paths: Iterable[str],
+                  backup_dir: Optional[str] = None) -> List[str]:
+    """按 paths 的顺序重排各文件所在目录的目录项
+
+    paths 是挂载在 drive_root 下的文件路径，按所在目录分组后分别重排，
+    组内保持 paths 中的相对顺序。返回找不到的路径。
+    """
+    groups: Dict[str, List[str]] = {}
+    for path in paths:
+        rel = os.path.relpath(path, drive_root)
+        directory, name = os.path.split(rel)
+        groups.setdefault("" if directory in ("", ".") else directory, []).append(name)
+
+    missing = []
+    with tracer.span("fat_reorder", directories=len(groups)):
+        for index, (directory, names) in enumerate(groups.items()):
+            backup_path = None
+            if backup_dir:
+                backup_path = os.path.join(backup_dir, f"{time.strftime('%Y%m%d_%H%M%S')}_{index}{BACKUP_SUFFIX}")
+            _, not_found = volume.reorder_directory(directory, names, backup_path)
+            missing.extend(os.path.join(drive_root, directory, name) for name in not_found)
+    return missing
@@ -1,24 +1,187 @@
 import os
 import shutil
-from typing import List, Tuple
+from typing import Callable, Iterable, List, Optional, Tuple
+
+from src.core.copy_engine import CopyEngine, CopyTask, StageReport
+from src.core.fat_image import FatImageBuilder, ImageFile, write_image_file
+from src.core.fat_volume import FatVolume, reorder_paths
+from src.core.instrumentation import tracer
+from src.core.metadata import load_tags, tag_sort_key
+from src.core.naming import target_names
+from src.core.rename_planner import RenameStep, plan_renames, rename_with_journal
+from src.core.scanner import MEDIA_EXTENSIONS, ScanEntry, iter_media_files
+from src.core.sort_engine import SortSpec, sort_entries
+from src.core.staging import StagingPlan, apply_staging, plan_staging
+from src.core.sync import SyncPlan, SyncTarget, apply_sync, plan_sync
+
 
 class FileManager:
-    def __init__(self):
+    """不依赖界面的文件处理引擎：扫描、排序、规划、重命名、备份、同步
+
+    界面（MainWindow）和命令行（python -m src.cli）都可以直接使用，
+    在 Linux 上也可以对普通目录操作。
+    """
+
+    def __init__(self, extensions: Tuple[str, ...] = MEDIA_EXTENSIONS,
+                 engine: Optional[CopyEngine] = None, index_path: Optional[str] = None):
         self.temp_dir = os.path.join(os.path.expanduser("~"), "UdiskMusicReOrder_temp")
+        self.extensions = extensions
+        self.engine = engine or CopyEngine()
+        self.index_path = index_path
 
-    def get_usb_drives(self) -> List[str]:
-        """获取系统中的U盘设备列表"""
-        # TODO: 实现U盘检测逻辑
-        return []
+    def get_usb_drives(self) -> List[dict]:
+        """获取系统中的U盘设备列表（Windows 与 Linux）"""
+        from src.core.usb_handler import USBHandler
+        return USBHandler.get_usb_drives()
 
     def load_files(self, drive_path: str) -> List[str]:
         """加载指定驱动器中的媒体文件"""
-        media_files = []
-        for root, _, files in os.walk(drive_path):
-            for file in files:
-                if file.lower().endswith(('.mp3', '.wav', '.flac', '.m4a')):
-                    media_files.append(os.path.join(root, file))
-        return media_files
+        return [entry.path for entry in self.scan(drive_path)]
+
+    def scan(self, drive_path: str) -> List[ScanEntry]:
+        """扫描驱动器中的媒体文件，按目录项顺序返回"""
+        with tracer.span("scan", root=drive_path):
+            return list(iter_media_files(drive_path, self.extensions))
+
+    # ---- 排序 ----
+
+    @staticmethod
+    def sort_by_prefix(entries: List[ScanEntry]) -> List[ScanEntry]:
+        """按文件名中的数字前缀排序，无前缀的按文件名自然顺序排在最后"""
+        return sort_entries(entries, "prefix,name")
+
+    @staticmethod
+    def sort_by_fields(entries: List[ScanEntry], spec: SortSpec) -> List[ScanEntry]:
+        """按字段组合排序，spec 如 "folder,prefix,name"、"-mtime,name"（见 sort_engine）"""
+        return sort_entries(entries, spec)
+
+    def sort_by_tags(self, entries: List[ScanEntry], kind: str, root: str,
+                     volume_key: Optional[str] = None) -> List[ScanEntry]:
+        """按标签排序，kind 为 metadata.SORT_KEYS 中的一种；有扫描索引时标签也缓存在同一个数据库中"""
+        tags = load_tags(entries, root, volume_key, self.index_path)
+        return sorted(entries, key=lambda entry: tag_sort_key(kind, tags.get(entry.path), entry.name))
+
+    @staticmethod
+    def order_by_list(entries: List[ScanEntry], names: Iterable[str]) -> Tuple[List[ScanEntry], List[str]]:
+        """按给定的文件名（或路径）列表排序
+
+        列表中没有提到的文件按原有顺序排在最后。返回 (排序结果, 列表中找不到的名称)。
+        """
+        by_path = {os.path.normcase(entry.path): entry for entry in entries}
+        by_name = {}
+        for entry in entries:
+            by_name.setdefault(entry.name, entry)
+        ordered = []
+        used = set()
+        missing = []
+        for name in names:
+            entry = by_path.get(os.path.normcase(name)) or by_name.get(os.path.basename(name))
+            if entry is None or id(entry) in used:
+                if entry is None:
+                    missing.append(name)
+                continue
+            used.add(id(entry))
+            ordered.append(entry)
+        ordered.extend(entry for entry in entries if id(entry) not in used)
+        return ordered, missing
+
+    @staticmethod
+    def read_order_file(path: str) -> List[str]:
+        """读取排序列表文件：每行一个文件名或路径，忽略空行和 # 开头的行"""
+        with open(path, "r", encoding="utf-8-sig") as f:
+            return [line.strip() for line in f if line.strip() and not line.lstrip().startswith("#")]
+
+    # ---- 规划 ----
+
+    @staticmethod
+    def plan_names(entries: List[ScanEntry]) -> List[str]:
+        """按顺序生成带行号的目标文件名"""
+        return target_names(entry.name for entry in entries)
+
+    def plan_rename(self, entries: List[ScanEntry]) -> List[RenameStep]:
+        """按行号原地重命名（文件留在各自目录中）的步骤"""
+        return plan_renames(self.rename_mapping(entries))
+
+    def rename_mapping(self, entries: List[ScanEntry]) -> List[Tuple[str, str]]:
+        """按行号原地重命名的 旧路径→新路径 映射（已省略名称不变的文件）"""
+        mapping = []
+        for entry, new_name in zip(entries, self.plan_names(entries)):
+            new_path = os.path.join(os.path.dirname(entry.path), new_name)
+            if new_path != entry.path:
+                mapping.append((entry.path, new_path))
+        return mapping
+
+    def plan_sync(self, drive_path: str, entries: List[ScanEntry],
+                  existing: Optional[List[ScanEntry]] = None, use_hash: bool = False) -> SyncPlan:
+        """把 entries 按顺序同步到 drive_path 根目录的计划
+
+        entries 可以来自U盘本身（只需重命名），也可以来自其他目录（需要复制的部分）。
+        """
+        if existing is None:
+            existing = self.scan(drive_path)
+        targets = [SyncTarget(name, entry.path, entry.path)
+                   for entry, name in zip(entries, self.plan_names(entries))]
+        return plan_sync(drive_path, targets, [(e.path, e.size) for e in existing], use_hash=use_hash)
+
+    def plan_staging(self, drive_path: str, entries: List[ScanEntry]) -> StagingPlan:
+        """在U盘内移动文件、按顺序放回 drive_path 根目录（使用带行号的新文件名）的计划"""
+        return plan_staging(drive_path, [(entry.path, name)
+                                         for entry, name in zip(entries, self.plan_names(entries))])
+
+    # ---- 执行 ----
+
+    def rename(self, drive_path: str, entries: List[ScanEntry],
+               progress: Optional[Callable[[int, int], None]] = None) -> List[RenameStep]:
+        """按行号原地重命名，日志写在 drive_path 中，中断后可继续或回滚"""
+        return rename_with_journal(self.rename_mapping(entries), drive_path, progress=progress)
+
+    def backup(self, entries: List[ScanEntry], backup_dir: str,
+               progress: Optional[Callable[[int, int, int, int, str], None]] = None) -> StageReport:
+        """按目标文件名把文件备份到 backup_dir"""
+        os.makedirs(backup_dir, exist_ok=True)
+        tasks = [CopyTask(entry.path, os.path.join(backup_dir, name), entry.size)
+                 for entry, name in zip(entries, self.plan_names(entries))]
+        return self.engine.copy(tasks, "backup", progress=progress)
+
+    def sync(self, plan: SyncPlan, drive_path: str,
+             progress: Optional[Callable[[str, int, int], None]] = None) -> StageReport:
+        """执行同步计划"""
+        return apply_sync(plan, self.engine, progress, journal_dir=drive_path)
+
+    def stage(self, plan: StagingPlan, drive_path: str,
+              progress: Optional[Callable[[str, int, int], None]] = None) -> StageReport:
+        """执行同盘暂存重排，日志写在 drive_path 中"""
+        return apply_staging(plan, self.engine, progress, journal_dir=drive_path)
+
+    def reorder_in_place(self, drive_path: str, entries: List[ScanEntry], volume: Optional[str] = None,
+                         backup_dir: Optional[str] = None) -> List[str]:
+        """按 entries 的顺序直接重写 FAT16/FAT32/exFAT 目录表，不复制也不重命名任何文件
+
+        volume 为卷的镜像文件或设备路径（drive_path 是它的挂载点）；为 None 时在 Windows 上
+        锁定 drive_path 所在的卷。backup_dir 不为 None 时先在其中保存原目录表。
+        返回找不到的文件路径。
+        """
+        paths = [entry.path for entry in entries]
+        if volume:
+            with FatVolume.open(volume, writable=True) as fat:
+                missing = reorder_paths(fat, drive_path, paths, backup_dir)
+        else:
+            from src.core.usb_handler import USBHandler
+            with USBHandler.locked_volume(drive_path) as raw:
+                missing = reorder_paths(FatVolume(raw, writable=True), drive_path, paths, backup_dir)
+        return missing
+
+    def write_image(self, entries: List[ScanEntry], target: str, total_size: int, cluster_size: int,
+                    label: str = "NO NAME", verify: bool = True,
+                    progress: Optional[Callable[[str, int, int], None]] = None) -> FatImageBuilder:
+        """把 entries 按顺序（使用带行号的新文件名）写成一个 total_size 字节的 FAT32 镜像文件"""
+        files = [ImageFile(entry.path, name, entry.size, entry.mtime)
+                 for entry, name in zip(entries, self.plan_names(entries))]
+        builder = FatImageBuilder(files, total_size, cluster_size, label)
+        write_image_file(target, builder, total_size, progress=progress, verify=verify)
+        return builder
+
+    # ---- 旧接口 ----
 
     def prepare_temp_directory(self):
         """准备临时目录"""
@@ -26,13 +189,16 @@ class FileManager:
             shutil.rmtree(self.temp_dir)
         os.makedirs(self.temp_dir)
 
-    def copy_files_with_order(self, files: List[Tuple[str, str]], target_drive: str, 
+    def copy_files_with_order(self, files: List[Tuple[str, str]], target_drive: str,
                             progress_callback=None):
         """按顺序复制文件到目标驱动器"""
         total_files = len(files)
-        for index, (src, filename) in enumerate(files, 1):
-            new_name = f"{index}. {filename}"
-            dst = os.path.join(target_drive, new_name)
-            shutil.copy2(src, dst)
+        tasks = CopyEngine.make_tasks(
+            (src, os.path.join(target_drive, f"{index}. {filename}"))
+            for index, (src, filename) in enumerate(files, 1))
+
+        def on_progress(done, total, done_bytes, total_bytes, name):
             if progress_callback:
-                progress_callback(index / total_files * 100)
\ No newline at end of file
+                progress_callback(done / total_files * 100)
+
+        self.engine.copy(tasks, "copy", progress=on_progress)
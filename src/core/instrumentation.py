@@ -0,0 +1,166 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+DEFAULT_SLOW_THRESHOLD = 2.0   # 单个文件操作超过多少秒记为慢操作
+MAX_EVENTS = 200000            # 内存中最多保留的事件数
+
+
+class Tracer:
+    """轻量的耗时统计
+
+    - span()：记录一段操作的开始时间和耗时（扫描、解析、备份、删除、复制回、重命名等）；
+    - count()：累加字节数、文件数等计数器；
+    - file_op()：记录单个文件操作，超过阈值时记为慢操作；
+    - event()：记录失败等瞬时事件。
+
+    结果可以汇总显示，也可以导出为 JSON 或 Chrome Trace（chrome://tracing、Perfetto 可直接打开）。
+    """
+
+    def __init__(self, slow_threshold: float = DEFAULT_SLOW_THRESHOLD, max_events: int = MAX_EVENTS):
+        self.slow_threshold = slow_threshold
+        self.enabled = True
+        self._lock = threading.Lock()
+        self._events = deque(maxlen=max_events)
+        self._slow_ops = deque(maxlen=1000)
+        self._counters: Dict[str, float] = {}
+        self._totals: Dict[str, list] = {}  # 名称 -> [次数, 总耗时, 最大耗时]
+        self._origin = time.perf_counter()
+        self._origin_wall = time.time()
+
+    def reset(self):
+        with self._lock:
+            self._events.clear()
+            self._slow_ops.clear()
+            self._counters.clear()
+            self._totals.clear()
+            self._origin = time.perf_counter()
+            self._origin_wall = time.time()
+
+    def record(self, name: str, start: float, duration: float, category: str = "stage",
+               args: Optional[dict] = None):
+        """记录一段已完成的操作；start 为 time.perf_counter() 时间"""
+        with self._lock:
+            self._events.append((name, category, start - self._origin, duration,
+                                 threading.get_ident(), args or {}))
+            total = self._totals.get(name)
+            if total is None:
+                self._totals[name] = [1, duration, duration]
+            else:
+                total[0] += 1
+                total[1] += duration
+                if duration > total[2]:
+                    total[2] = duration
+
+    @contextmanager
+    def span(self, name: str, category: str = "stage", **args):
+        """记录 with 块的耗时"""
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, start, time.perf_counter() - start, category, args)
+
+    def count(self, name: str, value: float = 1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def file_op(self, name: str, path: str, start: float, duration: float, nbytes: int = 0):
+        """记录单个文件操作；start 为 time.perf_counter() 时间"""
+        if not self.enabled:
+            return
+        self.record(name, start, duration, "file", {"path": path, "bytes": nbytes})
+        if duration >= self.slow_threshold:
+            with self._lock:
+                self._slow_ops.append({"op": name, "path": path, "seconds": duration, "bytes": nbytes})
+
+    def event(self, name: str, **args):
+        """记录瞬时事件（例如失败）"""
+        if not self.enabled:
+            return
+        self.record(name, time.perf_counter(), 0.0, "event", args)
+        self.count(f"{name}.count")
+
+    # ---- 汇总与导出 ----
+
+    def summary(self) -> dict:
+        with self._lock:
+            spans = {name: {"count": count, "total": total, "max": longest}
+                     for name, (count, total, longest) in self._totals.items()}
+            return {
+                "spans": spans,
+                "counters": dict(self._counters),
+                "slow_ops": list(self._slow_ops),
+            }
+
+    def format_summary(self) -> str:
+        """供统计面板显示的文本"""
+        summary = self.summary()
+        lines = []
+        for name, span in sorted(summary["spans"].items(), key=lambda item: -item[1]["total"]):
+            lines.append(f"{name}: {span['count']} 次，共 {span['total']:.3f}s，最长 {span['max']:.3f}s")
+        if summary["counters"]:
+            lines.append("")
+            for name, value in sorted(summary["counters"].items()):
+                if name.endswith("bytes"):
+                    lines.append(f"{name}: {value / (1024 * 1024):.1f}MB")
+                elif name.endswith("seconds"):
+                    lines.append(f"{name}: {value:.3f}s")
+                else:
+                    lines.append(f"{name}: {value:g}")
+        if summary["slow_ops"]:
+            lines.append("")
+            lines.append(f"慢操作（≥{self.slow_threshold:g}s）：")
+            for op in summary["slow_ops"][-20:]:
+                lines.append(f"  {op['op']} {os.path.basename(op['path'])} {op['seconds']:.2f}s")
+        return "\n".join(lines) if lines else "暂无统计数据"
+
+    def to_dict(self) -> dict:
+        data = self.summary()
+        with self._lock:
+            data["events"] = [
+                {"name": name, "category": category, "start": start, "duration": duration,
+                 "thread": thread, "args": args}
+                for name, category, start, duration, thread, args in self._events
+            ]
+        data["started_at"] = self._origin_wall
+        return data
+
+    def export_json(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+
+    def export_chrome_trace(self, path: str):
+        """导出为 Chrome Trace Event 格式"""
+        pid = os.getpid()
+        trace_events = []
+        with self._lock:
+            events = list(self._events)
+            counters = dict(self._counters)
+        for name, category, start, duration, thread, args in events:
+            event = {"name": name, "cat": category, "ts": start * 1e6, "pid": pid, "tid": thread,
+                     "args": args}
+            if category == "event":
+                event.update(ph="i", s="t")
+            else:
+                event.update(ph="X", dur=duration * 1e6)
+            trace_events.append(event)
+        last = max((e[2] + e[3] for e in events), default=0.0)
+        for name, value in counters.items():
+            trace_events.append({"name": name, "ph": "C", "ts": last * 1e6, "pid": pid,
+                                 "args": {"value": value}})
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": trace_events, "displayTimeUnit": "ms"}, f, ensure_ascii=False)
+
+
+# 全局默认实例，各模块直接使用
+tracer = Tracer()
@@ -0,0 +1,578 @@
+"""读取音频文件的标签（音轨号、碟号、专辑、艺术家、标题、时长），用于按标签排序
+
+只读取文件头部（以及 ID3v1 所在的最后 128 字节）中需要的部分：各解析器按标签结构逐块定位，
+封面图片等大块数据直接跳过，不会读入整个文件。支持：
+- MP3：ID3v2.2/2.3/2.4、ID3v1，时长取 TLEN 帧、Xing/Info/VBRI 头或按码率估算；
+- FLAC：STREAMINFO 和 Vorbis comment；
+- M4A/MP4：moov/mvhd 和 moov/udta/meta/ilst；
+- WMA/WMV：ASF 头对象中的文件属性、内容描述和扩展内容描述。
+
+许多文件分散在U盘的不同位置，读取主要耗在等待 I/O 上，因此用线程池并行读取。
+结果按卷保存在 SQLite 缓存中，以 (卷标识, 相对路径) 为键，文件大小和 mtime 不变时直接使用缓存。
+"""
+import io
+import os
+import re
+import sqlite3
+import struct
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import BinaryIO, Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from src.core.instrumentation import tracer
+from src.core.scanner import ScanEntry
+from src.core.sort_engine import natural_key
+
+DEFAULT_WORKERS = 8
+ID3_READ_LIMIT = 1024 * 1024   # 整体反同步的 ID3 标签最多读入的字节数
+MAX_TEXT_SIZE = 64 * 1024      # 单个文本字段（帧、原子、描述符）的上限，更大的视为图片等数据跳过
+MPEG_SYNC_SEARCH = 16 * 1024   # 在标签之后查找第一个 MPEG 帧头的范围
+
+
+class TrackInfo(NamedTuple):
+    """标签信息，缺失的字段为空字符串或 None"""
+    title: str = ""
+    artist: str = ""
+    album: str = ""
+    track: Optional[int] = None
+    disc: Optional[int] = None
+    duration: Optional[float] = None  # 秒
+
+
+EMPTY_INFO = TrackInfo()
+
+
+def _number(value) -> Optional[int]:
+    """"3/12"、"03" -> 3"""
+    if isinstance(value, int):
+        return value or None
+    match = re.match(r"\s*(\d+)", value or "")
+    return int(match.group(1)) if match else None
+
+
+def _info(fields: dict) -> TrackInfo:
+    def text(key):
+        value = fields.get(key)
+        return str(value).strip() if value else ""
+    return TrackInfo(text("title"), text("artist"), text("album"), _number(fields.get("track")),
+                     _number(fields.get("disc")), fields.get("duration"))
+
+
+def _decode_legacy(raw: bytes) -> str:
+    """ID3 中标为 ISO-8859-1 的文本实际上常常是 GBK 或 UTF-8"""
+    for encoding in ("utf-8", "gbk"):
+        try:
+            return raw.decode(encoding)
+        except UnicodeDecodeError:
+            pass
+    return raw.decode("latin-1")
+
+
+# ---- MP3 ----
+
+_ID3_FRAMES = {
+    "TIT2": "title", "TPE1": "artist", "TALB": "album", "TRCK": "track", "TPOS": "disc", "TLEN": "length",
+    "TT2": "title", "TP1": "artist", "TAL": "album", "TRK": "track", "TPA": "disc", "TLE": "length",
+}
+
+
+def _syncsafe(data: bytes) -> int:
+    return (data[0] & 0x7F) << 21 | (data[1] & 0x7F) << 14 | (data[2] & 0x7F) << 7 | (data[3] & 0x7F)
+
+
+def _id3_text(data: bytes) -> str:
+    if not data:
+        return ""
+    encoding, raw = data[0], data[1:]
+    if encoding == 1:
+        text = raw.decode("utf-16", "replace")
+    elif encoding == 2:
+        text = raw.decode("utf-16-be", "replace")
+    elif encoding == 3:
+        text = raw.decode("utf-8", "replace")
+    else:
+        text = _decode_legacy(raw.split(b"\0")[0])
+    return text.split("\0")[0]
+
+
+def _read_id3v2(f: BinaryIO, fields: dict) -> int:
+    """解析文件开头的 ID3v2 标签，返回标签之后音频数据的偏移（没有标签时为 0）"""
+    f.seek(0)
+    header = f.read(10)
+    if len(header) < 10 or header[:3] != b"ID3":
+        return 0
+    major, flags = header[3], header[5]
+    size = _syncsafe(header[6:10])
+    audio_start = 10 + size + (10 if flags & 0x10 else 0)
+    if major not in (2, 3, 4):
+        return audio_start
+
+    source, pos, end = f, 10, 10 + size
+    if flags & 0x80 and major < 4:
+        # 整个标签做了反同步处理：读入内存还原后再解析
+        source = io.BytesIO(f.read(min(size, ID3_READ_LIMIT)).replace(b"\xff\x00", b"\xff"))
+        pos, end = 0, len(source.getvalue())
+    if flags & 0x40 and major >= 3:
+        source.seek(pos)
+        ext = source.read(4)
+        pos += _syncsafe(ext) if major == 4 else struct.unpack(">I", ext)[0] + 4
+
+    id_len, header_len = (3, 6) if major == 2 else (4, 10)
+    while pos + header_len <= end:
+        source.seek(pos)
+        frame_header = source.read(header_len)
+        frame_id = frame_header[:id_len]
+        if not frame_id.strip(b"\0") or not frame_id.isalnum():
+            break  # 填充区
+        if major == 2:
+            frame_size = int.from_bytes(frame_header[3:6], "big")
+            frame_flags = 0
+        elif major == 3:
+            frame_size = struct.unpack(">I", frame_header[4:8])[0]
+            frame_flags = frame_header[9] & 0xC0  # 压缩、加密
+        else:
+            frame_size = _syncsafe(frame_header[4:8])
+            frame_flags = frame_header[9]
+        pos += header_len
+        key = _ID3_FRAMES.get(frame_id.decode("latin-1"))
+        if key and key not in fields and frame_size <= MAX_TEXT_SIZE:
+            data = source.read(frame_size)
+            if major == 4:
+                if frame_flags & 0x0C:
+                    data = None  # 压缩或加密的帧不处理
+                else:
+                    if frame_flags & 0x02:
+                        data = data.replace(b"\xff\x00", b"\xff")
+                    if frame_flags & 0x01:
+                        data = data[4:]  # 数据长度指示
+            elif frame_flags:
+                data = None
+            if data:
+                fields[key] = _id3_text(data)
+        pos += frame_size
+    return audio_start
+
+
+def _read_id3v1(f: BinaryIO, size: int, fields: dict) -> bool:
+    """文件末尾的 ID3v1 标签只补充 ID3v2 中没有的字段，返回是否存在"""
+    if size < 128:
+        return False
+    f.seek(size - 128)
+    data = f.read(128)
+    if data[:3] != b"TAG":
+        return False
+    for key, start in (("title", 3), ("artist", 33), ("album", 63)):
+        text = _decode_legacy(data[start:start + 30].split(b"\0")[0]).strip()
+        if text and not fields.get(key):
+            fields[key] = text
+    if data[125] == 0 and data[126] and "track" not in fields:
+        fields["track"] = data[126]  # ID3v1.1
+    return True
+
+
+_MPEG_BITRATES = {
+    (3, 3): (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+    (3, 2): (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    (3, 1): (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    (2, 3): (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    (2, 2): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    (2, 1): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+_MPEG_SAMPLE_RATES = {3: (44100, 48000, 32000), 2: (22050, 24000, 16000), 0: (11025, 12000, 8000)}
+
+
+def _mpeg_duration(f: BinaryIO, audio_start: int, audio_end: int) -> Optional[float]:
+    """根据第一个 MPEG 帧（及其中的 Xing/Info/VBRI 头）计算时长"""
+    f.seek(audio_start)
+    data = f.read(MPEG_SYNC_SEARCH)
+    pos = data.find(b"\xff")
+    while 0 <= pos < len(data) - 4:
+        b1, b2, b3 = data[pos + 1], data[pos + 2], data[pos + 3]
+        version, layer = (b1 >> 3) & 3, (b1 >> 1) & 3
+        bitrate_index, rate_index = b2 >> 4, (b2 >> 2) & 3
+        if (b1 & 0xE0) == 0xE0 and version != 1 and layer and bitrate_index not in (0, 15) and rate_index != 3:
+            break
+        pos = data.find(b"\xff", pos + 1)
+    else:
+        return None
+    sample_rate = _MPEG_SAMPLE_RATES[version][rate_index]
+    bitrate = _MPEG_BITRATES[(3 if version == 3 else 2, layer)][bitrate_index] * 1000
+    samples = 384 if layer == 3 else (1152 if layer == 2 or version == 3 else 576)
+
+    mono = (b3 >> 6) == 3
+    side_info = (17 if mono else 32) if version == 3 else (9 if mono else 17)
+    xing = pos + 4 + side_info
+    frames = None
+    if data[xing:xing + 4] in (b"Xing", b"Info"):
+        flags = struct.unpack(">I", data[xing + 4:xing + 8])[0]
+        if flags & 1:
+            frames = struct.unpack(">I", data[xing + 8:xing + 12])[0]
+    elif data[pos + 36:pos + 40] == b"VBRI":
+        frames = struct.unpack(">I", data[pos + 50:pos + 54])[0]
+    if frames:
+        return frames * samples / sample_rate
+    return (audio_end - audio_start - pos) * 8 / bitrate
+
+
+def _parse_mp3(f: BinaryIO, size: int, fields: dict):
+    audio_start = _read_id3v2(f, fields)
+    has_v1 = _read_id3v1(f, size, fields)
+    length = _number(fields.pop("length", ""))
+    if length:
+        fields["duration"] = length / 1000
+    else:
+        fields["duration"] = _mpeg_duration(f, audio_start, size - (128 if has_v1 else 0))
+
+
+# ---- FLAC ----
+
+_VORBIS_FIELDS = {"TITLE": "title", "ARTIST": "artist", "ALBUM": "album",
+                  "TRACKNUMBER": "track", "DISCNUMBER": "disc"}
+
+
+def _parse_flac(f: BinaryIO, size: int, fields: dict):
+    pos = _read_id3v2(f, {})
+    f.seek(pos)
+    if f.read(4) != b"fLaC":
+        raise ValueError("不是 FLAC 文件")
+    pos += 4
+    while True:
+        f.seek(pos)
+        header = f.read(4)
+        if len(header) < 4:
+            break
+        kind, length = header[0] & 0x7F, int.from_bytes(header[1:4], "big")
+        if kind == 0:
+            data = f.read(length)
+            sample_rate = data[10] << 12 | data[11] << 4 | data[12] >> 4
+            total_samples = (data[13] & 0x0F) << 32 | struct.unpack(">I", data[14:18])[0]
+            if sample_rate and total_samples:
+                fields["duration"] = total_samples / sample_rate
+        elif kind == 4 and length <= MAX_TEXT_SIZE * 4:
+            data = f.read(length)
+            vendor_length = struct.unpack("<I", data[:4])[0]
+            offset = 4 + vendor_length
+            count = struct.unpack("<I", data[offset:offset + 4])[0]
+            offset += 4
+            for _ in range(count):
+                item_length = struct.unpack("<I", data[offset:offset + 4])[0]
+                item = data[offset + 4:offset + 4 + item_length].decode("utf-8", "replace")
+                offset += 4 + item_length
+                name, _, value = item.partition("=")
+                key = _VORBIS_FIELDS.get(name.upper())
+                if key and key not in fields:
+                    fields[key] = value
+        pos += 4 + length
+        if header[0] & 0x80:
+            break  # 最后一个元数据块
+
+
+# ---- M4A / MP4 ----
+
+_MP4_ITEMS = {b"\xa9nam": "title", b"\xa9ART": "artist", b"\xa9alb": "album", b"trkn": "track", b"disk": "disc"}
+
+
+def _boxes(f: BinaryIO, start: int, end: int) -> Iterator[Tuple[bytes, int, int]]:
+    """(类型, 内容起点, 内容终点)，只读取各原子的头部"""
+    pos = start
+    while pos + 8 <= end:
+        f.seek(pos)
+        size, kind = struct.unpack(">I4s", f.read(8))
+        offset = 8
+        if size == 1:
+            size = struct.unpack(">Q", f.read(8))[0]
+            offset = 16
+        elif size == 0:
+            size = end - pos
+        if size < offset:
+            return
+        yield kind, pos + offset, min(pos + size, end)
+        pos += size
+
+
+def _parse_ilst(f: BinaryIO, start: int, end: int, fields: dict):
+    for kind, item_start, item_end in _boxes(f, start, end):
+        key = _MP4_ITEMS.get(kind)
+        if key is None:
+            continue
+        for data_kind, data_start, data_end in _boxes(f, item_start, item_end):
+            if data_kind != b"data" or data_end - data_start > MAX_TEXT_SIZE:
+                continue
+            f.seek(data_start)
+            value = f.read(data_end - data_start)[8:]  # 类型标志 4 字节 + 区域 4 字节
+            if key in ("track", "disc"):
+                if len(value) >= 4:
+                    fields[key] = struct.unpack(">H", value[2:4])[0]
+            else:
+                fields[key] = value.decode("utf-8", "replace")
+            break
+
+
+def _parse_mp4(f: BinaryIO, size: int, fields: dict):
+    for kind, start, end in _boxes(f, 0, size):
+        if kind != b"moov":
+            continue  # mdat 等直接跳过
+        for child, child_start, child_end in _boxes(f, start, end):
+            if child == b"mvhd":
+                f.seek(child_start)
+                data = f.read(32)
+                if data[0] == 1:
+                    timescale, duration = struct.unpack(">IQ", data[20:32])
+                else:
+                    timescale, duration = struct.unpack(">II", data[12:20])
+                if timescale:
+                    fields["duration"] = duration / timescale
+            elif child == b"udta":
+                for meta, meta_start, meta_end in _boxes(f, child_start, child_end):
+                    if meta == b"meta":
+                        for ilst, ilst_start, ilst_end in _boxes(f, meta_start + 4, meta_end):
+                            if ilst == b"ilst":
+                                _parse_ilst(f, ilst_start, ilst_end, fields)
+        return
+    raise ValueError("没有找到 moov 原子")
+
+
+# ---- WMA / WMV (ASF) ----
+
+_ASF_HEADER = uuid.UUID("75B22630-668E-11CF-A6D9-00AA0062CE6C").bytes_le
+_ASF_FILE_PROPERTIES = uuid.UUID("8CABDCA1-A947-11CF-8EE4-00C00C205365").bytes_le
+_ASF_CONTENT_DESCRIPTION = uuid.UUID("75B22633-668E-11CF-A6D9-00AA0062CE6C").bytes_le
+_ASF_EXTENDED_CONTENT = uuid.UUID("D2D0A440-E307-11D2-97F0-00A0C95EA850").bytes_le
+_ASF_FIELDS = {"WM/AlbumTitle": "album", "WM/TrackNumber": "track", "WM/Track": "track0",
+               "WM/PartOfSet": "disc", "WM/AlbumArtist": "album_artist"}
+
+
+def _asf_value(kind: int, raw: bytes):
+    if kind == 0:
+        return raw.decode("utf-16-le", "replace").rstrip("\0")
+    if kind in (2, 3):
+        return struct.unpack("<I", raw[:4])[0]
+    if kind == 4:
+        return struct.unpack("<Q", raw[:8])[0]
+    if kind == 5:
+        return struct.unpack("<H", raw[:2])[0]
+    return None
+
+
+def _parse_asf(f: BinaryIO, size: int, fields: dict):
+    header = f.read(30)
+    if header[:16] != _ASF_HEADER:
+        raise ValueError("不是 ASF 文件")
+    header_size, count = struct.unpack("<QI", header[16:28])
+    pos, end = 30, min(header_size, size)
+    for _ in range(count):
+        if pos + 24 > end:
+            break
+        f.seek(pos)
+        guid, object_size = struct.unpack("<16sQ", f.read(24))
+        if object_size < 24:
+            break
+        if guid == _ASF_FILE_PROPERTIES:
+            data = f.read(80)
+            play_duration, _, preroll = struct.unpack("<QQQ", data[40:64])
+            fields["duration"] = max(play_duration / 1e7 - preroll / 1000, 0.0)
+        elif guid == _ASF_CONTENT_DESCRIPTION and object_size <= MAX_TEXT_SIZE:
+            data = f.read(object_size - 24)
+            lengths = struct.unpack("<5H", data[:10])
+            offset = 10
+            for key, length in zip(("title", "artist"), lengths):
+                fields[key] = data[offset:offset + length].decode("utf-16-le", "replace").rstrip("\0")
+                offset += length
+        elif guid == _ASF_EXTENDED_CONTENT:
+            descriptors = struct.unpack("<H", f.read(2))[0]
+            item = pos + 26
+            for _ in range(descriptors):
+                f.seek(item)
+                name_length = struct.unpack("<H", f.read(2))[0]
+                name = f.read(name_length).decode("utf-16-le", "replace").rstrip("\0")
+                value_kind, value_length = struct.unpack("<HH", f.read(4))
+                key = _ASF_FIELDS.get(name)
+                if key and value_length <= MAX_TEXT_SIZE:
+                    fields[key] = _asf_value(value_kind, f.read(value_length))
+                item += 2 + name_length + 4 + value_length
+        pos += object_size
+    if "track" not in fields and fields.get("track0") is not None:
+        fields["track"] = _number(str(fields["track0"])) + 1  # WM/Track 从 0 开始
+    if not fields.get("artist") and fields.get("album_artist"):
+        fields["artist"] = fields["album_artist"]
+
+
+_PARSERS = {
+    ".mp3": _parse_mp3,
+    ".flac": _parse_flac,
+    ".m4a": _parse_mp4, ".mp4": _parse_mp4, ".m4b": _parse_mp4, ".mov": _parse_mp4,
+    ".wma": _parse_asf, ".wmv": _parse_asf, ".asf": _parse_asf,
+}
+
+
+def read_tags(path: str) -> Optional[TrackInfo]:
+    """读取单个文件的标签；不支持的格式或无法解析的标签返回空的 TrackInfo，无法读取文件时返回 None"""
+    parser = _PARSERS.get(os.path.splitext(path)[1].lower())
+    if parser is None:
+        return EMPTY_INFO
+    fields = {}
+    try:
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            try:
+                parser(f, size, fields)
+            except (ValueError, struct.error, IndexError, KeyError, TypeError) as e:
+                tracer.event("metadata.parse_failed", path=path, error=str(e))
+    except OSError as e:
+        tracer.event("metadata.failed", path=path, error=str(e))
+        return None
+    return _info(fields)
+
+
+# ---- 缓存 ----
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tags (
+    volume_key TEXT NOT NULL,
+    rel_path TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    title TEXT NOT NULL,
+    artist TEXT NOT NULL,
+    album TEXT NOT NULL,
+    track INTEGER,
+    disc INTEGER,
+    duration REAL,
+    PRIMARY KEY (volume_key, rel_path)
+);
+"""
+
+
+class MetadataCache:
+    """按卷持久化的标签缓存，文件大小和 mtime 都没变时才使用缓存的结果"""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path)
+        self.conn.executescript(_SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def lookup(self, volume_key: str, items: List[Tuple[str, ScanEntry]]) -> Dict[str, TrackInfo]:
+        """items 为 [(相对路径, ScanEntry)]，返回 路径 -> TrackInfo（只包含命中的文件）"""
+        cached = {}
+        for rel_path, size, mtime, *info in self.conn.execute(
+                "SELECT rel_path, size, mtime, title, artist, album, track, disc, duration "
+                "FROM tags WHERE volume_key = ?", (volume_key,)):
+            cached[rel_path] = (size, mtime, TrackInfo(*info))
+        hits = {}
+        for rel_path, entry in items:
+            row = cached.get(rel_path)
+            if row is not None and row[0] == entry.size and row[1] == entry.mtime:
+                hits[entry.path] = row[2]
+        return hits
+
+    def store(self, volume_key: str, items: List[Tuple[str, ScanEntry, TrackInfo]]):
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO tags (volume_key, rel_path, size, mtime, title, artist, album, "
+                "track, disc, duration) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [(volume_key, rel_path, entry.size, entry.mtime, *info) for rel_path, entry, info in items])
+
+    def forget_volume(self, volume_key: str):
+        with self.conn:
+            self.conn.execute("DELETE FROM tags WHERE volume_key = ?", (volume_key,))
+
+
+def load_tags(entries: List[ScanEntry], root: str, volume_key: Optional[str] = None,
+              db_path: Optional[str] = None, workers: int = DEFAULT_WORKERS,
+              progress: Optional[Callable[[int, int], None]] = None,
+              cancelled: Optional[Callable[[], bool]] = None) -> Dict[str, TrackInfo]:
+    """读取 entries 的标签，返回 路径 -> TrackInfo
+
+    提供 db_path 时先查缓存，只读取新增或变化过的文件；无法读取的文件不出现在结果中。
+    volume_key 默认取 root 的绝对路径。
+    """
+    volume_key = volume_key or os.path.abspath(root)
+    items = [(os.path.relpath(entry.path, root), entry) for entry in entries]
+    cache = MetadataCache(db_path) if db_path else None
+    try:
+        with tracer.span("metadata", files=len(entries)):
+            result = cache.lookup(volume_key, items) if cache else {}
+            tracer.count("metadata.cache_hits", len(result))
+            pending = [(rel_path, entry) for rel_path, entry in items if entry.path not in result]
+            total = len(entries)
+            done = len(result)
+            if progress:
+                progress(done, total)
+
+            def read(entry):
+                started = time.perf_counter()
+                info = read_tags(entry.path)
+                tracer.file_op("metadata.file", entry.path, started, time.perf_counter() - started)
+                return info
+
+            parsed = []
+            if pending:
+                with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+                    futures = {pool.submit(read, entry): (rel_path, entry) for rel_path, entry in pending}
+                    for future in as_completed(futures):
+                        if cancelled is not None and cancelled():
+                            for other in futures:
+                                other.cancel()
+                            break
+                        info = future.result()
+                        rel_path, entry = futures[future]
+                        if info is not None:
+                            result[entry.path] = info
+                            parsed.append((rel_path, entry, info))
+                        done += 1
+                        if progress:
+                            progress(done, total)
+            tracer.count("metadata.files", len(parsed))
+            if cache and parsed:
+                cache.store(volume_key, parsed)
+    finally:
+        if cache:
+            cache.close()
+    return result
+
+
+# ---- 排序 ----
+
+SORT_KEYS = {
+    "album": "专辑 / 碟号 / 音轨",
+    "artist": "艺术家 / 专辑 / 音轨",
+    "title": "标题",
+    "track": "碟号 / 音轨号",
+    "duration": "时长",
+}
+
+
+def tag_sort_key(kind: str, info: Optional[TrackInfo], name: str) -> tuple:
+    """按 SORT_KEYS 中的方式排序时使用的键，缺失的字段排在后面，最后按文件名区分"""
+    info = info or EMPTY_INFO
+
+    def text(value):
+        return (not value, natural_key(value))
+
+    def number(value):
+        return (value is None, value or 0)
+
+    track = number(info.disc) + number(info.track)
+    if kind == "album":
+        key = text(info.album) + track
+    elif kind == "artist":
+        key = text(info.artist) + text(info.album) + track
+    elif kind == "title":
+        key = text(info.title)
+    elif kind == "track":
+        key = track
+    elif kind == "duration":
+        key = number(info.duration)
+    else:
+        raise ValueError(f"未知的排序方式：{kind}")
+    return key + (natural_key(name),)
@@ -0,0 +1,69 @@
+import os
+import re
+from functools import lru_cache
+from typing import Iterable, List, NamedTuple, Optional
+
+from src.core.instrumentation import tracer
+
+# 文件名开头的数字前缀，例如 "012. 歌曲.mp3"、"12-歌曲.mp3"、"12 歌曲.mp3"（只用作排序键）
+PREFIX_PATTERN = re.compile(r'^\s*(\d+)\s*[\.\-]?\s*(.*)$', re.DOTALL)
+# 重命名时去掉的前缀必须带 "." 或 "-" 分隔符："7 Rings.mp3" 中的 7 是歌名的一部分
+STRIP_PATTERN = re.compile(r'^\s*(\d+)\s*[\.\-]\s*(.*)$', re.DOTALL)
+
+# 行号前缀的位数（001、002 ...）
+INDEX_WIDTH = 3
+
+
+class NameRecord(NamedTuple):
+    """解析后的文件名"""
+    name: str                # 原始文件名
+    prefix: Optional[int]    # 数字前缀，没有时为 None
+    clean_name: str          # 去掉带分隔符的数字前缀后的文件名（含扩展名）
+
+    def target_name(self, index: int, width: int = INDEX_WIDTH) -> str:
+        """按行号 index（从 1 开始）生成的新文件名"""
+        return f"{index:0{width}d}. {self.clean_name}"
+
+
+@lru_cache(maxsize=65536)
+def parse_name(file_name: str) -> NameRecord:
+    """解析文件名（结果会被缓存，同一文件名只解析一次）
+
+    只在不含扩展名的部分匹配前缀，避免 "01.mp3" 被解析成前缀 1 + 文件名 "mp3"。
+    没有分隔符的数字（"7 Rings.mp3"）只作为排序用的前缀，重命名时保留在文件名中；
+    去掉前缀后没有剩余内容时保留原文件名。
+    """
+    stem, ext = os.path.splitext(file_name)
+    match = PREFIX_PATTERN.match(stem)
+    if not match:
+        return NameRecord(file_name, None, file_name)
+    strip = STRIP_PATTERN.match(stem)
+    rest = strip.group(2).strip() if strip else ""
+    clean_name = rest + ext if rest else file_name
+    return NameRecord(file_name, int(match.group(1)), clean_name)
+
+
+def parse_prefix(file_name: str) -> Optional[int]:
+    """文件名中的数字前缀，没有前缀时返回 None"""
+    return parse_name(file_name).prefix
+
+
+def parse_names(names: Iterable[str]) -> List[NameRecord]:
+    """批量解析文件名"""
+    return [parse_name(name) for name in names]
+
+
+def target_names(names: Iterable[str], start: int = 1, width: int = INDEX_WIDTH) -> List[str]:
+    """按顺序为一组文件名生成带行号的新文件名"""
+    with tracer.span("parse"):
+        return [parse_name(name).target_name(index, width) for index, name in enumerate(names, start)]
+
+
+def target_paths(paths: Iterable[str], start: int = 1, width: int = INDEX_WIDTH) -> List[str]:
+    """按顺序为一组文件路径生成同目录下带行号的新路径"""
+    result = []
+    with tracer.span("parse"):
+        for index, path in enumerate(paths, start):
+            directory, name = os.path.split(path)
+            result.append(os.path.join(directory, parse_name(name).target_name(index, width)))
+    return result
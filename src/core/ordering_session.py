@@ -0,0 +1,260 @@
+"""排序会话：撤销/重做历史和按U盘保存的排序
+
+顺序表示为文件编号的排列（array('l')）。每次修改只记录一个很小的增量：
+- 拖拽移动记录为 (起始行, 行数, 目标行)，13 字节；
+- 排序等整体重排记录为排列的游程编码：新顺序中连续取自旧顺序中连续位置的一段记为
+  (起始位置, 长度)，已基本有序的列表只需要几段。
+
+撤销和重做各是一个增量栈，内存中的增量超过预算时把最早的部分移到临时文件中，
+需要时再按后进先出的顺序读回，因此历史没有步数限制，内存占用有上限。
+
+排序会话保存在扫描索引数据库中：文件表（相对路径）+ 文件编号的排列，按卷标识区分。
+"""
+import os
+import sqlite3
+import struct
+import tempfile
+import time
+import zlib
+from array import array
+from collections import deque
+from typing import List, Optional, Sequence
+
+from src.core.instrumentation import tracer
+
+HISTORY_MEMORY_BUDGET = 1024 * 1024  # 撤销/重做栈各自在内存中保留的增量字节数
+
+_MOVE = b"M"
+_PERMUTE = b"P"
+_MOVE_FORMAT = struct.Struct("<iii")
+
+
+def encode_move(source_row: int, count: int, destination_row: int) -> bytes:
+    """拖拽移动，参数与 QAbstractItemModel.moveRows 相同"""
+    return _MOVE + _MOVE_FORMAT.pack(source_row, count, destination_row)
+
+
+def encode_permutation(old: Sequence[int], new: Sequence[int]) -> bytes:
+    """把 old → new 的整体重排编码为游程：new 中每一段连续取自 old 中连续的位置"""
+    position = {fid: index for index, fid in enumerate(old)}
+    runs = array('l')
+    for fid in new:
+        source = position[fid]
+        if runs and runs[-2] + runs[-1] == source:
+            runs[-1] += 1
+        else:
+            runs.extend((source, 1))
+    return _PERMUTE + zlib.compress(runs.tobytes(), 1)
+
+
+def _runs(delta: bytes) -> array:
+    runs = array('l')
+    runs.frombytes(zlib.decompress(delta[1:]))
+    return runs
+
+
+def _move(order: array, source_row: int, count: int, destination_row: int) -> int:
+    """按 moveRows 的语义移动，返回移动后这些行的起始位置"""
+    moved = order[source_row:source_row + count]
+    del order[source_row:source_row + count]
+    insert_at = destination_row if destination_row < source_row else destination_row - count
+    order[insert_at:insert_at] = moved
+    return insert_at
+
+
+def apply_delta(order: array, delta: bytes, reverse: bool = False) -> array:
+    """在 order 上执行增量（reverse 为 True 时撤销），返回新的顺序"""
+    if delta[:1] == _MOVE:
+        source_row, count, destination_row = _MOVE_FORMAT.unpack(delta[1:])
+        order = array('l', order)
+        if not reverse:
+            _move(order, source_row, count, destination_row)
+            return order
+        insert_at = destination_row if destination_row < source_row else destination_row - count
+        _move(order, insert_at, count, source_row if source_row < insert_at else source_row + count)
+        return order
+    runs = _runs(delta)
+    total = sum(runs[1::2])
+    if total != len(order):
+        raise ValueError("排列长度与当前列表不一致")
+    result = array('l', bytes(len(order) * order.itemsize))
+    index = 0
+    for start, length in zip(runs[0::2], runs[1::2]):
+        if reverse:
+            result[start:start + length] = order[index:index + length]
+        else:
+            result[index:index + length] = order[start:start + length]
+        index += length
+    return result
+
+
+class _DeltaStack:
+    """增量栈：超出内存预算的最早部分溢出到临时文件"""
+
+    def __init__(self, budget: int):
+        self.budget = budget
+        self._memory: deque = deque()
+        self._memory_bytes = 0
+        self._spill = None
+        self._spilled: List[int] = []  # 溢出文件中每个增量的起始偏移
+
+    def __len__(self):
+        return len(self._memory) + len(self._spilled)
+
+    @property
+    def memory_bytes(self) -> int:
+        return self._memory_bytes
+
+    def push(self, delta: bytes):
+        self._memory.append(delta)
+        self._memory_bytes += len(delta)
+        while self._memory_bytes > self.budget and len(self._memory) > 1:
+            oldest = self._memory.popleft()
+            self._memory_bytes -= len(oldest)
+            if self._spill is None:
+                self._spill = tempfile.TemporaryFile(prefix="udisk_history_")
+            self._spill.seek(0, os.SEEK_END)
+            self._spilled.append(self._spill.tell())
+            self._spill.write(oldest)
+            tracer.count("history.spilled_bytes", len(oldest))
+
+    def pop(self) -> Optional[bytes]:
+        if self._memory:
+            delta = self._memory.pop()
+            self._memory_bytes -= len(delta)
+            return delta
+        if not self._spilled:
+            return None
+        offset = self._spilled.pop()
+        self._spill.seek(offset)
+        delta = self._spill.read()
+        self._spill.truncate(offset)
+        return delta
+
+    def clear(self):
+        self._memory.clear()
+        self._memory_bytes = 0
+        self._spilled = []
+        if self._spill is not None:
+            self._spill.close()
+            self._spill = None
+
+
+class OrderHistory:
+    """撤销/重做历史，只保存增量"""
+
+    def __init__(self, budget: int = HISTORY_MEMORY_BUDGET):
+        self._undo = _DeltaStack(budget)
+        self._redo = _DeltaStack(budget)
+
+    def can_undo(self) -> bool:
+        return len(self._undo) > 0
+
+    def can_redo(self) -> bool:
+        return len(self._redo) > 0
+
+    @property
+    def memory_bytes(self) -> int:
+        return self._undo.memory_bytes + self._redo.memory_bytes
+
+    def record(self, delta: bytes):
+        self._undo.push(delta)
+        self._redo.clear()
+
+    def record_move(self, source_row: int, count: int, destination_row: int):
+        self.record(encode_move(source_row, count, destination_row))
+
+    def record_permutation(self, old: Sequence[int], new: Sequence[int]):
+        self.record(encode_permutation(old, new))
+
+    def undo(self, order: array) -> Optional[array]:
+        """撤销最近一步，返回新的顺序；没有可撤销的步骤时返回 None"""
+        return self._step(order, self._undo, self._redo, reverse=True)
+
+    def redo(self, order: array) -> Optional[array]:
+        return self._step(order, self._redo, self._undo, reverse=False)
+
+    def _step(self, order: array, source: _DeltaStack, target: _DeltaStack, reverse: bool) -> Optional[array]:
+        delta = source.pop()
+        if delta is None:
+            return None
+        try:
+            result = apply_delta(order, delta, reverse)
+        except ValueError:
+            self.clear()  # 列表已被重新加载，历史不再适用
+            return None
+        target.push(delta)
+        return result
+
+    def clear(self):
+        self._undo.clear()
+        self._redo.clear()
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS ordering_sessions (
+    volume_key TEXT PRIMARY KEY,
+    files BLOB NOT NULL,
+    file_order BLOB NOT NULL,
+    saved_at REAL NOT NULL
+);
+"""
+
+
+class OrderingStore:
+    """按卷保存的排序会话：文件表（相对路径，zlib 压缩）+ 文件编号的排列"""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path)
+        self.conn.executescript(_SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def save(self, volume_key: str, rel_paths: Sequence[str], order: Sequence[int]):
+        """rel_paths 为文件编号 → 相对路径，order 为显示顺序（文件编号列表）"""
+        with tracer.span("ordering.save", files=len(order)):
+            files = zlib.compress("\0".join(rel_paths).encode("utf-8", "surrogatepass"), 1)
+            with self.conn:
+                self.conn.execute("INSERT OR REPLACE INTO ordering_sessions VALUES (?, ?, ?, ?)",
+                                  (volume_key, files, array('l', order).tobytes(), time.time()))
+
+    def load(self, volume_key: str) -> Optional[List[str]]:
+        """按保存的顺序返回相对路径，没有保存的会话时返回 None"""
+        row = self.conn.execute("SELECT files, file_order FROM ordering_sessions WHERE volume_key = ?",
+                                (volume_key,)).fetchone()
+        if row is None:
+            return None
+        with tracer.span("ordering.load"):
+            rel_paths = zlib.decompress(row[0]).decode("utf-8", "surrogatepass").split("\0")
+            order = array('l')
+            order.frombytes(row[1])
+            return [rel_paths[fid] for fid in order]
+
+    def forget(self, volume_key: str):
+        with self.conn:
+            self.conn.execute("DELETE FROM ordering_sessions WHERE volume_key = ?", (volume_key,))
+
+
+def restore_order(saved: Sequence[str], current: Sequence[str]) -> List[int]:
+    """按保存的相对路径顺序排列当前文件（current 为文件编号 → 相对路径）
+
+    保存时存在、现在仍存在的文件按保存的顺序排在前面，新出现的文件按原顺序接在后面。
+    """
+    fid_of = {os.path.normcase(path): fid for fid, path in enumerate(current)}
+    order = []
+    placed = set()
+    for path in saved:
+        fid = fid_of.get(os.path.normcase(path))
+        if fid is not None and fid not in placed:
+            order.append(fid)
+            placed.add(fid)
+    order.extend(fid for fid in range(len(current)) if fid not in placed)
+    return order
@@ -0,0 +1,248 @@
+import json
+import os
+import time
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from src.core.instrumentation import tracer
+
+JOURNAL_FILENAME = ".udisk_rename_journal.jsonl"
+TEMP_MARKER = ".udisk_tmp"
+_FSYNC_EVERY = 256  # 每完成多少步强制落盘一次日志
+
+
+class RenameStep(NamedTuple):
+    src: str
+    dst: str
+
+
+def _key(path: str) -> str:
+    # Windows 上大小写不敏感，使用 normcase 后的路径作为图的节点
+    return os.path.normcase(os.path.abspath(path))
+
+
+def _temp_path(path: str, taken: set, exists: Callable[[str], bool]) -> str:
+    directory, name = os.path.split(path)
+    n = 0
+    while True:
+        candidate = os.path.join(directory, f"{name}{TEMP_MARKER}{n}")
+        if _key(candidate) not in taken and not exists(candidate):
+            taken.add(_key(candidate))
+            return candidate
+        n += 1
+
+
+def plan_renames(mapping: Iterable[Tuple[str, str]],
+                 exists: Callable[[str], bool] = os.path.exists) -> List[RenameStep]:
+    """根据完整的 旧路径→新路径 映射生成安全的重命名步骤
+
+    先执行目标位置空闲的链式重命名，剩下的都是环（例如两个文件互换名称），
+    每个环只借用一个临时名称打断。目标位置被映射之外的文件占用时抛出 FileExistsError，
+    绝不覆盖任何文件。
+    """
+    forward: Dict[str, Tuple[str, str]] = {}  # src_key -> (src, dst)
+    reverse: Dict[str, str] = {}              # dst_key -> src_key
+    steps: List[RenameStep] = []
+    for src, dst in mapping:
+        if src == dst:
+            continue
+        src_key, dst_key = _key(src), _key(dst)
+        if src_key == dst_key:
+            steps.append(RenameStep(src, dst))  # 只改变大小写，直接重命名
+            continue
+        if src_key in forward:
+            raise ValueError(f"重复的源文件：{src}")
+        if dst_key in reverse:
+            raise ValueError(f"多个文件重命名为同一个名称：{dst}")
+        forward[src_key] = (src, dst)
+        reverse[dst_key] = src_key
+
+    for dst_key, src_key in reverse.items():
+        if dst_key not in forward and exists(forward[src_key][1]):
+            raise FileExistsError(f"目标文件已存在：{forward[src_key][1]}")
+
+    done = set()
+
+    def unwind(freed_key: str):
+        # freed_key 对应的位置已经空出，依次执行所有等待这个位置的重命名
+        while True:
+            waiting = reverse.get(freed_key)
+            if waiting is None or waiting in done:
+                return
+            src, dst = forward[waiting]
+            steps.append(RenameStep(src, dst))
+            done.add(waiting)
+            freed_key = waiting
+
+    # 链：从目标位置空闲的末端开始向前展开
+    for src_key, (src, dst) in forward.items():
+        if src_key in done or _key(dst) in forward:
+            continue
+        steps.append(RenameStep(src, dst))
+        done.add(src_key)
+        unwind(src_key)
+
+    # 环：把一个成员先移到临时名称，展开整条环后再从临时名称移到它的目标
+    taken = set(forward) | set(reverse)
+    for src_key, (src, dst) in forward.items():
+        if src_key in done:
+            continue
+        temp = _temp_path(src, taken, exists)
+        steps.append(RenameStep(src, temp))
+        done.add(src_key)
+        unwind(src_key)
+        steps.append(RenameStep(temp, dst))
+    return steps
+
+
+def _step_done(step: RenameStep) -> bool:
+    """判断某一步是否已经执行（前面的步骤都已完成时结果准确）"""
+    src, dst = step
+    if _key(src) != _key(dst):
+        return not os.path.exists(src) and os.path.exists(dst)
+    # 只改变大小写：检查目录中实际的文件名
+    directory, name = os.path.split(dst)
+    try:
+        return name in os.listdir(directory or ".")
+    except OSError:
+        return False
+
+
+class RenameJournal:
+    """重命名日志（JSON Lines）
+
+    第一行记录完整的重命名计划，之后每完成一步追加一行步骤序号。
+    U盘被拔出等中断发生后，下次加载时可据此继续完成或回滚。
+    计划中的路径相对于日志所在目录保存：U盘重新插入后盘符可能改变，读取时按日志当前的位置还原。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = None
+        self._since_sync = 0
+
+    @staticmethod
+    def for_directory(directory: str) -> "RenameJournal":
+        return RenameJournal(os.path.join(directory, JOURNAL_FILENAME))
+
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+
+    def _relative(self, path: str) -> str:
+        try:
+            return os.path.relpath(path, os.path.dirname(os.path.abspath(self.path)))
+        except ValueError:
+            return os.path.abspath(path)  # 不在同一个盘上（Windows），只能保存绝对路径
+
+    def _resolve(self, path: str) -> str:
+        # 绝对路径（旧版本的日志或不在同一个盘上）按原样使用
+        return os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(self.path)), path))
+
+    def begin(self, steps: List[RenameStep]):
+        self._file = open(self.path, "w", encoding="utf-8")
+        self._file.write(json.dumps({"version": 2,
+                                     "steps": [[self._relative(src), self._relative(dst)] for src, dst in steps]},
+                                    ensure_ascii=False) + "\n")
+        self._sync()
+
+    def record(self, index: int):
+        self._file.write(f"{index}\n")
+        self._file.flush()
+        self._since_sync += 1
+        if self._since_sync >= _FSYNC_EVERY:
+            self._sync()
+
+    def _sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._since_sync = 0
+
+    def finish(self):
+        """全部步骤完成后删除日志"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def load(self) -> Tuple[List[RenameStep], int]:
+        """读取日志，返回 (计划步骤, 已完成的步骤数)
+
+        日志中最后记录的步骤之后，按顺序检查源文件是否仍然存在来确定实际进度
+        （尚未落盘的记录可能丢失）。
+        """
+        with open(self.path, "r", encoding="utf-8") as f:
+            header = json.loads(f.readline())
+            last = -1
+            for line in f:
+                line = line.strip()
+                if line.isdigit():
+                    last = max(last, int(line))
+        steps = [RenameStep(self._resolve(src), self._resolve(dst)) for src, dst in header["steps"]]
+        completed = last + 1
+        while completed < len(steps) and _step_done(steps[completed]):
+            completed += 1
+        return steps, completed
+
+    def roll_forward(self, progress: Optional[Callable[[int, int], None]] = None) -> int:
+        """继续执行中断的计划，返回本次执行的步骤数"""
+        steps, completed = self.load()
+        self._file = open(self.path, "a", encoding="utf-8")
+        try:
+            count = apply_steps(steps[completed:], journal=self, offset=completed, progress=progress)
+        finally:
+            self.close()
+        self.finish()
+        return count
+
+    def roll_back(self, progress: Optional[Callable[[int, int], None]] = None) -> int:
+        """撤销已完成的步骤，恢复到计划开始前的文件名"""
+        steps, completed = self.load()
+        undo = [RenameStep(dst, src) for src, dst in reversed(steps[:completed])]
+        count = apply_steps(undo, progress=progress)
+        self.finish()
+        return count
+
+
+def apply_steps(steps: List[RenameStep], journal: Optional[RenameJournal] = None, offset: int = 0,
+                progress: Optional[Callable[[int, int], None]] = None,
+                on_renamed: Optional[Callable[[str, str], None]] = None) -> int:
+    """按顺序执行重命名步骤，每完成一步记录到日志"""
+    total = len(steps)
+    for i, (src, dst) in enumerate(steps):
+        started = time.perf_counter()
+        os.rename(src, dst)
+        tracer.file_op("rename.file", dst, started, time.perf_counter() - started)
+        if journal is not None:
+            journal.record(offset + i)
+        if on_renamed is not None:
+            on_renamed(src, dst)
+        if progress is not None:
+            progress(i + 1, total)
+    return total
+
+
+def rename_with_journal(mapping: Iterable[Tuple[str, str]], journal_dir: str,
+                        progress: Optional[Callable[[int, int], None]] = None,
+                        on_renamed: Optional[Callable[[str, str], None]] = None) -> List[RenameStep]:
+    """规划并执行一组重命名，过程写入 journal_dir 中的日志，成功后删除日志"""
+    with tracer.span("rename.plan"):
+        steps = plan_renames(mapping)
+    if not steps:
+        return steps
+    journal = RenameJournal.for_directory(journal_dir)
+    journal.begin(steps)
+    try:
+        with tracer.span("rename", steps=len(steps)):
+            apply_steps(steps, journal=journal, progress=progress, on_renamed=on_renamed)
+    except BaseException as e:
+        journal.close()  # 保留日志，下次加载时可继续或回滚
+        tracer.event("rename.failed", error=str(e))
+        raise
+    journal.finish()
+    tracer.count("rename.files", len(steps))
+    return steps
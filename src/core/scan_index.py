@@ -0,0 +1,18 @@
+"""按卷保存的索引数据库（排序会话、标签缓存等）的位置
+
+U盘上的文件列表不做缓存：目录的 mtime 在 FAT/exFAT 上并不可靠（根目录没有时间戳，
+Windows 常常不更新目录的 mtime，原地覆盖文件也不会改变它），只有重新读取目录才能得到
+当前的大小和 mtime，而一次 scandir 已经是读取一个目录的最小开销，缓存省不下任何 I/O。
+"""
+import os
+
+INDEX_FILENAME = ".udisk_scan_index.sqlite3"
+
+
+def default_index_path(backup_dir: str) -> str:
+    """索引文件默认放在备份目录中，备份目录不存在时放到用户目录下"""
+    if backup_dir and os.path.isdir(backup_dir):
+        return os.path.join(backup_dir, INDEX_FILENAME)
+    app_dir = os.path.join(os.path.expanduser("~"), ".udisk_music_reorder")
+    os.makedirs(app_dir, exist_ok=True)
+    return os.path.join(app_dir, INDEX_FILENAME)
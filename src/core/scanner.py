@@ -0,0 +1,94 @@
+import os
+import time
+from typing import Callable, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from src.core.instrumentation import tracer
+
+# 支持的音频视频文件扩展名
+MEDIA_EXTENSIONS = ('.mp3', '.wav', '.flac', '.m4a', '.wma',
+                    '.mp4', '.avi', '.mkv', '.mov', '.wmv',
+                    '.3gp', '.flv', '.webm', '.rmvb', '.m4v')
+
+
+class ScanEntry(NamedTuple):
+    """扫描得到的单个媒体文件"""
+    path: str
+    name: str
+    size: int
+    mtime: float
+
+
+def read_media_dir(path: str, extensions: Tuple[str, ...] = MEDIA_EXTENSIONS
+                   ) -> Tuple[List[str], List[ScanEntry]]:
+    """读取单个目录，返回 (子目录名列表, 媒体文件列表)，均保持目录项顺序
+
+    直接复用 DirEntry 自带的 stat 结果（Windows 上无需额外系统调用）。
+    """
+    sub_dirs = []
+    media = []
+    try:
+        with os.scandir(path) as it:
+            entries = list(it)
+    except OSError:
+        # 与 os.walk 一致：无法读取的目录直接跳过
+        return sub_dirs, media
+
+    for entry in entries:
+        try:
+            if entry.is_dir(follow_symlinks=False):
+                sub_dirs.append(entry.name)
+                continue
+            if not entry.name.lower().endswith(extensions) or not entry.is_file():
+                continue
+            st = entry.stat()
+        except OSError:
+            continue
+        media.append(ScanEntry(entry.path, entry.name, st.st_size, st.st_mtime))
+    return sub_dirs, media
+
+
+def iter_media_files(root: str, extensions: Tuple[str, ...] = MEDIA_EXTENSIONS,
+                     cancelled: Optional[Callable[[], bool]] = None) -> Iterator[ScanEntry]:
+    """使用 os.scandir 遍历目录，按 os.walk 相同的顺序逐个产出媒体文件
+
+    cancelled 返回 True 时尽快停止遍历。
+    """
+    stack = [root]
+    while stack:
+        if cancelled is not None and cancelled():
+            return
+        current = stack.pop()
+        started = time.perf_counter()
+        sub_dirs, media = read_media_dir(current, extensions)
+        tracer.file_op("scan.dir", current, started, time.perf_counter() - started)
+        tracer.count("scan.files", len(media))
+        yield from media
+        # 逆序压栈，保证子目录按目录项顺序依次展开（与 os.walk 自顶向下一致）
+        stack.extend(os.path.join(current, name) for name in reversed(sub_dirs))
+
+
+def batch_entries(entries: Iterable[ScanEntry], batch_size: int = 500,
+                  max_latency: float = 0.1) -> Iterator[List[ScanEntry]]:
+    """把逐个产出的扫描结果按批合并
+
+    批次达到 batch_size 个文件或距上一批超过 max_latency 秒时产出，
+    既减少跨线程信号数量，又保证界面能尽快看到首批结果。
+    """
+    batch = []
+    last_emit = time.perf_counter()
+    for entry in entries:
+        batch.append(entry)
+        now = time.perf_counter()
+        if len(batch) >= batch_size or now - last_emit >= max_latency:
+            yield batch
+            batch = []
+            last_emit = now
+    if batch:
+        yield batch
+
+
+def iter_media_batches(root: str, extensions: Tuple[str, ...] = MEDIA_EXTENSIONS,
+                       batch_size: int = 500, max_latency: float = 0.1,
+                       cancelled: Optional[Callable[[], bool]] = None) -> Iterator[List[ScanEntry]]:
+    """按批产出扫描结果"""
+    return batch_entries(iter_media_files(root, extensions, cancelled), batch_size, max_latency)
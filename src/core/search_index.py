@@ -0,0 +1,214 @@
+"""文件名搜索索引：边扫描边建立，输入时即时过滤
+
+每个文件的搜索文本为规范化（NFKC + casefold，全角字母数字变为半角、不区分大小写）后的文件名；
+含汉字时再附加拼音首字母形式，"周杰伦 - 晴天.mp3" 也可以用 "zjl" 或 "qt" 找到。
+索引为三元组（连续 3 个字符）-> 文件编号数组。
+
+扩展名（".mp3" 等）几乎每个文件都有，完全落在扩展名中的三元组不建索引，只记在 skipped 中。
+
+查询按空白分成若干词，文件需要包含全部的词。每个词取它的三元组中文件最少的一个，
+从文件最少的词开始，以它的文件为候选，再逐词筛选（map + compress，在 C 中完成）；
+没有可用三元组的词（1～2 个字符、"mp3" 这样的扩展名）直接在全部搜索文本中查找
+（10 万个文件约 10 毫秒）。
+
+建立三元组是主要的开销，扫描线程用 prepare_batch() 为每批文件预先建好，
+界面线程的 SearchIndex.merge() 只需把数组接到一起。重新扫描同一个U盘时，
+文件名与上次相同的部分沿用原来的索引（见 SearchIndex.truncate()），不必重建。
+"""
+import bisect
+import operator
+import unicodedata
+from array import array
+from collections import deque
+from itertools import compress, repeat
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set
+
+from src.core.instrumentation import tracer
+from src.core.sort_engine import pinyin_initials
+
+GRAM = 3
+MAX_EXTENSION = 6   # 最后一个 "." 之后不超过这么多字符（含 "."）时视为扩展名
+_SEPARATOR = "\0"  # 文件名与拼音首字母之间的分隔，查询中不会出现
+
+
+def normalize(text: str) -> str:
+    return unicodedata.normalize("NFKC", text).casefold()
+
+
+def search_text(name: str) -> str:
+    """文件名的搜索文本：规范化的文件名，含汉字时再加上拼音首字母形式"""
+    text = normalize(name)
+    initials = pinyin_initials(text)
+    return text if initials == text else text + _SEPARATOR + initials
+
+
+def _grams(text: str) -> set:
+    return {part[i:i + GRAM] for part in text.split(_SEPARATOR) for i in range(len(part) - GRAM + 1)}
+
+
+def _stem_end(part: str, extensions: Set[str]) -> int:
+    """part 中要建索引的三元组的起点个数：完全落在扩展名中的三元组不算，扩展名加入 extensions"""
+    end = len(part) - GRAM + 1
+    dot = part.rfind(".")
+    if 0 <= dot < end and len(part) - dot <= MAX_EXTENSION:
+        extensions.add(part[dot:])
+        return dot
+    return end
+
+
+def _index_grams(text: str, extensions: Set[str]) -> Set[str]:
+    """搜索文本中要建索引的三元组"""
+    return {part[i:i + GRAM] for part in text.split(_SEPARATOR) for i in range(_stem_end(part, extensions))}
+
+
+class SearchBatch(NamedTuple):
+    """为一批连续编号的文件预先建立的索引，由 SearchIndex.merge() 合并"""
+    base: int                     # 这批第一个文件的编号
+    names: List[str]
+    texts: List[str]
+    postings: Dict[str, array]    # 三元组 -> 文件编号
+    extensions: Set[str]          # 这批文件的扩展名，其中的三元组没有建索引
+
+
+def prepare_batch(names: Iterable[str], base: int = 0) -> SearchBatch:
+    """为编号从 base 开始的一批文件名建立索引（可以在扫描线程中调用）"""
+    names = list(names)
+    texts = [search_text(name) for name in names]
+    postings: Dict[str, array] = {}
+    extensions: Set[str] = set()
+    for fid, text in enumerate(texts, base):
+        for gram in _index_grams(text, extensions):
+            posting = postings.get(gram)
+            if posting is None:
+                posting = postings[gram] = array('i')
+            posting.append(fid)
+    return SearchBatch(base, names, texts, postings, extensions)
+
+
+class SearchIndex:
+    """文件编号 -> 搜索文本，以及三元组倒排索引"""
+
+    def __init__(self):
+        self._names: List[str] = []
+        self._texts: List[str] = []
+        self._postings: Dict[str, array] = {}
+        self._extensions: Set[str] = set()
+        self._skipped: Set[str] = set()    # 扩展名中的三元组，查询时不能用来缩小范围
+        self._ordered = True  # 各三元组的文件编号是否递增（update() 会追加较小的编号）
+        self.version = 0  # 每次追加、更新或截断后加一，用于判断缓存的查询结果是否过期
+
+    def __len__(self):
+        return len(self._texts)
+
+    def names(self) -> List[str]:
+        """各编号的文件名（副本，可以交给扫描线程与新扫描到的文件名比较）"""
+        return list(self._names)
+
+    def matches(self, base: int, names: List[str]) -> bool:
+        """编号从 base 开始的文件名是否与 names 相同，相同时这些文件的索引可以沿用"""
+        return self._names[base:base + len(names)] == names
+
+    def truncate(self, count: int):
+        """只保留编号小于 count 的文件（重新扫描时从第一个不同的文件名开始重建）"""
+        if count >= len(self._texts):
+            return
+        self.version += 1
+        if count == 0:
+            self._names, self._texts, self._postings = [], [], {}
+            self._extensions, self._skipped = set(), set()
+            self._ordered = True
+            return
+        del self._names[count:]
+        del self._texts[count:]
+        for gram, posting in list(self._postings.items()):
+            if posting[-1] < count:
+                continue
+            if self._ordered:
+                del posting[bisect.bisect_left(posting, count):]
+            else:
+                posting = self._postings[gram] = array('i', [fid for fid in posting if fid < count])
+            if not posting:
+                del self._postings[gram]
+
+    def add(self, names: Iterable[str]):
+        """追加一批文件，编号接在已有的文件之后"""
+        self.merge(prepare_batch(names, len(self._texts)))
+
+    def merge(self, batch: SearchBatch):
+        if batch.base != len(self._texts):
+            raise ValueError("索引批次的起始编号与已有文件数不一致")
+        self.version += 1
+        self._names.extend(batch.names)
+        self._texts.extend(batch.texts)
+        self._add_extensions(batch.extensions)
+        for gram, fids in batch.postings.items():
+            posting = self._postings.get(gram)
+            if posting is None:
+                self._postings[gram] = fids
+            else:
+                posting.extend(fids)
+
+    def update(self, fid: int, name: str):
+        """文件改名后更新；旧三元组中残留的编号在查询时逐个确认，会被排除"""
+        text = search_text(name)
+        self.version += 1
+        self._names[fid] = name
+        self._texts[fid] = text
+        extensions: Set[str] = set()
+        for gram in _index_grams(text, extensions):
+            posting = self._postings.get(gram)
+            if posting is None:
+                self._postings[gram] = array('i', [fid])
+            else:
+                self._ordered = self._ordered and posting[-1] <= fid
+                posting.append(fid)
+        self._add_extensions(extensions)
+
+    def _add_extensions(self, extensions: Set[str]):
+        for extension in extensions - self._extensions:
+            self._extensions.add(extension)
+            self._skipped |= _grams(extension)
+
+    def search(self, query: str, candidates: Optional[Iterable[int]] = None) -> Optional[bytearray]:
+        """返回 文件编号 -> 是否匹配（bytearray），查询为空时返回 None（不过滤）
+
+        提供 candidates 时只检查这些文件（例如扫描中新追加的文件），其余为不匹配。
+        """
+        words = normalize(query).split()
+        if not words:
+            return None
+        texts = self._texts
+        with tracer.span("search", query=query):
+            if candidates is None:
+                # 文件最少的词先查，它的三元组给出候选文件；没有可用的三元组时查找全部搜索文本
+                postings = {word: self._posting(word) for word in words}
+                words.sort(key=lambda word: len(postings[word]))
+                if postings[words[0]] is not texts:
+                    candidates = postings[words[0]]
+            if candidates is None:
+                flags = bytearray(map(operator.contains, texts, repeat(words[0])))
+                if len(words) == 1:
+                    return flags
+                matched = compress(range(len(texts)), flags)
+                words = words[1:]
+            else:
+                matched = candidates
+            # 逐词在 C 中筛选剩下的文件
+            for word in words:
+                matched = list(matched)
+                matched = compress(matched, map(operator.contains, map(texts.__getitem__, matched), repeat(word)))
+            flags = bytearray(len(texts))
+            deque(map(flags.__setitem__, matched, repeat(1)), maxlen=0)
+            return flags
+
+    def _posting(self, word: str):
+        """包含 word 的文件一定在其中的文件编号（文件最少的三元组），无法缩小范围时为全部文件
+
+        只出现在扩展名中的三元组没有建索引，不能用来缩小范围。
+        """
+        best = self._texts
+        for gram in _grams(word) - self._skipped:
+            posting = self._postings.get(gram, ())
+            if len(posting) < len(best):
+                best = posting
+        return best
@@ -0,0 +1,259 @@
+"""排序引擎：文件名自然顺序、中文按拼音、多字段排序
+
+- 自然顺序：文件名中的数字按数值比较（"2.mp3" 排在 "10.mp3" 前面），字母不区分大小写。
+- 中文按拼音：安装了 pypinyin（可选依赖）时把汉字转成拼音；没有安装时使用 GBK 编码顺序——
+  GB2312 一级汉字（常用字）在 GBK 中按拼音排列，再按声母区间换成字母，与英文名混排；
+  二级汉字和其他汉字排在所有字母之后。
+- 多字段：字段见 FIELDS，排序方式写成 "folder,prefix,name" 这样的字符串，字段前加 "-" 表示降序。
+
+每个文件每个字段的排序键只计算一次：把全部文件的键排序后换成名次（rank），保存在 array('l') 中。
+之后按任意字段组合重新排序只需要从最次要的字段开始，对文件编号做几次以名次为键的稳定排序，
+不再比较字符串。
+"""
+import bisect
+import os
+import re
+from array import array
+from functools import lru_cache
+from typing import Iterable, List, Optional, Sequence, Tuple, Union
+
+from src.core.instrumentation import tracer
+from src.core.naming import parse_prefix
+from src.core.scanner import ScanEntry
+
+FIELDS = {
+    "folder": "文件夹",
+    "prefix": "序号",
+    "name": "文件名",
+    "size": "大小",
+    "mtime": "修改时间",
+}
+
+# 界面和命令行中可直接选择的排序方式：排序字符串 -> 说明
+SORT_PRESETS = {
+    "folder,prefix,name": "文件夹 / 序号 / 文件名",
+    "name": "文件名（自然顺序）",
+    "-size,name": "大小（从大到小）",
+    "size,name": "大小（从小到大）",
+    "-mtime,name": "修改时间（从新到旧）",
+    "mtime,name": "修改时间（从旧到新）",
+}
+
+SortSpec = Union[str, Sequence[Tuple[str, bool]]]
+
+_DIGITS = re.compile(r"([0-9]+)")
+_CJK = re.compile(r"[㐀-鿿]")
+
+# GB2312 一级汉字各声母的起始编码（一级汉字范围 B0A1-D7F9，按拼音排列）
+_GB_INITIAL_CODES = (0xB0A1, 0xB0C5, 0xB2C1, 0xB4EE, 0xB6EA, 0xB7A2, 0xB8C1, 0xB9FE, 0xBBF7, 0xBFA6,
+                     0xC0AC, 0xC2E8, 0xC4C3, 0xC5B6, 0xC5BE, 0xC6DA, 0xC8BB, 0xC8F6, 0xCBFA, 0xCDDA,
+                     0xCEF4, 0xD1B9, 0xD4D1)
+_GB_INITIALS = "abcdefghjklmnopqrstwxyz"
+_GB_LEVEL1_END = 0xD7F9
+_AFTER_LETTERS = "\U000F0000"   # 排在所有字母之后（Unicode 私用区）
+_GBK_BASE = 0xF0001              # GBK 编码映射到私用区中的这个位置之后，保持编码顺序
+
+_NO_PREFIX = 1 << 62
+
+_pinyin = None  # pypinyin.lazy_pinyin，第一次使用时导入；False 表示没有安装
+
+
+def _load_pinyin():
+    global _pinyin
+    if _pinyin is None:
+        try:
+            from pypinyin import lazy_pinyin
+        except ImportError:
+            _pinyin = False
+        else:
+            _pinyin = lazy_pinyin
+    return _pinyin
+
+
+def _gbk_char(char: str) -> str:
+    """没有 pypinyin 时汉字的排序文本：声母 + 按 GBK 编码顺序排列的私用区字符"""
+    try:
+        encoded = char.encode("gbk")
+    except UnicodeEncodeError:
+        return _AFTER_LETTERS + char
+    code = int.from_bytes(encoded, "big")
+    ordered = chr(_GBK_BASE + code - 0x8140)
+    if 0xB0A1 <= code <= _GB_LEVEL1_END:
+        return _GB_INITIALS[bisect.bisect_right(_GB_INITIAL_CODES, code) - 1] + ordered
+    return _AFTER_LETTERS + ordered
+
+
+class _GbkTable(dict):
+    """str.translate 用的字符表，每个字符第一次出现时计算"""
+
+    def __missing__(self, code):
+        char = chr(code)
+        value = _gbk_char(char) if _CJK.match(char) else code
+        self[code] = value
+        return value
+
+
+_GBK_TABLE = _GbkTable()
+
+
+class _InitialTable(dict):
+    """str.translate 用的字符表：GB2312 一级汉字 -> 拼音首字母，其他字符不变"""
+
+    def __missing__(self, code):
+        char = chr(code)
+        value = code
+        if _CJK.match(char):
+            initial = _gbk_char(char)[0]
+            if initial != _AFTER_LETTERS:
+                value = initial
+        self[code] = value
+        return value
+
+
+_INITIAL_TABLE = _InitialTable()
+
+
+def pinyin_initials(text: str) -> str:
+    """把文本中的汉字换成拼音首字母（"周杰伦" -> "zjl"），其他字符不变
+
+    没有 pypinyin 时只能确定 GB2312 一级汉字（常用字）的首字母，其余汉字保持原样。
+    """
+    if not _CJK.search(text):
+        return text
+    lazy_pinyin = _load_pinyin()
+    if lazy_pinyin:
+        from pypinyin import Style
+        return "".join(lazy_pinyin(text, style=Style.FIRST_LETTER))
+    return text.translate(_INITIAL_TABLE)
+
+
+def romanize(text: str) -> str:
+    """把文本中的汉字换成可以与字母一起比较的排序文本（拼音或声母 + GBK 顺序）"""
+    if not _CJK.search(text):
+        return text
+    lazy_pinyin = _load_pinyin()
+    if lazy_pinyin:
+        return "".join(lazy_pinyin(text))
+    return text.translate(_GBK_TABLE)
+
+
+@lru_cache(maxsize=65536)
+def natural_key(text: str) -> str:
+    """自然顺序的排序键：文字部分不区分大小写（汉字按拼音），数字部分按数值比较
+
+    键是一个字符串（比元组比较快得多）。数字编码为 标记 + 位数 + 去掉前导零的数字：
+    位数少的数值小，位数相同时逐位比较即是按数值比较；标记 "\x01" 小于所有可见字符，
+    与逐段比较时数字排在文字前面的结果一致。前导零不同的数字（"01" 与 "1"）数值相同，最后按原文区分。
+    """
+    parts = _DIGITS.split(romanize(text).casefold())
+    for index in range(1, len(parts), 2):
+        digits = parts[index].lstrip("0") or "0"
+        parts[index] = "\x01" + chr(0x20 + len(digits)) + digits
+    parts.append("\x00" + text)
+    return "".join(parts)
+
+
+def parse_spec(spec: SortSpec) -> List[Tuple[str, bool]]:
+    """"folder,-size" -> [("folder", False), ("size", True)]，也接受已解析的列表"""
+    if isinstance(spec, str):
+        fields = []
+        for item in spec.split(","):
+            item = item.strip()
+            descending = item.startswith("-")
+            fields.append((item.lstrip("-"), descending))
+    else:
+        fields = [(field, bool(descending)) for field, descending in spec]
+    if not fields:
+        raise ValueError("排序方式为空")
+    for field, _ in fields:
+        if field not in FIELDS:
+            raise ValueError(f"未知的排序字段：{field}（可用：{', '.join(FIELDS)}）")
+    return fields
+
+
+def _ranks(keys: Sequence) -> array:
+    """把每个文件的键换成名次，相同的键名次相同"""
+    ranks = array('l', [0]) * len(keys)
+    rank = -1
+    previous = object()
+    for index in sorted(range(len(keys)), key=keys.__getitem__):
+        key = keys[index]
+        if key != previous:
+            rank += 1
+            previous = key
+        ranks[index] = rank
+    return ranks
+
+
+def _folder_key(path: str) -> str:
+    # 各级目录名的键以 "\x00" 结尾，逐级比较，上级目录中的文件排在子目录前面
+    return "".join(natural_key(part) + "\x00" for part in os.path.normpath(os.path.dirname(path)).split(os.sep))
+
+
+def _prefix_value(prefix: Optional[int]) -> int:
+    return _NO_PREFIX if prefix is None or prefix < 0 else prefix  # 没有序号的排在最后
+
+
+def _prefix_key(name: str) -> int:
+    return _prefix_value(parse_prefix(name))
+
+
+class SortKeys:
+    """一组文件（文件编号 0..n-1）的排序键，每个字段第一次使用时计算名次数组并缓存
+
+    names、paths、sizes、mtimes 按文件编号排列；文件增减或改名后需要创建新的 SortKeys。
+    prefixes 为已经解析好的数字前缀（没有前缀为 None 或负数），省略时从文件名解析。
+    """
+
+    def __init__(self, names: Sequence[str], paths: Sequence[str],
+                 sizes: Sequence[int], mtimes: Sequence[float],
+                 prefixes: Optional[Sequence[Optional[int]]] = None):
+        self._columns = {
+            "folder": (paths, _folder_key),
+            "prefix": (names, _prefix_key) if prefixes is None else (prefixes, _prefix_value),
+            "name": (names, natural_key),
+            "size": (sizes, None),
+            "mtime": (mtimes, None),
+        }
+        self._count = len(names)
+        self._ranks = {}
+
+    @classmethod
+    def from_entries(cls, entries: Sequence[ScanEntry]) -> "SortKeys":
+        return cls([entry.name for entry in entries], [entry.path for entry in entries],
+                   [entry.size for entry in entries], [entry.mtime for entry in entries])
+
+    def __len__(self):
+        return self._count
+
+    def ranks(self, field: str) -> array:
+        """文件编号 -> 该字段的名次"""
+        ranks = self._ranks.get(field)
+        if ranks is None:
+            values, key = self._columns[field]
+            with tracer.span("sort.keys", field=field, files=self._count):
+                ranks = _ranks(values if key is None else [key(value) for value in values])
+            self._ranks[field] = ranks
+        return ranks
+
+    def prepare(self, spec: SortSpec):
+        """预先计算 spec 中各字段的名次（可以在后台线程中调用）"""
+        for field, _ in parse_spec(spec):
+            self.ranks(field)
+
+    def sort(self, fids: Iterable[int], spec: SortSpec) -> List[int]:
+        """按 spec 排序文件编号，各字段都相同的文件保持原有相对顺序"""
+        fields = parse_spec(spec)
+        self.prepare(fields)
+        fids = list(fids)
+        with tracer.span("sort", spec=",".join(("-" if desc else "") + field for field, desc in fields)):
+            for field, descending in reversed(fields):
+                fids.sort(key=self._ranks[field].__getitem__, reverse=descending)
+        return fids
+
+
+def sort_entries(entries: Sequence[ScanEntry], spec: SortSpec,
+                 keys: Optional[SortKeys] = None) -> List[ScanEntry]:
+    """按 spec 排序一组扫描结果"""
+    keys = keys or SortKeys.from_entries(entries)
+    return [entries[fid] for fid in keys.sort(range(len(entries)), spec)]
@@ -0,0 +1,146 @@
+"""同盘暂存重排：在U盘内移动文件来重建目录项顺序，不经过备份目录
+
+先把要排序的文件全部移动到同一卷上的暂存目录（只修改目录项，不复制数据），
+再按列表顺序逐个移回目标目录并改为最终文件名。移回时依次创建新的目录项，
+目录项的分配方式与"删除后按顺序重新复制"完全相同，但数据只在U盘上原地不动。
+只有不在同一卷上的文件（无法移动）才需要复制。
+
+两个阶段的全部移动写入同一个重命名日志，中断后可以在下次加载时继续完成或回滚。
+"""
+import os
+import shutil
+from typing import Callable, List, NamedTuple, Optional, Tuple
+
+from src.core.copy_engine import CopyEngine, CopyTask, StageReport
+from src.core.instrumentation import tracer
+from src.core.rename_planner import RenameJournal, RenameStep, apply_steps
+
+STAGING_DIRNAME = ".udisk_staging"
+FREE_SPACE_MARGIN = 16 * 1024 * 1024  # 需要复制时额外保留的空间（目录、FAT 表增长等）
+
+
+class FinalStep(NamedTuple):
+    """第二阶段：把文件放到最终位置"""
+    src: str    # 暂存路径（移动）或外部来源（复制）
+    dst: str
+    copy: bool
+    size: int
+
+
+class StagingPlan:
+    """同盘暂存重排计划"""
+
+    def __init__(self, target_dir: str):
+        self.target_dir = target_dir
+        self.staging_dir = os.path.join(target_dir, STAGING_DIRNAME)
+        self.moves: List[RenameStep] = []   # 第一阶段：移入暂存目录
+        self.final: List[FinalStep] = []    # 第二阶段：按顺序放到最终位置
+
+    @property
+    def copy_bytes(self) -> int:
+        return sum(step.size for step in self.final if step.copy)
+
+    @property
+    def copy_count(self) -> int:
+        return sum(1 for step in self.final if step.copy)
+
+    def rename_steps(self) -> List[RenameStep]:
+        """写入日志的全部移动步骤（按执行顺序）"""
+        return list(self.moves) + [RenameStep(step.src, step.dst) for step in self.final if not step.copy]
+
+    def summary(self) -> str:
+        text = f"在U盘内移动 {len(self.moves)} 个文件"
+        if self.copy_count:
+            text += f"，复制 {self.copy_count} 个其他位置的文件（{self.copy_bytes / (1024 * 1024):.1f}MB）"
+        return text
+
+
+def _key(path: str) -> str:
+    return os.path.normcase(os.path.abspath(path))
+
+
+def plan_staging(target_dir: str, items: List[Tuple[str, str]]) -> StagingPlan:
+    """为 [(来源路径, 最终文件名)] 生成暂存重排计划，最终文件都放在 target_dir 中
+
+    与 target_dir 在同一卷上的来源文件通过移动完成，其余的复制。
+    最终文件名与列表之外的现有文件冲突时抛出 FileExistsError。
+    """
+    plan = StagingPlan(target_dir)
+    if os.path.isdir(plan.staging_dir) and os.listdir(plan.staging_dir):
+        raise FileExistsError(f"暂存目录中还有上次未完成的文件，请先处理：{plan.staging_dir}")
+    target_dev = os.stat(target_dir).st_dev
+    sources = {_key(src) for src, _ in items}
+    finals = set()
+    for index, (src, name) in enumerate(items):
+        dst = os.path.join(target_dir, name)
+        if _key(dst) in finals:
+            raise ValueError(f"目标文件名重复：{name}")
+        finals.add(_key(dst))
+        if os.path.exists(dst) and _key(dst) not in sources:
+            raise FileExistsError(f"目标文件已存在且不在排序列表中：{dst}")
+        st = os.stat(src)
+        if st.st_dev == target_dev:
+            staged = os.path.join(plan.staging_dir, f"{index:05d}_{os.path.basename(src)}")
+            plan.moves.append(RenameStep(src, staged))
+            plan.final.append(FinalStep(staged, dst, False, st.st_size))
+        else:
+            plan.final.append(FinalStep(src, dst, True, st.st_size))
+    return plan
+
+
+def apply_staging(plan: StagingPlan, engine: Optional[CopyEngine] = None,
+                  progress: Optional[Callable[[str, int, int], None]] = None,
+                  journal_dir: Optional[str] = None) -> StageReport:
+    """执行暂存重排，返回复制部分的统计（没有需要复制的文件时为空统计）
+
+    progress(阶段, 已完成, 总数)，阶段为 "stage"（移入暂存目录）或 "final"（放到最终位置）。
+    """
+    if plan.copy_bytes and plan.copy_bytes + FREE_SPACE_MARGIN > shutil.disk_usage(plan.target_dir).free:
+        raise OSError(f"U盘剩余空间不足，需要复制 {plan.copy_bytes / (1024 * 1024):.1f}MB")
+    engine = engine or CopyEngine()
+    report = StageReport("staging_copy")
+    os.makedirs(plan.staging_dir, exist_ok=True)
+
+    journal = RenameJournal.for_directory(journal_dir or plan.target_dir)
+    journal.begin(plan.rename_steps())
+    try:
+        with tracer.span("staging.stage", files=len(plan.moves)):
+            apply_steps(plan.moves, journal=journal,
+                        progress=(lambda done, total: progress("stage", done, total)) if progress else None)
+
+        total = len(plan.final)
+        offset = len(plan.moves)
+        done = 0
+        with tracer.span("staging.final", files=total):
+            # 按顺序把连续的移动或复制合并成一批执行
+            index = 0
+            while index < total:
+                end = index
+                while end < total and plan.final[end].copy == plan.final[index].copy:
+                    end += 1
+                batch = plan.final[index:end]
+                if batch[0].copy:
+                    part = engine.copy([CopyTask(step.src, step.dst, step.size) for step in batch], "staging_copy")
+                    report.files += part.files
+                    report.bytes += part.bytes
+                    report.elapsed += part.elapsed
+                else:
+                    apply_steps([RenameStep(step.src, step.dst) for step in batch], journal=journal,
+                                offset=offset,
+                                progress=(lambda n, _, base=done: progress("final", base + n, total))
+                                if progress else None)
+                    offset += len(batch)
+                done += len(batch)
+                if progress and batch[0].copy:
+                    progress("final", done, total)
+                index = end
+    except BaseException:
+        journal.close()  # 保留日志，下次加载时可继续或回滚
+        raise
+    journal.finish()
+
+    try:
+        os.rmdir(plan.staging_dir)
+    except OSError:
+        pass  # 暂存目录中还有其他文件时保留
+    return report
@@ -0,0 +1,151 @@
+import hashlib
+import os
+import time
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from src.core.copy_engine import CopyEngine, CopyTask, StageReport
+from src.core.instrumentation import tracer
+from src.core.rename_planner import rename_with_journal
+
+QUICK_HASH_CHUNK = 64 * 1024
+
+
+class SyncTarget(NamedTuple):
+    """目标布局中的一个文件"""
+    final_name: str               # U盘根目录下的最终文件名
+    source: str                   # 内容来源（需要复制时从这里读取）
+    original: Optional[str] = None  # 该文件当前在U盘上的路径（如果已知）
+
+
+def quick_hash(path: str, size: Optional[int] = None, chunk: int = QUICK_HASH_CHUNK) -> str:
+    """只读取文件首尾各 chunk 字节计算的快速哈希"""
+    if size is None:
+        size = os.path.getsize(path)
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(size.to_bytes(8, "little"))
+    with open(path, "rb") as f:
+        digest.update(f.read(chunk))
+        if size > chunk:
+            f.seek(max(chunk, size - chunk))
+            digest.update(f.read(chunk))
+    return digest.hexdigest()
+
+
+class SyncPlan:
+    """增量同步计划"""
+
+    def __init__(self):
+        self.renames: List[Tuple[str, str]] = []  # (U盘上的旧路径, 新路径)
+        self.copies: List[CopyTask] = []          # 需要重新写入的内容
+        self.deletes: List[str] = []              # 目标布局中不再需要的文件
+        self.unchanged: List[str] = []            # 已经在正确位置的文件
+
+    @property
+    def copy_bytes(self) -> int:
+        return sum(task.size for task in self.copies)
+
+    def summary(self) -> str:
+        return (f"保持不变 {len(self.unchanged)} 个，重命名 {len(self.renames)} 个，"
+                f"复制 {len(self.copies)} 个（{self.copy_bytes / (1024 * 1024):.1f}MB），"
+                f"删除 {len(self.deletes)} 个")
+
+
+def plan_sync(drive: str, targets: Iterable[SyncTarget], existing: Iterable[Tuple[str, int]],
+              use_hash: bool = False) -> SyncPlan:
+    """比较目标布局与U盘现有文件，生成同步计划
+
+    existing 为U盘上现有媒体文件的 (路径, 大小)。内容按大小判断是否相同，
+    use_hash 为 True 时还要求首尾快速哈希一致。内容已在U盘上的文件只重命名，
+    其余的才从 source 复制。
+    """
+    plan = SyncPlan()
+    sizes: Dict[str, int] = {}
+    by_size: Dict[int, List[str]] = {}
+    for path, size in existing:
+        sizes[path] = size
+        by_size.setdefault(size, []).append(path)
+    used = set()
+    hashes: Dict[str, str] = {}
+
+    def hash_of(path: str, size: int) -> str:
+        if path not in hashes:
+            hashes[path] = quick_hash(path, size)
+        return hashes[path]
+
+    def same_content(candidate: str, source: str, size: int) -> bool:
+        if sizes.get(candidate) != size:
+            return False
+        if not use_hash or os.path.normcase(candidate) == os.path.normcase(source):
+            return True
+        return hash_of(candidate, size) == hash_of(source, size)
+
+    target_list = list(targets)
+    pending = []
+    # 第一轮：优先匹配文件自己原来的位置
+    for target in target_list:
+        size = os.path.getsize(target.source)
+        dst = os.path.join(drive, target.final_name)
+        if target.original and target.original not in used and same_content(target.original, target.source, size):
+            used.add(target.original)
+            _add_match(plan, target.original, dst)
+        else:
+            pending.append((target, size, dst))
+
+    # 第二轮：在同样大小的其他文件中寻找相同内容
+    for target, size, dst in pending:
+        match = None
+        for candidate in by_size.get(size, ()):
+            if candidate not in used and same_content(candidate, target.source, size):
+                match = candidate
+                break
+        if match is not None:
+            used.add(match)
+            _add_match(plan, match, dst)
+        else:
+            plan.copies.append(CopyTask(target.source, dst, size))
+
+    plan.deletes = [path for path in sizes if path not in used]
+    return plan
+
+
+def _add_match(plan: SyncPlan, current: str, dst: str):
+    if os.path.normcase(os.path.abspath(current)) == os.path.normcase(os.path.abspath(dst)):
+        plan.unchanged.append(current)
+    else:
+        plan.renames.append((current, dst))
+
+
+def apply_sync(plan: SyncPlan, engine: Optional[CopyEngine] = None,
+               progress: Optional[Callable[[str, int, int], None]] = None,
+               journal_dir: Optional[str] = None) -> StageReport:
+    """执行同步计划，返回复制阶段的统计
+
+    顺序：删除多余文件 → 重命名（由重命名规划器处理互换名称，并写入日志）→ 复制新内容。
+    仍被用作复制来源的多余文件在复制完成后才删除。
+    """
+    copy_sources = {os.path.normcase(task.src) for task in plan.copies}
+    deferred = [path for path in plan.deletes if os.path.normcase(path) in copy_sources]
+    with tracer.span("delete", files=len(plan.deletes) - len(deferred)):
+        for path in plan.deletes:
+            if os.path.normcase(path) not in copy_sources:
+                started = time.perf_counter()
+                os.remove(path)
+                tracer.file_op("delete.file", path, started, time.perf_counter() - started)
+    if progress:
+        progress("delete", len(plan.deletes) - len(deferred), len(plan.deletes))
+
+    if plan.renames:
+        rename_with_journal(plan.renames, journal_dir or os.path.dirname(plan.renames[0][1]),
+                            progress=(lambda done, total: progress("rename", done, total)) if progress else None)
+
+    engine = engine or CopyEngine()
+    tasks = [task for task in plan.copies
+             if os.path.normcase(os.path.abspath(task.src)) != os.path.normcase(os.path.abspath(task.dst))]
+    report = engine.copy(tasks, "sync",
+                         progress=(lambda done, total, *_: progress("copy", done, total)) if progress else None)
+
+    written = {os.path.normcase(task.dst) for task in tasks}
+    for path in deferred:
+        if os.path.normcase(path) not in written:
+            os.remove(path)
+    return report
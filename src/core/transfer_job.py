@@ -0,0 +1,209 @@
+"""完整重写的传输任务：备份 → 清空U盘 → 从备份复制回U盘，进度记录在检查点文件中
+
+检查点文件放在备份目录中（U盘可能被拔出），格式为 JSON Lines：
+第一行记录任务（U盘、会话目录和文件列表），之后每完成一个文件追加一行，
+大文件每复制 CHECKPOINT_BYTES 追加一行已复制的偏移量，每个阶段结束时追加一行阶段标记。
+
+程序崩溃或U盘被拔出后，下次加载U盘时可以从检查点继续：
+已记录完成的文件检查目标大小和修改时间，续传的大文件先比对偏移量之前最后一段数据，
+校验不通过的文件重新复制。尚未落盘的完成记录可能丢失，因此未记录的文件同样按大小和
+修改时间判断是否已经复制完成。
+"""
+import json
+import os
+import threading
+from typing import Dict, List, Optional
+
+from src.core.copy_engine import CopyTask, TransferControl
+from src.core.instrumentation import tracer
+
+CHECKPOINT_FILENAME = ".udisk_transfer.jsonl"
+STAGES = ("backup", "clear", "copy")  # 备份、清空U盘（删除或格式化）、复制回U盘
+VERIFY_BYTES = 1024 * 1024            # 续传前比对的数据长度
+_FSYNC_EVERY = 16                     # 每记录这么多个完成的文件同步一次检查点
+
+
+def _same_file(src: str, dst: str, size: int) -> bool:
+    """目标文件是否已完整复制（复制完成后会同步修改时间，FAT 的修改时间精度为 2 秒）"""
+    try:
+        st_src = os.stat(src)
+        st_dst = os.stat(dst)
+    except OSError:
+        return False
+    return st_dst.st_size == size and abs(st_dst.st_mtime - st_src.st_mtime) <= 2
+
+
+def _verify_prefix(src: str, dst: str, offset: int) -> bool:
+    """目标文件至少有 offset 字节，且 offset 之前最后一段数据与来源一致"""
+    try:
+        if os.path.getsize(dst) < offset:
+            return False
+        start = max(0, offset - VERIFY_BYTES)
+        with open(src, "rb") as fsrc, open(dst, "rb") as fdst:
+            fsrc.seek(start)
+            fdst.seek(start)
+            return fsrc.read(offset - start) == fdst.read(offset - start)
+    except OSError:
+        return False
+
+
+class TransferJob:
+    """一次完整重写的检查点"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.drive = ""
+        self.volume_key: Optional[str] = None
+        self.session_dir = ""
+        self.files: List[list] = []  # [相对U盘根目录的来源路径, 最终文件名, 大小]
+        self.done: Dict[str, set] = {stage: set() for stage in STAGES}
+        self.partial: Dict[str, Dict[int, int]] = {stage: {} for stage in STAGES}
+        self.finished_stages: set = set()
+        self._file = None
+        self._since_sync = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def for_directory(backup_dir: str) -> "TransferJob":
+        return TransferJob(os.path.join(backup_dir, CHECKPOINT_FILENAME))
+
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+
+    def begin(self, drive: str, volume_key: Optional[str], session_dir: str, files_to_process: List[dict]):
+        """记录新任务，files_to_process 与 MainWindow.save_files 中的格式相同"""
+        self.drive = drive
+        self.volume_key = volume_key
+        self.session_dir = session_dir
+        self.files = [[os.path.relpath(info['src'], drive), info['final_name'], os.path.getsize(info['src'])]
+                      for info in files_to_process]
+        self._file = open(self.path, "w", encoding="utf-8")
+        self._write({"version": 1, "drive": drive, "volume_key": volume_key,
+                     "session_dir": session_dir, "files": self.files})
+        self._sync()
+
+    def load(self):
+        """读取检查点，之后用 open_for_append() 继续记录"""
+        with open(self.path, "r", encoding="utf-8") as f:
+            header = json.loads(f.readline())
+            self.drive = header["drive"]
+            self.volume_key = header.get("volume_key")
+            self.session_dir = header["session_dir"]
+            self.files = header["files"]
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break  # 写到一半的最后一行
+                stage = record.get("stage")
+                if stage not in STAGES:
+                    continue
+                if record.get("end"):
+                    self.finished_stages.add(stage)
+                elif "offset" in record:
+                    self.partial[stage][record["index"]] = record["offset"]
+                else:
+                    self.done[stage].add(record["index"])
+                    self.partial[stage].pop(record["index"], None)
+
+    def open_for_append(self):
+        self._file = open(self.path, "a", encoding="utf-8")
+
+    def matches(self, drive: str, volume_key: Optional[str]) -> bool:
+        """检查点是否属于该U盘（盘符可能变化，优先比较卷标识）"""
+        if self.volume_key and volume_key:
+            return self.volume_key == volume_key
+        return os.path.normcase(self.drive) == os.path.normcase(drive)
+
+    def stage_done(self, stage: str) -> bool:
+        return stage in self.finished_stages
+
+    def files_to_process(self, drive: str) -> List[dict]:
+        """按当前盘符还原 save_files 使用的文件列表"""
+        return [{'src': os.path.join(drive, rel_src),
+                 'backup_path': os.path.join(self.session_dir, name),
+                 'final_name': name} for rel_src, name, _ in self.files]
+
+    def _pairs(self, stage: str, drive: str):
+        for index, (rel_src, name, size) in enumerate(self.files):
+            backup_path = os.path.join(self.session_dir, name)
+            if stage == "backup":
+                yield index, os.path.join(drive, rel_src), backup_path, size
+            else:
+                yield index, backup_path, os.path.join(drive, name), size
+
+    def pending_tasks(self, stage: str, drive: str) -> List[CopyTask]:
+        """该阶段还需要复制的任务，已复制一部分的大文件校验后从断点续传"""
+        tasks = []
+        skipped = 0
+        with tracer.span("transfer.verify", stage=stage):
+            for index, src, dst, size in self._pairs(stage, drive):
+                if _same_file(src, dst, size):
+                    skipped += 1
+                    continue
+                if index in self.done[stage]:
+                    tracer.event("transfer.verify_failed", path=dst)
+                offset = self.partial[stage].get(index, 0)
+                if offset and not _verify_prefix(src, dst, offset):
+                    tracer.event("transfer.verify_failed", path=dst, offset=offset)
+                    offset = 0
+                tasks.append(CopyTask(src, dst, size, offset))
+        tracer.count("transfer.skipped", skipped)
+        return tasks
+
+    def bind(self, control: TransferControl, stage: str) -> TransferControl:
+        """让 control 把该阶段的进度记录到检查点"""
+        # 最终文件名各不相同，按文件名查找（复制回U盘时盘符可能与记录的不同）
+        index_of = {os.path.normcase(name): index for index, (_, name, _) in enumerate(self.files)}
+
+        def lookup(task: CopyTask) -> Optional[int]:
+            return index_of.get(os.path.normcase(os.path.basename(task.dst)))
+
+        def on_file_done(task: CopyTask):
+            index = lookup(task)
+            if index is not None:
+                self._record({"stage": stage, "index": index})
+
+        def on_chunk_done(task: CopyTask, offset: int):
+            index = lookup(task)
+            if index is not None:
+                self._record({"stage": stage, "index": index, "offset": offset}, sync=True)
+
+        control.on_file_done = on_file_done
+        control.on_chunk_done = on_chunk_done
+        return control
+
+    def complete_stage(self, stage: str):
+        self.finished_stages.add(stage)
+        self._record({"stage": stage, "end": True}, sync=True)
+
+    def _write(self, record: dict):
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def _record(self, record: dict, sync: bool = False):
+        with self._lock:
+            if self._file is None:
+                return
+            self._write(record)
+            self._file.flush()
+            self._since_sync += 1
+            if sync or self._since_sync >= _FSYNC_EVERY:
+                self._sync()
+
+    def _sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._since_sync = 0
+
+    def close(self):
+        """停止记录，保留检查点以便稍后继续"""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def finish(self):
+        """任务完成或放弃后删除检查点（备份文件保留在会话目录中）"""
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
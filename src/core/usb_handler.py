@@ -1,6 +1,29 @@
-import win32api
-import win32file
-import string
+import os
+import struct
+from contextlib import contextmanager
+
+from src.core.instrumentation import tracer
+
+win32api = win32file = winioctlcon = None  # pywin32 在第一次需要时才导入（见 _load_win32）
+
+
+def _load_win32() -> bool:
+    """导入 pywin32，返回是否可用；非 Windows 平台上设备发现使用其他后端，原始卷操作不可用
+
+    导入 pywin32 需要加载若干 DLL，推迟到第一次需要时（如 Win32 后端在后台线程中第一次列出设备）进行，
+    不占用程序启动、窗口显示前的时间。
+    """
+    global win32api, win32file, winioctlcon
+    if win32file is None:
+        try:
+            import win32api as api
+            import win32file as file
+            import winioctlcon as ioctl
+        except ImportError:
+            return False
+        win32api, win32file, winioctlcon = api, file, ioctl
+    return True
+
 
 class USBHandler:
     @staticmethod
@@ -11,13 +34,20 @@ class USBHandler:
             # 注意：实际实现时需要添加更多的错误处理和用户确认
             return True
         except Exception as e:
-            print(f"格式化失败: {str(e)}")
+            tracer.event("format.failed", drive=drive_letter, error=str(e))
             return False
 
     @staticmethod
     def get_drive_info(drive_letter: str) -> dict:
         """获取驱动器信息"""
         try:
+            if not _load_win32():
+                st = os.statvfs(drive_letter)
+                return {
+                    "total_space": st.f_blocks * st.f_frsize,
+                    "sector_size": 512,
+                    "cluster_size": st.f_bsize
+                }
             sectors_per_cluster, bytes_per_sector, _, _, _ = win32api.GetDiskFreeSpace(drive_letter)
             total_bytes = win32file.GetDiskFreeSpaceEx(drive_letter)[1]
             return {
@@ -26,30 +56,93 @@ class USBHandler:
                 "cluster_size": sectors_per_cluster * bytes_per_sector
             }
         except Exception as e:
-            print(f"获取驱动器信息失败: {str(e)}")
+            tracer.event("drive_info.failed", drive=drive_letter, error=str(e))
             return {}
 
     @staticmethod
     def get_usb_drives():
-        """获取所有可用的U盘驱动器"""
-        drives = []
-        # 获取所有驱动器字母
-        drive_letters = list(string.ascii_uppercase)
-        for letter in drive_letters:
-            drive = f"{letter}:\\"
+        """获取所有可用的U盘驱动器（一次性查询；需要缓存和插拔通知时使用 DriveDiscovery）"""
+        from src.core.drive_discovery import default_backend
+        backend = default_backend()
+        try:
+            return backend.list_drives()
+        finally:
+            backend.close()
+
+    @staticmethod
+    def volume_key(drive: dict) -> str:
+        """生成用于持久化索引的卷标识（卷标 + 卷序列号）"""
+        serial = drive.get('serial')
+        if serial is None:
+            return f"{drive['name']}@{drive['letter']}"
+        return f"{drive['name']}-{serial:08X}"
+
+    @staticmethod
+    def raw_access_available() -> bool:
+        """是否可以锁定并直接读写卷（仅 Windows）"""
+        return _load_win32()
+
+    @staticmethod
+    def _require_win32():
+        if not _load_win32():
+            raise OSError("直接读写卷只支持 Windows")
+
+    @staticmethod
+    def _device_path(drive_letter: str) -> str:
+        return "\\\\.\\" + drive_letter.rstrip("\\").rstrip(":") + ":"
+
+    @staticmethod
+    def volume_length(drive_letter: str) -> int:
+        """卷（分区）的总字节数，包括文件系统自身占用的部分"""
+        USBHandler._require_win32()
+        handle = win32file.CreateFile(USBHandler._device_path(drive_letter), win32file.GENERIC_READ,
+                                      win32file.FILE_SHARE_READ | win32file.FILE_SHARE_WRITE,
+                                      None, win32file.OPEN_EXISTING, 0, None)
+        try:
+            data = win32file.DeviceIoControl(handle, winioctlcon.IOCTL_DISK_GET_LENGTH_INFO, None, 8)
+            return struct.unpack("<q", data)[0]
+        finally:
+            handle.Close()
+
+    @staticmethod
+    def partition_offset(drive_letter: str) -> int:
+        """卷在磁盘上的起始字节偏移（分区表中记录的起始位置）"""
+        USBHandler._require_win32()
+        handle = win32file.CreateFile(USBHandler._device_path(drive_letter), win32file.GENERIC_READ,
+                                      win32file.FILE_SHARE_READ | win32file.FILE_SHARE_WRITE,
+                                      None, win32file.OPEN_EXISTING, 0, None)
+        try:
+            # PARTITION_INFORMATION_EX：PartitionStyle 之后按 8 字节对齐的 StartingOffset
+            data = win32file.DeviceIoControl(handle, winioctlcon.IOCTL_DISK_GET_PARTITION_INFO_EX, None, 144)
+            return struct.unpack_from("<q", data, 8)[0]
+        finally:
+            handle.Close()
+
+    @staticmethod
+    @contextmanager
+    def locked_volume(drive_letter: str):
+        """锁定卷并以原始设备方式打开（如 \\\\.\\E:），供直接修改目录表或写入整个文件系统使用
+
+        退出时卸载卷，系统下次访问时会重新读取目录表。卷上有其他程序打开的文件时锁定会失败。
+        """
+        USBHandler._require_win32()
+        import msvcrt
+        handle = win32file.CreateFile(USBHandler._device_path(drive_letter),
+                                      win32file.GENERIC_READ | win32file.GENERIC_WRITE,
+                                      win32file.FILE_SHARE_READ | win32file.FILE_SHARE_WRITE,
+                                      None, win32file.OPEN_EXISTING, 0, None)
+        try:
+            win32file.DeviceIoControl(handle, winioctlcon.FSCTL_LOCK_VOLUME, None, None)
+        except Exception:
+            handle.Close()
+            raise
+        raw_handle = handle.Detach()
+        f = os.fdopen(msvcrt.open_osfhandle(raw_handle, os.O_RDWR | os.O_BINARY), "r+b", buffering=0)
+        try:
+            yield f
+        finally:
             try:
-                drive_type = win32file.GetDriveType(drive)
-                # 检查是否是可移动设备
-                if drive_type == win32file.DRIVE_REMOVABLE:
-                    # 获取驱动器卷标
-                    try:
-                        volume_name = win32api.GetVolumeInformation(drive)[0]
-                        drives.append({
-                            'letter': drive,
-                            'name': volume_name if volume_name else '可移动磁盘'
-                        })
-                    except:
-                        continue
-            except:
-                continue
-        return drives
\ No newline at end of file
+                win32file.DeviceIoControl(raw_handle, winioctlcon.FSCTL_DISMOUNT_VOLUME, None, None)
+                win32file.DeviceIoControl(raw_handle, winioctlcon.FSCTL_UNLOCK_VOLUME, None, None)
+            finally:
+                f.close()
@@ -0,0 +1,462 @@
+import bisect
+import os
+import time
+
+from PyQt6.QtCore import QAbstractItemModel, QFileSystemWatcher, QModelIndex, Qt, QTimer, pyqtSignal
+from PyQt6.QtWidgets import QHeaderView, QLabel, QTreeView, QVBoxLayout, QWidget
+
+from src.core.backup_store import SESSION_FORMAT, BackupEntry, scan_backup_dir
+from src.core.instrumentation import tracer
+from src.ui.workers import TaskWorker
+
+FETCH_BATCH = 256        # 每次向视图提供的行数，滚动到末尾时再取下一批
+RESCAN_DELAY_MS = 300    # 目录变化后稍等再重新读取，连续的变化合并为一次
+ROOT_GROUP = "（未分组）"
+_SESSION_NAME_LENGTH = len(time.strftime(SESSION_FORMAT))
+
+
+def _scan(path):
+    started = time.perf_counter()
+    result = scan_backup_dir(path)
+    tracer.file_op("backup_list.dir", path, started, time.perf_counter() - started)
+    return result
+
+
+def _list_root(root):
+    """读取备份目录顶层，目录不存在或无法读取时返回空列表"""
+    if not root or not os.path.isdir(root):
+        return [], []
+    try:
+        return _scan(root)
+    except OSError:
+        return [], []
+
+
+class _Session:
+    """一个备份会话（子目录）；name 为空表示备份目录根部的文件"""
+
+    def __init__(self, name, path, files=None):
+        self.name = name
+        self.path = path
+        self.files = None   # List[BackupEntry]，展开前为 None
+        self.names = []     # 与 files 对应的文件名，用于二分查找
+        self.fetched = 0    # 已经提供给视图的行数
+        self.total = 0
+        if files is not None:
+            self.set_files(files)
+
+    def set_files(self, files):
+        self.files = list(files)
+        self.names = [entry.name for entry in self.files]
+        self.total = sum(entry.size for entry in self.files)
+
+    def title(self):
+        return self.name or ROOT_GROUP
+
+    def started_at(self):
+        try:
+            return time.strftime('%Y-%m-%d %H:%M:%S',
+                                 time.strptime(self.name[:_SESSION_NAME_LENGTH], SESSION_FORMAT))
+        except ValueError:
+            return ""
+
+
+class BackupTreeModel(QAbstractItemModel):
+    """按备份会话分组的备份文件树
+
+    顶层只列出会话子目录（一次 scandir），会话中的文件在展开时才读取，
+    并按 FETCH_BATCH 分批提供给视图。update_file() / rescan() 只增删变化的行。
+    """
+
+    COLUMNS = ("名称", "大小", "修改时间")
+
+    session_loaded = pyqtSignal(str)   # 会话目录的文件已读取（需要开始监视该目录）
+    summary_changed = pyqtSignal()
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.root = None
+        self._sessions = []
+        self._by_id = {}
+
+    # ---- 整体加载 ----
+
+    def set_root(self, root, listing=None):
+        """listing 为已在后台读取的 _list_root(root) 结果，省略时在这里读取"""
+        if listing is None:
+            listing = _list_root(root)
+        dirs, files = listing
+        self.beginResetModel()
+        self.root = root
+        self._sessions = []
+        self._by_id = {}
+        for name in reversed(dirs):  # 新的会话排在前面
+            self._append(_Session(name, os.path.join(root, name)))
+        if files:
+            self._append(_Session("", root, files))
+        self.endResetModel()
+        self.summary_changed.emit()
+
+    def _append(self, session):
+        self._sessions.append(session)
+        self._by_id[id(session)] = session
+
+    def session_count(self):
+        return sum(1 for session in self._sessions if session.name)
+
+    def loose_file_count(self):
+        group = self._session_named("")
+        return len(group.files) if group is not None and group.files else 0
+
+    # ---- 模型接口 ----
+
+    def index(self, row, column, parent=QModelIndex()):
+        if not self.hasIndex(row, column, parent):
+            return QModelIndex()
+        if not parent.isValid():
+            return self.createIndex(row, column, 0)
+        return self.createIndex(row, column, id(self._sessions[parent.row()]))
+
+    def parent(self, index):
+        if not index.isValid() or index.internalId() == 0:
+            return QModelIndex()
+        session = self._by_id.get(index.internalId())
+        if session is None:
+            return QModelIndex()
+        return self.createIndex(self._sessions.index(session), 0, 0)
+
+    def rowCount(self, parent=QModelIndex()):
+        if not parent.isValid():
+            return len(self._sessions)
+        if parent.internalId() == 0 and parent.column() == 0:
+            return self._sessions[parent.row()].fetched
+        return 0
+
+    def columnCount(self, parent=QModelIndex()):
+        return len(self.COLUMNS)
+
+    def hasChildren(self, parent=QModelIndex()):
+        if not parent.isValid():
+            return bool(self._sessions)
+        if parent.internalId() == 0 and parent.column() == 0:
+            session = self._sessions[parent.row()]
+            return session.files is None or bool(session.files)
+        return False
+
+    def canFetchMore(self, parent):
+        if not parent.isValid() or parent.internalId() != 0:
+            return False
+        session = self._sessions[parent.row()]
+        return session.files is None or session.fetched < len(session.files)
+
+    def fetchMore(self, parent):
+        if not parent.isValid() or parent.internalId() != 0:
+            return
+        session = self._sessions[parent.row()]
+        if session.files is None:
+            try:
+                session.set_files(_scan(session.path)[1])
+            except OSError:
+                session.set_files([])
+            self.session_loaded.emit(session.path)
+            self._session_changed(session)
+        count = min(FETCH_BATCH, len(session.files) - session.fetched)
+        if count <= 0:
+            return
+        parent = self.index(parent.row(), 0)
+        self.beginInsertRows(parent, session.fetched, session.fetched + count - 1)
+        session.fetched += count
+        self.endInsertRows()
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        column = index.column()
+        if index.internalId() == 0:
+            session = self._sessions[index.row()]
+            if role == Qt.ItemDataRole.DisplayRole:
+                if column == 0:
+                    if session.files is None:
+                        return session.title()
+                    return f"{session.title()}（{len(session.files)} 个文件）"
+                if column == 1 and session.files is not None:
+                    return f"{session.total / (1024 * 1024):.2f}MB"
+                if column == 2:
+                    return session.started_at()
+            elif role == Qt.ItemDataRole.ToolTipRole:
+                return session.path
+            return None
+        session = self._by_id.get(index.internalId())
+        if session is None or index.row() >= session.fetched:
+            return None
+        entry = session.files[index.row()]
+        if role == Qt.ItemDataRole.DisplayRole:
+            if column == 0:
+                return entry.name
+            if column == 1:
+                return f"{entry.size / (1024 * 1024):.2f}MB"
+            if column == 2:
+                return time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(entry.mtime))
+        elif role == Qt.ItemDataRole.ToolTipRole:
+            return entry.path
+        return None
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if orientation == Qt.Orientation.Horizontal and role == Qt.ItemDataRole.DisplayRole:
+            return self.COLUMNS[section]
+        return None
+
+    # ---- 增量更新 ----
+
+    def _session_named(self, name):
+        for session in self._sessions:
+            if session.name == name:
+                return session
+        return None
+
+    def _session_index(self, session):
+        return self.index(self._sessions.index(session), 0)
+
+    def _session_changed(self, session):
+        row = self._sessions.index(session)
+        self.dataChanged.emit(self.index(row, 0), self.index(row, len(self.COLUMNS) - 1))
+
+    def _insert_session(self, session):
+        # 会话按名称倒序（新的在前），未分组的文件始终在最后
+        row = 0
+        while row < len(self._sessions) and self._sessions[row].name and \
+                (not session.name or self._sessions[row].name > session.name):
+            row += 1
+        self.beginInsertRows(QModelIndex(), row, row)
+        self._sessions.insert(row, session)
+        self._by_id[id(session)] = session
+        self.endInsertRows()
+        self.summary_changed.emit()
+
+    def _remove_session(self, session):
+        row = self._sessions.index(session)
+        self.beginRemoveRows(QModelIndex(), row, row)
+        del self._sessions[row]
+        del self._by_id[id(session)]
+        self.endRemoveRows()
+        self.summary_changed.emit()
+
+    def _session_for(self, directory, create=True):
+        """目录对应的会话，create 为 True 且目录是新出现的会话子目录时创建"""
+        if not self.root:
+            return None
+        root = os.path.normcase(os.path.abspath(self.root))
+        directory = os.path.abspath(directory)
+        if os.path.normcase(directory) == root:
+            session = self._session_named("")
+            if session is None and create:
+                session = _Session("", self.root, [])
+                self._insert_session(session)
+            return session
+        parent, name = os.path.split(directory)
+        if os.path.normcase(parent) != root or name.startswith("."):
+            return None
+        session = self._session_named(name)
+        if session is None and create:
+            session = _Session(name, directory, [])
+            self._insert_session(session)
+        return session
+
+    def _upsert(self, session, entry):
+        row = bisect.bisect_left(session.names, entry.name)
+        if row < len(session.names) and session.names[row] == entry.name:
+            session.total += entry.size - session.files[row].size
+            session.files[row] = entry
+            if row < session.fetched:
+                parent = self._session_index(session)
+                self.dataChanged.emit(self.index(row, 0, parent),
+                                      self.index(row, len(self.COLUMNS) - 1, parent))
+        else:
+            visible = row < session.fetched or session.fetched == len(session.files)
+            if visible:
+                self.beginInsertRows(self._session_index(session), row, row)
+            session.files.insert(row, entry)
+            session.names.insert(row, entry.name)
+            session.total += entry.size
+            if visible:
+                session.fetched += 1
+                self.endInsertRows()
+        self._session_changed(session)
+
+    def _remove_file(self, session, name):
+        row = bisect.bisect_left(session.names, name)
+        if row >= len(session.names) or session.names[row] != name:
+            return
+        visible = row < session.fetched
+        if visible:
+            self.beginRemoveRows(self._session_index(session), row, row)
+        session.total -= session.files[row].size
+        del session.files[row]
+        del session.names[row]
+        if visible:
+            session.fetched -= 1
+            self.endRemoveRows()
+        self._session_changed(session)
+
+    def update_file(self, path):
+        """单个文件被写入（复制引擎事件）后更新对应的行"""
+        session = self._session_for(os.path.dirname(path))
+        if session is None or session.files is None:
+            return  # 会话尚未展开，展开时会读取到
+        try:
+            st = os.stat(path)
+        except OSError:
+            self._remove_file(session, os.path.basename(path))
+            return
+        self._upsert(session, BackupEntry(os.path.basename(path), path, st.st_size, st.st_mtime))
+
+    def rescan(self, directory):
+        """目录内容发生变化后重新读取该目录，只增删变化的行"""
+        if not self.root:
+            return
+        if os.path.normcase(os.path.abspath(directory)) == os.path.normcase(os.path.abspath(self.root)):
+            try:
+                dirs, files = _scan(self.root)
+            except OSError:
+                self.set_root(self.root)
+                return
+            for session in [s for s in self._sessions if s.name and s.name not in dirs]:
+                self._remove_session(session)
+            for name in dirs:
+                if self._session_named(name) is None:
+                    self._insert_session(_Session(name, os.path.join(self.root, name)))
+            group = self._session_named("")
+            if files and group is None:
+                self._insert_session(_Session("", self.root, files))
+            elif group is not None:
+                self._sync_files(group, files)
+                if not group.files:
+                    self._remove_session(group)
+            return
+        session = self._session_for(directory, create=False)
+        if session is None or session.files is None:
+            return
+        try:
+            files = _scan(session.path)[1]
+        except OSError:
+            if session.name:
+                self._remove_session(session)
+            return
+        self._sync_files(session, files)
+
+    def _sync_files(self, session, files):
+        current = {entry.name: entry for entry in session.files}
+        latest = {entry.name: entry for entry in files}
+        for name in [name for name in session.names if name not in latest]:
+            self._remove_file(session, name)
+        for entry in files:
+            if current.get(entry.name) != entry:
+                self._upsert(session, entry)
+
+
+class BackupBrowser(QWidget):
+    """备份目录浏览器：按会话分组、展开时才读取、随复制事件和目录变化增量更新"""
+
+    file_copied = pyqtSignal(str)
+    root_loaded = pyqtSignal()  # set_root() 读取完备份目录
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        self.status_label = QLabel("")
+        layout.addWidget(self.status_label)
+
+        self.model = BackupTreeModel(self)
+        self.view = QTreeView()
+        self.view.setModel(self.model)
+        self.view.setUniformRowHeights(True)  # 所有行等高，大目录滚动时无需逐行计算尺寸
+        self.view.setMaximumHeight(400)
+        self.view.header().setSectionResizeMode(0, QHeaderView.ResizeMode.Stretch)
+        self.view.header().setStretchLastSection(False)
+        layout.addWidget(self.view)
+
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.directoryChanged.connect(self._schedule_rescan)
+        self._pending = set()
+        self._rescan_timer = QTimer(self)
+        self._rescan_timer.setSingleShot(True)
+        self._rescan_timer.setInterval(RESCAN_DELAY_MS)
+        self._rescan_timer.timeout.connect(self._rescan_pending)
+        self._root_worker = None
+
+        self.file_copied.connect(self.model.update_file)
+        self.model.session_loaded.connect(self._watch)
+        self.model.summary_changed.connect(self._update_status)
+
+    def set_root(self, root, background=False):
+        """切换（或重新读取）备份目录
+
+        background=True 时在后台线程中读取目录（启动时备份目录可能在较慢的磁盘或网络上），
+        读取完成后再替换列表。两种方式完成后都发出 root_loaded。
+        """
+        paths = self.watcher.directories()
+        if paths:
+            self.watcher.removePaths(paths)
+        self._pending.clear()
+        self._root_worker = None  # 尚未完成的后台读取结果作废
+        if not background:
+            self._apply_root(root, None)
+            return
+        self.status_label.setText("正在读取备份目录...")
+        worker = TaskWorker(lambda progress: (root, _list_root(root)), self)
+        worker.task_finished.connect(self._on_root_listed)
+        worker.finished.connect(worker.deleteLater)
+        self._root_worker = worker
+        worker.start()
+
+    def _on_root_listed(self, result):
+        if self.sender() is not self._root_worker:
+            return
+        self._root_worker = None
+        self._apply_root(*result)
+
+    def _apply_root(self, root, listing):
+        self.model.set_root(root, listing)
+        if root and os.path.isdir(root):
+            self._watch(root)
+        self.root_loaded.emit()
+
+    def refresh(self):
+        self.set_root(self.model.root)
+
+    def on_file_copied(self, stage, task):
+        """CopyEngine 的监听器（在写线程中调用）：写入备份目录的文件直接加入列表"""
+        root = self.model.root
+        if root and os.path.normcase(os.path.abspath(task.dst)).startswith(
+                os.path.normcase(os.path.abspath(root)) + os.sep):
+            self.file_copied.emit(task.dst)
+
+    def _watch(self, path):
+        if path not in self.watcher.directories():
+            self.watcher.addPath(path)
+
+    def _schedule_rescan(self, path):
+        self._pending.add(path)
+        self._rescan_timer.start()
+
+    def _rescan_pending(self):
+        pending, self._pending = self._pending, set()
+        for path in sorted(pending, key=len):  # 先处理根目录，再处理会话目录
+            self.model.rescan(path)
+            if os.path.isdir(path):
+                self._watch(path)
+
+    def _update_status(self):
+        root = self.model.root
+        if not root or not os.path.isdir(root):
+            self.status_label.setText(f"备份目录不存在：{root}\n点击'选择目录'按钮选择或创建备份目录。")
+            return
+        sessions, loose = self.model.session_count(), self.model.loose_file_count()
+        if not sessions and not loose:
+            self.status_label.setText("备份目录为空")
+            return
+        text = f"共 {sessions} 次备份"
+        if loose:
+            text += f"，另有 {loose} 个未分组的文件"
+        self.status_label.setText(text)
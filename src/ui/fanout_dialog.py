@@ -0,0 +1,115 @@
+import time
+
+from PyQt6.QtCore import Qt
+from PyQt6.QtWidgets import (QDialog, QDialogButtonBox, QGridLayout, QLabel, QListWidget,
+                             QListWidgetItem, QProgressBar, QPushButton, QVBoxLayout)
+
+
+def _drive_title(drive):
+    return f"{drive['name']} ({drive['letter']})"
+
+
+class DriveSelectDialog(QDialog):
+    """勾选要写入的U盘"""
+
+    def __init__(self, drives, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("选择要写入的U盘")
+        layout = QVBoxLayout(self)
+        layout.addWidget(QLabel("把当前列表按顺序写入以下U盘（每个U盘中原有的音频视频文件会被删除）："))
+
+        self.drive_list = QListWidget()
+        for drive in drives:
+            item = QListWidgetItem(_drive_title(drive))
+            item.setData(Qt.ItemDataRole.UserRole, drive['letter'])
+            item.setFlags(item.flags() | Qt.ItemFlag.ItemIsUserCheckable)
+            item.setCheckState(Qt.CheckState.Checked)
+            self.drive_list.addItem(item)
+        layout.addWidget(self.drive_list)
+
+        buttons = QDialogButtonBox(QDialogButtonBox.StandardButton.Ok | QDialogButtonBox.StandardButton.Cancel)
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+        layout.addWidget(buttons)
+
+    def selected(self):
+        """勾选的U盘根目录列表"""
+        items = (self.drive_list.item(row) for row in range(self.drive_list.count()))
+        return [item.data(Qt.ItemDataRole.UserRole) for item in items
+                if item.checkState() == Qt.CheckState.Checked]
+
+
+class FanoutProgressDialog(QDialog):
+    """多盘写入时每个U盘一行：进度条、已完成文件数和写入速度
+
+    写入过程中只能取消，全部结束后才能关闭。
+    """
+
+    def __init__(self, drives, control, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("多盘写入")
+        self.setMinimumWidth(560)
+        self.control = control
+        self.running = True
+        self.started = time.perf_counter()
+        self.rows = {}  # 根目录 -> (进度条, 状态标签)
+
+        layout = QVBoxLayout(self)
+        grid = QGridLayout()
+        for row, drive in enumerate(drives):
+            bar = QProgressBar()
+            status = QLabel("准备中...")
+            grid.addWidget(QLabel(_drive_title(drive)), row, 0)
+            grid.addWidget(bar, row, 1)
+            grid.addWidget(status, row, 2)
+            self.rows[drive['letter']] = (bar, status)
+        layout.addLayout(grid)
+
+        self.summary_label = QLabel("")
+        layout.addWidget(self.summary_label)
+        self.close_btn = QPushButton("取消")
+        self.close_btn.clicked.connect(self.on_close_clicked)
+        layout.addWidget(self.close_btn)
+
+    def update_progress(self, target, done, total, done_bytes, total_bytes):
+        bar, status = self.rows[target]
+        bar.setValue(int(done_bytes * 100 / total_bytes) if total_bytes else 100)
+        elapsed = max(time.perf_counter() - self.started, 1e-6)
+        status.setText(f"{done}/{total}  {done_bytes / (1024 * 1024) / elapsed:.1f} MB/s")
+
+    def finish(self, report):
+        """全部目标结束后显示每个U盘的结果"""
+        for target, (bar, status) in self.rows.items():
+            if target in report.errors:
+                status.setText(f"失败：{report.errors[target]}")
+            else:
+                bar.setValue(100)
+                status.setText(f"完成  {report.reports[target].mb_per_s:.1f} MB/s")
+        self.summary_label.setText(f"{len(report.succeeded)}/{len(self.rows)} 个U盘写入完成，"
+                                   f"源文件读取 {report.source_bytes / (1024 * 1024):.1f}MB，"
+                                   f"耗时 {report.elapsed:.1f} 秒")
+        self._stop()
+
+    def fail(self, message):
+        self.summary_label.setText(("已取消：" if self.control.cancelled else "写入失败：") + message)
+        self._stop()
+
+    def _stop(self):
+        self.running = False
+        self.close_btn.setText("关闭")
+        self.close_btn.setEnabled(True)
+
+    def on_close_clicked(self):
+        if self.running:
+            self.control.cancel()
+            self.close_btn.setEnabled(False)
+            self.summary_label.setText("正在取消...")
+        else:
+            self.accept()
+
+    def reject(self):
+        # Esc 或关闭按钮：写入过程中等同于取消，结束后才真正关闭
+        if self.running:
+            self.on_close_clicked()
+        else:
+            super().reject()
@@ -0,0 +1,481 @@
+import bisect
+import os
+from array import array
+from itertools import compress
+
+from PyQt6.QtCore import QAbstractListModel, QAbstractProxyModel, QModelIndex, Qt, pyqtSignal
+from PyQt6.QtGui import QBrush, QColor
+
+from src.core.naming import parse_prefix
+from src.core.ordering_session import OrderHistory
+from src.core.scanner import ScanEntry
+from src.core.search_index import SearchIndex, normalize
+from src.core.sort_engine import SortKeys
+
+NO_PREFIX = -1
+
+_BRUSH_CHANGED = QBrush(QColor(Qt.GlobalColor.yellow))        # 按行号重命名会改变前缀
+_BRUSH_UNCHANGED = QBrush(QColor(Qt.GlobalColor.white))       # 前缀与行号一致
+_BRUSH_NO_PREFIX = QBrush(QColor(Qt.GlobalColor.lightGray))   # 没有数字前缀
+_BRUSH_DUPLICATE = QBrush(QColor(255, 200, 200))              # 与列表中靠前的文件内容相同
+
+
+class FileListModel(QAbstractListModel):
+    """文件列表模型
+
+    文件信息保存在紧凑的并行数组中（路径、文件名、大小、修改时间、数字前缀），
+    order 记录显示顺序（行 → 文件编号）。行号文本和背景色在 data() 中即时计算，
+    拖拽移动只需调整 order 并刷新受影响的行区间。
+    duplicates 记录内容重复的文件（文件编号 → 保留的文件编号）。
+    sort_keys() 为各排序字段预先计算的名次，文件增减或改名后重新计算。
+    search_index 为文件名搜索索引（按文件编号），与文件一起追加和更新；clear() 后保留，
+    重新扫描到相同的文件名时直接沿用。
+    拖拽和整体重排以增量的形式记录在 history 中，可以撤销和重做。
+    """
+
+    PathRole = Qt.ItemDataRole.UserRole
+    FileIdRole = Qt.ItemDataRole.UserRole + 2
+
+    order_changed = pyqtSignal()  # 用户操作（拖拽、排序、撤销、重做）改变了顺序
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._paths = []
+        self._names = []
+        self._sizes = array('q')
+        self._mtimes = array('d')
+        self._prefixes = array('l')
+        self._order = array('l')
+        self._duplicates = {}
+        self._sort_keys = None
+        self.search_index = SearchIndex()
+        self.history = OrderHistory()
+
+    # ---- 读取 ----
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self._order)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        row = index.row()
+        fid = self._order[row]
+        if role == Qt.ItemDataRole.DisplayRole:
+            size_mb = self._sizes[fid] / (1024 * 1024)
+            text = f"{row + 1:03d}. {self._names[fid]} ({size_mb:.2f}MB)"
+            return text + " [重复]" if fid in self._duplicates else text
+        if role == Qt.ItemDataRole.ToolTipRole and fid in self._duplicates:
+            return f"与 {self._names[self._duplicates[fid]]} 内容相同"
+        if role == Qt.ItemDataRole.BackgroundRole:
+            if fid in self._duplicates:
+                return _BRUSH_DUPLICATE
+            prefix = self._prefixes[fid]
+            if prefix == NO_PREFIX:
+                return _BRUSH_NO_PREFIX
+            return _BRUSH_UNCHANGED if prefix == row + 1 else _BRUSH_CHANGED
+        if role == self.PathRole:
+            return self._paths[fid]
+        if role == self.FileIdRole:
+            return fid
+        return None
+
+    def fid_at(self, row):
+        return self._order[row]
+
+    def rows_matching(self, flags):
+        """显示顺序中 flags[文件编号] 为真的行号（升序 array）"""
+        return array('l', compress(range(len(self._order)), map(flags.__getitem__, self._order)))
+
+    def rows_of(self, fids):
+        """{文件编号: 行号}，只查找给定的文件"""
+        wanted = set(fids)
+        return {fid: row for row, fid in enumerate(self._order) if fid in wanted}
+
+    def path_at(self, row):
+        return self._paths[self._order[row]]
+
+    def paths(self, skip_duplicates=False):
+        """按显示顺序返回全部文件路径，skip_duplicates 为 True 时去掉标记为重复的文件"""
+        paths = self._paths
+        if skip_duplicates:
+            return [paths[fid] for fid in self._order if fid not in self._duplicates]
+        return [paths[fid] for fid in self._order]
+
+    def sizes(self, skip_duplicates=False):
+        """与 paths() 对应的文件大小"""
+        sizes = self._sizes
+        if skip_duplicates:
+            return [sizes[fid] for fid in self._order if fid not in self._duplicates]
+        return [sizes[fid] for fid in self._order]
+
+    def order(self):
+        """显示顺序（文件编号列表）的副本"""
+        return list(self._order)
+
+    def prefix_of(self, fid):
+        """文件编号对应的数字前缀，没有前缀时返回 None"""
+        prefix = self._prefixes[fid]
+        return None if prefix == NO_PREFIX else prefix
+
+    def size_of(self, fid):
+        return self._sizes[fid]
+
+    def mtime_of(self, fid):
+        return self._mtimes[fid]
+
+    def sort_keys(self):
+        """当前文件的排序键（SortKeys），各字段的名次第一次使用时计算并缓存"""
+        if self._sort_keys is None:
+            self._sort_keys = SortKeys(self._names, self._paths, self._sizes, self._mtimes, self._prefixes)
+        return self._sort_keys
+
+    def entry_of(self, fid):
+        """文件编号对应的 ScanEntry"""
+        return ScanEntry(self._paths[fid], self._names[fid], self._sizes[fid], self._mtimes[fid])
+
+    def name_of(self, fid):
+        return self._names[fid]
+
+    def path_of(self, fid):
+        return self._paths[fid]
+
+    def is_duplicate(self, fid):
+        return fid in self._duplicates
+
+    def duplicate_count(self):
+        return len(self._duplicates)
+
+    def file_count(self):
+        return len(self._paths)
+
+    # ---- 修改 ----
+
+    def clear(self):
+        self.beginResetModel()
+        self._paths = []
+        self._names = []
+        self._sizes = array('q')
+        self._mtimes = array('d')
+        self._prefixes = array('l')
+        self._order = array('l')
+        self._duplicates = {}
+        self._sort_keys = None
+        # 搜索索引留给下一次扫描：文件名按相同顺序出现时沿用，编号超出文件数的部分不会出现在列表中
+        self.history.clear()
+        self.endResetModel()
+
+    def append_entries(self, entries, search_batch=None):
+        """追加一批扫描结果（ScanEntry）
+
+        search_batch 为扫描线程中预先建好的搜索索引，为 None 时沿用已有的索引
+        （文件名与索引中相同编号的文件名不同时重新建立）。
+        """
+        if not entries:
+            return
+        # 先更新搜索索引：过滤视图在 rowsInserted 时检查新行是否匹配
+        base = len(self._paths)
+        index = self.search_index
+        if search_batch is not None and search_batch.base == base:
+            index.truncate(base)
+            index.merge(search_batch)
+        else:
+            names = [entry.name for entry in entries]
+            if not index.matches(base, names):
+                index.truncate(base)
+                index.add(names)
+        first = len(self._order)
+        self.beginInsertRows(QModelIndex(), first, first + len(entries) - 1)
+        for entry in entries:
+            prefix = parse_prefix(entry.name)
+            self._paths.append(entry.path)
+            self._names.append(entry.name)
+            self._sizes.append(entry.size)
+            self._mtimes.append(entry.mtime)
+            self._prefixes.append(NO_PREFIX if prefix is None else prefix)
+        self._order.extend(range(base, base + len(entries)))
+        self._sort_keys = None
+        self.endInsertRows()
+
+    def finish_loading(self):
+        """扫描完成：去掉搜索索引中上一次列表多出来的文件"""
+        self.search_index.truncate(len(self._paths))
+
+    def set_order(self, order, record=True):
+        """按新的显示顺序（文件编号列表）重新排列，record 为 True 时记入撤销历史"""
+        if len(order) != len(self._order):
+            raise ValueError("新顺序的长度与列表不一致")
+        if record:
+            self.history.record_permutation(self._order, order)
+        self._replace_order(array('l', order))
+        self.order_changed.emit()
+
+    def undo(self):
+        """撤销最近一次拖拽或重排，没有可撤销的操作时返回 False"""
+        order = self.history.undo(self._order)
+        if order is None:
+            return False
+        self._replace_order(order)
+        self.order_changed.emit()
+        return True
+
+    def redo(self):
+        order = self.history.redo(self._order)
+        if order is None:
+            return False
+        self._replace_order(order)
+        self.order_changed.emit()
+        return True
+
+    def _replace_order(self, order):
+        self.layoutAboutToBeChanged.emit()
+        old_persistent = self.persistentIndexList()
+        old_fids = [self._order[index.row()] for index in old_persistent]
+        self._order = order
+        row_of = {fid: row for row, fid in enumerate(self._order)}
+        self.changePersistentIndexList(old_persistent,
+                                       [self.index(row_of[fid], 0) for fid in old_fids])
+        self.layoutChanged.emit()
+
+    def update_file(self, fid, path, size=None):
+        """文件被重命名后更新路径、文件名和前缀"""
+        name = os.path.basename(path)
+        prefix = parse_prefix(name)
+        self._paths[fid] = path
+        self._names[fid] = name
+        self._prefixes[fid] = NO_PREFIX if prefix is None else prefix
+        if size is not None:
+            self._sizes[fid] = size
+        self._sort_keys = None
+        self.search_index.update(fid, name)
+
+    def set_duplicates(self, duplicates):
+        """标记重复文件：{重复的文件编号: 保留的文件编号}"""
+        self._duplicates = dict(duplicates)
+        self.refresh_rows()
+
+    def refresh_rows(self, first=0, last=None):
+        """通知视图重新读取 first..last 行"""
+        if not self._order:
+            return
+        if last is None:
+            last = len(self._order) - 1
+        self.dataChanged.emit(self.index(first, 0), self.index(last, 0))
+
+    # ---- 拖拽移动 ----
+
+    def flags(self, index):
+        if not index.isValid():
+            return Qt.ItemFlag.ItemIsDropEnabled
+        return (Qt.ItemFlag.ItemIsEnabled | Qt.ItemFlag.ItemIsSelectable |
+                Qt.ItemFlag.ItemIsDragEnabled)
+
+    def supportedDropActions(self):
+        return Qt.DropAction.MoveAction
+
+    def moveRows(self, source_parent, source_row, count, destination_parent, destination_child):
+        if source_parent.isValid() or destination_parent.isValid() or count <= 0:
+            return False
+        if source_row < 0 or source_row + count > len(self._order):
+            return False
+        if source_row <= destination_child <= source_row + count:
+            return False  # 移动到自身位置
+        if not self.beginMoveRows(QModelIndex(), source_row, source_row + count - 1,
+                                  QModelIndex(), destination_child):
+            return False
+        moved = self._order[source_row:source_row + count]
+        del self._order[source_row:source_row + count]
+        insert_at = destination_child if destination_child < source_row else destination_child - count
+        self._order[insert_at:insert_at] = moved
+        self.endMoveRows()
+        self.history.record_move(source_row, count, destination_child)
+        # 只有移动区间内的行号和颜色发生变化
+        first = min(source_row, insert_at)
+        last = max(source_row + count, insert_at + count) - 1
+        self.refresh_rows(first, last)
+        self.order_changed.emit()
+        return True
+
+
+class FileFilterModel(QAbstractProxyModel):
+    """按搜索框内容过滤 FileListModel 的代理模型
+
+    _rows 为可见行在完整列表中的行号（升序 array），没有过滤时为 None，与完整列表一一对应，
+    此时插入和移动直接转发。过滤状态下拖拽移动的是完整顺序：被拖动的文件插入到
+    目标位置那一行所对应的文件之前（拖到末尾时插入到最后一个可见文件之后），行号仍是完整列表中的行号。
+    """
+
+    def __init__(self, source, parent=None):
+        super().__init__(parent)
+        self._query = ""
+        self._rows = None
+        self._flags = None
+        self._flags_key = None
+        self._pending = []  # 布局变化前的 (持久索引, 文件编号)
+        self.setSourceModel(source)
+        source.modelAboutToBeReset.connect(self.beginResetModel)
+        source.modelReset.connect(self._on_source_reset)
+        source.rowsAboutToBeInserted.connect(self._on_rows_about_to_be_inserted)
+        source.rowsInserted.connect(self._on_rows_inserted)
+        source.rowsAboutToBeMoved.connect(self._on_rows_about_to_be_moved)
+        source.rowsMoved.connect(self._on_rows_moved)
+        source.layoutAboutToBeChanged.connect(self._on_layout_about_to_change)
+        source.layoutChanged.connect(self._on_layout_changed)
+        source.dataChanged.connect(self._on_data_changed)
+
+    # ---- 过滤 ----
+
+    def set_filter(self, query):
+        """按文件名（或拼音首字母）过滤，空白分隔的多个词需要同时包含"""
+        changed = normalize(query).split() != normalize(self._query).split()
+        self._query = query
+        if not changed:
+            return
+        self.beginResetModel()
+        self._update_rows()
+        self.endResetModel()
+
+    def is_filtered(self):
+        return self._rows is not None
+
+    def _matches(self):
+        """当前查询的匹配结果（文件编号 -> 是否匹配），文件或查询不变时复用"""
+        index = self.sourceModel().search_index
+        key = (self._query, index, index.version)
+        if key != self._flags_key:
+            self._flags = index.search(self._query)
+            self._flags_key = key
+        return self._flags
+
+    def _update_rows(self):
+        flags = self._matches()
+        self._rows = None if flags is None else self.sourceModel().rows_matching(flags)
+
+    # ---- 行号映射 ----
+
+    def index(self, row, column=0, parent=QModelIndex()):
+        if parent.isValid() or column != 0 or not 0 <= row < self.rowCount():
+            return QModelIndex()
+        return self.createIndex(row, column)
+
+    def parent(self, index=QModelIndex()):
+        return QModelIndex()
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return self.sourceModel().rowCount() if self._rows is None else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else 1
+
+    def mapToSource(self, proxy_index):
+        if not proxy_index.isValid():
+            return QModelIndex()
+        row = proxy_index.row()
+        return self.sourceModel().index(row if self._rows is None else self._rows[row], 0)
+
+    def mapFromSource(self, source_index):
+        if not source_index.isValid():
+            return QModelIndex()
+        row = self._proxy_row(source_index.row())
+        return QModelIndex() if row is None else self.index(row, 0)
+
+    def _proxy_row(self, source_row):
+        if self._rows is None:
+            return source_row
+        row = bisect.bisect_left(self._rows, source_row)
+        return row if row < len(self._rows) and self._rows[row] == source_row else None
+
+    # ---- 拖拽移动 ----
+
+    def moveRows(self, source_parent, source_row, count, destination_parent, destination_child):
+        source = self.sourceModel()
+        if self._rows is None:
+            return source.moveRows(source_parent, source_row, count, destination_parent, destination_child)
+        if source_parent.isValid() or destination_parent.isValid() or count <= 0:
+            return False
+        if source_row < 0 or source_row + count > len(self._rows):
+            return False
+        if source_row <= destination_child <= source_row + count:
+            return False  # 移动到自身位置
+        rows = list(self._rows[source_row:source_row + count])
+        if destination_child < len(self._rows):
+            destination = self._rows[destination_child]
+        else:
+            destination = self._rows[-1] + 1
+        if rows[-1] - rows[0] == count - 1:
+            return source.moveRows(QModelIndex(), rows[0], count, QModelIndex(), destination)
+        # 可见的几行在完整列表中不相邻：取出后按原来的先后插入目标位置，作为一次重排记录
+        order = source.order()
+        moved = [order[row] for row in rows]
+        moved_rows = set(rows)
+        remaining = [fid for row, fid in enumerate(order) if row not in moved_rows]
+        insert_at = destination - sum(1 for row in rows if row < destination)
+        remaining[insert_at:insert_at] = moved
+        source.set_order(remaining)
+        return True
+
+    # ---- 转发完整列表的变化 ----
+
+    def _on_source_reset(self):
+        self._update_rows()
+        self.endResetModel()
+
+    def _on_rows_about_to_be_inserted(self, parent, first, last):
+        if self._rows is None:
+            self.beginInsertRows(QModelIndex(), first, last)
+
+    def _on_rows_inserted(self, parent, first, last):
+        if self._rows is None:
+            self.endInsertRows()
+            return
+        # 扫描时新文件追加在末尾，只检查新增的文件
+        source = self.sourceModel()
+        flags = source.search_index.search(self._query, [source.fid_at(row) for row in range(first, last + 1)])
+        added = [row for row in range(first, last + 1) if flags[source.fid_at(row)]]
+        if added:
+            start = len(self._rows)
+            self.beginInsertRows(QModelIndex(), start, start + len(added) - 1)
+            self._rows.extend(added)
+            self.endInsertRows()
+
+    def _on_rows_about_to_be_moved(self, parent, first, last, destination_parent, destination_row):
+        if self._rows is None:
+            self.beginMoveRows(QModelIndex(), first, last, QModelIndex(), destination_row)
+        else:
+            self._on_layout_about_to_change()
+
+    def _on_rows_moved(self, parent, first, last, destination_parent, destination_row):
+        if self._rows is None:
+            self.endMoveRows()
+        else:
+            self._on_layout_changed()
+
+    def _on_layout_about_to_change(self):
+        self.layoutAboutToBeChanged.emit()
+        source = self.sourceModel()
+        self._pending = [(index, source.fid_at(self.mapToSource(index).row()))
+                         for index in self.persistentIndexList()]
+
+    def _on_layout_changed(self):
+        self._update_rows()
+        pending, self._pending = self._pending, []
+        if pending:
+            row_of = self.sourceModel().rows_of(fid for _, fid in pending)
+            new_indexes = []
+            for _, fid in pending:
+                row = self._proxy_row(row_of[fid]) if fid in row_of else None
+                new_indexes.append(QModelIndex() if row is None else self.index(row, 0))
+            self.changePersistentIndexList([index for index, _ in pending], new_indexes)
+        self.layoutChanged.emit()
+
+    def _on_data_changed(self, top_left, bottom_right, roles=()):
+        first, last = top_left.row(), bottom_right.row()
+        if self._rows is not None:
+            first = bisect.bisect_left(self._rows, first)
+            last = bisect.bisect_right(self._rows, last) - 1
+        if first <= last:
+            self.dataChanged.emit(self.index(first, 0), self.index(last, 0), roles)
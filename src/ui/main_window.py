@@ -1,26 +1,72 @@
 from PyQt6.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
-                           QPushButton, QListWidget, QComboBox, QProgressBar,
-                           QMessageBox, QLabel, QListWidgetItem, QApplication,
-                           QSplitter, QFileDialog, QTextEdit, QGroupBox)  # 添加新的导入
-from PyQt6.QtCore import Qt, QThread, pyqtSignal
+                           QPushButton, QListView, QComboBox, QProgressBar,
+                           QMessageBox, QLabel, QApplication, QAbstractItemView,
+                           QSplitter, QFileDialog, QGroupBox,
+                           QCheckBox, QDialog, QLineEdit)  # 添加新的导入
+from PyQt6.QtCore import Qt, QThread, QTimer, pyqtSignal, QEventLoop
+from PyQt6.QtGui import QKeySequence, QShortcut
 from src.core.usb_handler import USBHandler
+from src.core.drive_discovery import DriveDiscovery
+from src.core.scanner import MEDIA_EXTENSIONS, iter_media_files
+from src.core.sync import SyncTarget, apply_sync, plan_sync
+from src.core.staging import apply_staging, plan_staging
+from src.core.rename_planner import RenameJournal, rename_with_journal
+from src.core.naming import target_names, target_paths
+from src.core.scan_index import default_index_path
+from src.core.copy_engine import CopyEngine, TransferControl
+from src.core.capacity import plan_capacity, probe_volume, split_across
+from src.core.transfer_job import TransferJob
+from src.core.backup_store import new_session_dir
+from src.core.fat_image import (SECTOR_SIZE, FatImageBuilder, boot_hidden_sectors, fat32_cluster_size,
+                                image_files)
+from src.core.fat_volume import SUPPORTED_FILESYSTEMS, FatVolume, reorder_paths
+from src.core.instrumentation import tracer
+from src.core.metadata import EMPTY_INFO, SORT_KEYS, load_tags, tag_sort_key
+from src.core.ordering_session import OrderingStore, restore_order
+from src.core.sort_engine import SORT_PRESETS
+from src.ui.file_list_model import FileFilterModel, FileListModel
+from src.ui.backup_browser import BackupBrowser
+from src.ui.fanout_dialog import DriveSelectDialog, FanoutProgressDialog
+from src.ui.stats_panel import StatsPanel
+from src.ui.workers import (CopyWorker, DriveWatchWorker, DuplicateWorker, FanoutWorker, ScanWorker,
+                            TaskWorker)
 import os
-import shutil
-import tempfile
-import re
+import sqlite3
 import subprocess  # 添加subprocess导入
+import time
+
+WM_DEVICECHANGE = 0x0219
+DBT_DEVICEARRIVAL = 0x8000
+DBT_DEVICEREMOVECOMPLETE = 0x8004
+DRIVE_CHANGE_DELAY_MS = 500  # 插拔后稍等再刷新：卷刚出现时卷信息可能还读不到，连续的消息也合并为一次
+DUPLICATE_MAX_FILES = 20000            # 查找重复文件时最多读取的文件数
+DUPLICATE_MAX_BYTES = 4 * 1024 ** 3    # 查找重复文件时最多读取的字节数
+ORDER_SAVE_DELAY_MS = 1000             # 拖拽、排序后稍等再保存排序会话，连续的操作合并为一次
 
 class MainWindow(QMainWindow):
+    startup_finished = pyqtSignal()  # 首次显示后的后台初始化（U盘检测、备份列表、首次扫描）全部完成
+
     def __init__(self):
         super().__init__()
         self.usb_handler = USBHandler()
         self.setWindowTitle("U盘音乐文件排序工具")
         self.setMinimumSize(1200, 600)  # 增加窗口宽度以容纳右侧面板
-        self.supported_extensions = ('.mp3', '.wav', '.flac', '.m4a', '.wma',
-                                   '.mp4', '.avi', '.mkv', '.mov', '.wmv',
-                                   '.3gp', '.flv', '.webm', '.rmvb', '.m4v')
+        self.supported_extensions = MEDIA_EXTENSIONS
         self.backup_dir = "D:\\temp"  # 默认备份目录
+        self.scan_worker = None  # 当前正在运行的后台扫描线程
+        self.backup_worker = None  # 同盘重排后在后台运行的备份线程
+        self.duplicate_worker = None  # 后台查找重复文件的线程
+        self.transfer_control = None  # 正在运行的可暂停/取消的复制阶段
+        self.ordering_key = None  # 当前列表对应的排序会话 (U盘根目录, 卷标识)
+        self.usb_drives = {}  # 盘符 -> get_usb_drives 返回的驱动器信息
+        self.copy_engine = CopyEngine()
+        self.drive_discovery = DriveDiscovery()
+        self.drive_watch_worker = None
+        self.discovery_worker = None  # 后台重新检测U盘的线程
+        self.pending_drive_changes = ([], [])  # 复制过程中检测到、尚未显示的 (新增, 移除)
+        self.startup_pending = None  # 首次显示后尚未完成的初始化步骤，显示前为 None
         self.setup_ui()
+        self.start_drive_watch()
 
     def setup_ui(self):
         # 创建中央部件
@@ -46,34 +92,109 @@ class MainWindow(QMainWindow):
         usb_layout.addWidget(self.refresh_btn)
         left_layout.addLayout(usb_layout)
 
+        # 过滤框：按文件名或拼音首字母即时筛选，筛选状态下仍可拖拽调整完整列表中的顺序
+        filter_layout = QHBoxLayout()
+        self.filter_edit = QLineEdit()
+        self.filter_edit.setPlaceholderText("按文件名或拼音首字母过滤")
+        self.filter_edit.setClearButtonEnabled(True)
+        self.filter_count_label = QLabel("")
+        filter_layout.addWidget(self.filter_edit)
+        filter_layout.addWidget(self.filter_count_label)
+        left_layout.addLayout(filter_layout)
+
         # 文件列表
-        self.file_list = QListWidget()
-        self.file_list.setDragDropMode(QListWidget.DragDropMode.InternalMove)
-        # 连接拖拽完成信号
-        self.file_list.model().rowsMoved.connect(self.update_line_numbers)
+        self.file_model = FileListModel(self)
+        self.file_filter = FileFilterModel(self.file_model, self)
+        self.file_list = QListView()
+        self.file_list.setModel(self.file_filter)
+        self.file_list.setUniformItemSizes(True)  # 所有行等高，大列表滚动时无需逐行计算尺寸
+        self.file_list.setDragDropMode(QAbstractItemView.DragDropMode.InternalMove)
+        self.file_list.setDefaultDropAction(Qt.DropAction.MoveAction)
         left_layout.addWidget(self.file_list)
 
+        # 排序会话：顺序变化后自动保存，下次加载同一U盘时恢复
+        self.order_save_timer = QTimer(self)
+        self.order_save_timer.setSingleShot(True)
+        self.order_save_timer.setInterval(ORDER_SAVE_DELAY_MS)
+        self.order_save_timer.timeout.connect(self.save_ordering_session)
+        self.file_model.order_changed.connect(self.on_order_changed)
+
+        self.filter_edit.textChanged.connect(self.on_filter_changed)
+        self.file_filter.modelReset.connect(self.update_filter_count)
+        self.file_filter.rowsInserted.connect(self.update_filter_count)
+
         # 操作按钮区域
         button_layout = QHBoxLayout()
         self.load_btn = QPushButton("加载文件")
+        self.undo_btn = QPushButton("撤销")
+        self.redo_btn = QPushButton("重做")
+        self.undo_btn.setEnabled(False)
+        self.redo_btn.setEnabled(False)
         self.sort_by_prefix_btn = QPushButton("按序号排序")
+        self.field_sort_combo = QComboBox()
+        for spec, label in SORT_PRESETS.items():
+            self.field_sort_combo.addItem(label, spec)
+        self.sort_by_field_btn = QPushButton("按字段排序")
+        self.tag_sort_combo = QComboBox()
+        for kind, label in SORT_KEYS.items():
+            self.tag_sort_combo.addItem(label, kind)
+        self.sort_by_tag_btn = QPushButton("按标签排序")
+        self.find_duplicates_btn = QPushButton("查找重复")
         self.rename_by_line_btn = QPushButton("按行号重命名")  # 新增按钮
         self.save_btn = QPushButton("保存排序")
+        self.fanout_btn = QPushButton("写入多个U盘")
         button_layout.addWidget(self.load_btn)
+        button_layout.addWidget(self.undo_btn)
+        button_layout.addWidget(self.redo_btn)
         button_layout.addWidget(self.sort_by_prefix_btn)
+        button_layout.addWidget(self.field_sort_combo)
+        button_layout.addWidget(self.sort_by_field_btn)
+        button_layout.addWidget(self.tag_sort_combo)
+        button_layout.addWidget(self.sort_by_tag_btn)
+        button_layout.addWidget(self.find_duplicates_btn)
         button_layout.addWidget(self.rename_by_line_btn)  # 添加新按钮
         button_layout.addWidget(self.save_btn)
+        button_layout.addWidget(self.fanout_btn)
         left_layout.addLayout(button_layout)
 
+        # 增量同步选项
+        self.sync_hash_check = QCheckBox("增量同步时比较文件首尾快速哈希（更可靠，略慢）")
+        left_layout.addWidget(self.sync_hash_check)
+
+        # 复制后回读校验
+        self.verify_copy_check = QCheckBox("复制后回读校验（与写入下一个文件同时进行，不一致时自动重新复制）")
+        self.verify_copy_check.toggled.connect(self.on_verify_copy_toggled)
+        left_layout.addWidget(self.verify_copy_check)
+
+        # 重复文件不写回U盘
+        self.exclude_duplicates_check = QCheckBox("完整重写、增量同步时不写回标记为重复的文件")
+        self.exclude_duplicates_check.setChecked(True)
+        left_layout.addWidget(self.exclude_duplicates_check)
+
+        # 同盘快速重排后是否在后台备份
+        self.background_backup_check = QCheckBox("同盘快速重排后在后台备份到备份目录")
+        self.background_backup_check.setChecked(True)
+        left_layout.addWidget(self.background_backup_check)
+
         # 进度文本标签
         self.progress_label = QLabel("")
         self.progress_label.setVisible(False)
         left_layout.addWidget(self.progress_label)
 
-        # 进度条
+        # 进度条，复制过程中可以暂停或取消
+        transfer_layout = QHBoxLayout()
         self.progress_bar = QProgressBar()
         self.progress_bar.setVisible(False)
-        left_layout.addWidget(self.progress_bar)
+        transfer_layout.addWidget(self.progress_bar)
+        self.pause_btn = QPushButton("暂停")
+        self.pause_btn.clicked.connect(self.toggle_transfer_pause)
+        self.pause_btn.setVisible(False)
+        transfer_layout.addWidget(self.pause_btn)
+        self.cancel_transfer_btn = QPushButton("取消")
+        self.cancel_transfer_btn.clicked.connect(self.cancel_transfer)
+        self.cancel_transfer_btn.setVisible(False)
+        transfer_layout.addWidget(self.cancel_transfer_btn)
+        left_layout.addLayout(transfer_layout)
         
         # 右侧面板 - 备份文件列表
         right_widget = QWidget()
@@ -93,18 +214,21 @@ class MainWindow(QMainWindow):
         backup_dir_layout.addWidget(self.choose_backup_dir_btn)
         backup_layout.addLayout(backup_dir_layout)
         
-        # 备份文件列表
+        # 备份文件列表（按备份会话分组，展开时才读取）
         backup_layout.addWidget(QLabel("备份文件列表（只读）："))
-        self.backup_file_list = QTextEdit()
-        self.backup_file_list.setReadOnly(True)
-        self.backup_file_list.setMaximumHeight(400)
-        backup_layout.addWidget(self.backup_file_list)
+        self.backup_browser = BackupBrowser()
+        self.copy_engine.listeners.append(self.backup_browser.on_file_copied)
+        backup_layout.addWidget(self.backup_browser)
         
         # 刷新备份列表按钮
         self.refresh_backup_btn = QPushButton("刷新备份列表")
         backup_layout.addWidget(self.refresh_backup_btn)
         
         right_layout.addWidget(backup_group)
+
+        # 性能统计（各阶段耗时、慢操作，可导出 Trace）
+        self.stats_panel = StatsPanel()
+        right_layout.addWidget(self.stats_panel)
         right_layout.addStretch()  # 添加弹性空间
         
         # 将左右面板添加到分割器
@@ -116,19 +240,74 @@ class MainWindow(QMainWindow):
         self.refresh_btn.clicked.connect(self.refresh_usb_devices)
         self.load_btn.clicked.connect(self.load_files)
         self.sort_by_prefix_btn.clicked.connect(self.sort_files_by_prefix)
+        self.sort_by_field_btn.clicked.connect(self.sort_files_by_fields)
+        self.sort_by_tag_btn.clicked.connect(self.sort_files_by_tags)
+        self.find_duplicates_btn.clicked.connect(self.find_duplicate_files)
         self.rename_by_line_btn.clicked.connect(self.rename_files_by_line_number)  # 连接新按钮
         self.save_btn.clicked.connect(self.save_files)
+        self.fanout_btn.clicked.connect(self.write_to_multiple_drives)
+        self.undo_btn.clicked.connect(self.undo_order)
+        self.redo_btn.clicked.connect(self.redo_order)
+        QShortcut(QKeySequence(QKeySequence.StandardKey.Undo), self, self.undo_order)
+        QShortcut(QKeySequence(QKeySequence.StandardKey.Redo), self, self.redo_order)
         self.choose_backup_dir_btn.clicked.connect(self.choose_backup_directory)
         self.refresh_backup_btn.clicked.connect(self.refresh_backup_file_list)
         # 连接U盘选择变化信号，实现自动加载文件列表
         self.usb_combo.currentTextChanged.connect(self.on_usb_selection_changed)
-        
-        # 初始化备份文件列表
-        self.refresh_backup_file_list()
-        
-        # 初始化U盘设备列表
+        self.backup_browser.root_loaded.connect(lambda: self._startup_step_done("backups"))
+        # 备份列表和U盘设备列表在窗口第一次显示后才在后台读取（见 showEvent）
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        if self.startup_pending is None:
+            # 先让窗口画出来，U盘检测、备份列表和首次扫描都在之后的后台线程中进行
+            self.startup_pending = {"drives", "backups"}
+            tracer.event("startup.shown")
+            QTimer.singleShot(0, self.start_background_init)
+
+    def start_background_init(self):
+        self.backup_browser.set_root(self.backup_dir, background=True)
         self.refresh_usb_devices()
 
+    def _startup_step_done(self, step):
+        """启动时的一个后台步骤完成；全部完成后发出 startup_finished"""
+        if not self.startup_pending or step not in self.startup_pending:
+            return
+        self.startup_pending.discard(step)
+        tracer.event("startup." + step)
+        if not self.startup_pending:
+            tracer.event("startup.finished")
+            self.startup_finished.emit()
+
+    def closeEvent(self, event):
+        """关闭窗口前保存排序会话并结束所有后台线程"""
+        if self.order_save_timer.isActive():
+            self.save_ordering_session()
+        for worker in self.findChildren(QThread):
+            worker.requestInterruption()
+            worker.wait()
+        self.drive_discovery.close()
+        super().closeEvent(event)
+
+    def start_drive_watch(self):
+        """监听U盘插拔：Windows 由 WM_DEVICECHANGE 消息通知（见 nativeEvent），其他平台使用后台线程"""
+        self.drive_change_timer = QTimer(self)
+        self.drive_change_timer.setSingleShot(True)
+        self.drive_change_timer.setInterval(DRIVE_CHANGE_DELAY_MS)
+        self.drive_change_timer.timeout.connect(self.on_drives_changed)
+        if not self.drive_discovery.native_events:
+            self.drive_watch_worker = DriveWatchWorker(self.drive_discovery, self)
+            self.drive_watch_worker.drives_changed.connect(self.drive_change_timer.start)
+            self.drive_watch_worker.start()
+
+    def nativeEvent(self, event_type, message):
+        if event_type == b"windows_generic_MSG" and self.drive_discovery.native_events:
+            import ctypes.wintypes
+            msg = ctypes.wintypes.MSG.from_address(int(message))
+            if msg.message == WM_DEVICECHANGE and msg.wParam in (DBT_DEVICEARRIVAL, DBT_DEVICEREMOVECOMPLETE):
+                self.drive_change_timer.start()
+        return super().nativeEvent(event_type, message)
+
     def choose_backup_directory(self):
         """选择备份目录"""
         directory = QFileDialog.getExistingDirectory(self, "选择备份目录", self.backup_dir)
@@ -138,61 +317,121 @@ class MainWindow(QMainWindow):
             self.refresh_backup_file_list()
 
     def refresh_backup_file_list(self):
-        """刷新备份文件列表"""
-        self.backup_file_list.clear()
-        
-        if not os.path.exists(self.backup_dir):
-            self.backup_file_list.setText(f"备份目录不存在：{self.backup_dir}\n\n点击'选择目录'按钮选择或创建备份目录。")
-            return
-        
-        try:
-            files = os.listdir(self.backup_dir)
-            if not files:
-                self.backup_file_list.setText("备份目录为空")
-                return
-            
-            file_info_list = []
-            for file in files:
-                file_path = os.path.join(self.backup_dir, file)
-                if os.path.isfile(file_path):
-                    size = os.path.getsize(file_path)
-                    size_mb = size / (1024 * 1024)
-                    modified_time = os.path.getmtime(file_path)
-                    import time
-                    modified_str = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(modified_time))
-                    file_info_list.append(f"{file} ({size_mb:.2f}MB) - {modified_str}")
-            
-            if file_info_list:
-                self.backup_file_list.setText("\n".join(file_info_list))
-            else:
-                self.backup_file_list.setText("备份目录中没有文件")
-                
-        except Exception as e:
-            self.backup_file_list.setText(f"读取备份目录失败：{str(e)}")
+        """重新读取备份目录（切换目录或手动刷新时）；备份过程中的变化会自动更新"""
+        self.backup_browser.set_root(self.backup_dir)
 
     def refresh_usb_devices(self):
-        """刷新U盘设备列表"""
+        """刷新U盘设备列表：在后台线程中重新读取全部设备信息，完成后重新加载文件
+
+        卷信息读取较慢的设备（如没有插卡的读卡器）不会卡住界面。检测期间禁用下拉框，
+        插拔通知（on_drives_changed）会等检测完成后再处理。
+        """
+        if self.discovery_worker is not None or self.backup_running():
+            return
+        self.usb_combo.setEnabled(False)
+        self.refresh_btn.setEnabled(False)
+        self.load_btn.setEnabled(False)  # 检测完成后由 update_usb_combo 按是否有U盘重新设置
+        self.statusBar().showMessage("正在检测U盘...")
+        self.discovery_worker = TaskWorker(lambda progress: self.drive_discovery.refresh(full=True), self)
+        self.discovery_worker.task_finished.connect(self.on_discovery_finished)
+        self.discovery_worker.task_failed.connect(self.on_discovery_failed)
+        self.discovery_worker.finished.connect(self.discovery_worker.deleteLater)
+        self.discovery_worker.start()
+
+    def on_discovery_finished(self, result):
+        if self.sender() is not self.discovery_worker:
+            return
+        self._discovery_done()
+        startup = bool(self.startup_pending) and "drives" in self.startup_pending
+        self.update_usb_combo(reload=True)
+        if startup and self.scan_worker is not None:
+            self.startup_pending.add("scan")  # 首次扫描完成后才算启动完成，结果不弹窗
+        self._startup_step_done("drives")
+
+    def on_discovery_failed(self, message):
+        if self.sender() is not self.discovery_worker:
+            return
+        self._discovery_done()
+        self.update_usb_combo(reload=True)
+        self._startup_step_done("drives")
+        QMessageBox.warning(self, "警告", f"检测U盘失败：{message}")
+
+    def _discovery_done(self):
+        self.discovery_worker = None
+        self.usb_combo.setEnabled(True)
+        self.refresh_btn.setEnabled(True)
+        self.statusBar().clearMessage()
+
+    def on_drives_changed(self):
+        """U盘插拔后在后台线程中增量刷新设备列表（探测失败的设备每次都会重试，可能较慢）"""
+        if not self.usb_combo.isEnabled() or self.discovery_worker is not None:
+            # 复制或检测过程中不改动列表，稍后再试
+            self.drive_change_timer.start()
+            return
+        self.discovery_worker = TaskWorker(lambda progress: self.drive_discovery.refresh(), self)
+        self.discovery_worker.task_finished.connect(self.on_drives_refreshed)
+        self.discovery_worker.task_failed.connect(self.on_drives_refresh_failed)
+        self.discovery_worker.finished.connect(self.discovery_worker.deleteLater)
+        self.discovery_worker.start()
+
+    def on_drives_refreshed(self, result):
+        """增量刷新完成：当前选中的U盘仍在时保持选择，不重新加载"""
+        if self.sender() is not self.discovery_worker:
+            return
+        self.discovery_worker = None
+        self.pending_drive_changes[0].extend(result[0])
+        self.pending_drive_changes[1].extend(result[1])
+        if not self.usb_combo.isEnabled():
+            # 刷新期间开始了复制，等复制结束后再更新列表
+            self.drive_change_timer.start()
+            return
+        added, removed = self.pending_drive_changes
+        self.pending_drive_changes = ([], [])
+        if not added and not removed:
+            return
+        self.update_usb_combo()
+        added_letters = {drive['letter'] for drive in added}
+        messages = [f"已插入U盘：{drive['name']} ({drive['letter']})" for drive in added]
+        messages += [f"U盘已移除：{drive['name']} ({drive['letter']})"
+                     for drive in removed if drive['letter'] not in added_letters]
+        self.statusBar().showMessage("；".join(messages), 5000)
+
+    def on_drives_refresh_failed(self, message):
+        if self.sender() is not self.discovery_worker:
+            return
+        self.discovery_worker = None
+        tracer.event("discovery.failed", error=message)
+
+    def update_usb_combo(self, reload=False):
+        """按 drive_discovery 中缓存的设备更新下拉框
+
+        reload=True 或原来选中的U盘已移除时，选中第一个U盘并重新加载文件。
+        """
+        drives = self.drive_discovery.drives()
+        self.usb_drives = {drive['letter']: drive for drive in drives}
+        current = self.usb_combo.currentData()
+        reload = reload or current not in self.usb_drives
+
+        self.usb_combo.blockSignals(True)
         self.usb_combo.clear()
-        drives = self.usb_handler.get_usb_drives()
-        
+        for drive in drives:
+            self.usb_combo.addItem(f"{drive['name']} ({drive['letter']})", drive['letter'])
         if not drives:
             self.usb_combo.addItem("未检测到U盘")
-            self.load_btn.setEnabled(False)
-            self.save_btn.setEnabled(False)
+        self.usb_combo.setCurrentIndex(0 if reload else self.usb_combo.findData(current))
+        self.usb_combo.blockSignals(False)
+
+        self.load_btn.setEnabled(bool(drives))
+        self.save_btn.setEnabled(bool(drives))
+        if not reload:
+            return
+        self.cancel_scan()
+        if not drives:
             # 清空文件列表
-            self.file_list.clear()
+            self.file_model.clear()
             return
-        
-        for drive in drives:
-            self.usb_combo.addItem(f"{drive['name']} ({drive['letter']})", drive['letter'])
-        
-        self.load_btn.setEnabled(True)
-        self.save_btn.setEnabled(True)
-        
         # 如果有U盘，自动选择第一个并加载文件
-        if drives:
-            self.usb_combo.setCurrentIndex(0)
-            # currentTextChanged信号会自动触发，无需手动调用load_files()
+        self.on_usb_selection_changed()
 
     def on_usb_selection_changed(self):
         """当U盘选择发生变化时自动加载文件列表"""
@@ -202,141 +441,396 @@ class MainWindow(QMainWindow):
             # 自动加载文件列表
             self.load_files()
 
-    def update_line_numbers(self):
-        """更新文件列表的行号显示（3位数字格式）"""
-        for i in range(self.file_list.count()):
-            item = self.file_list.item(i)
-            original_text = item.data(Qt.ItemDataRole.UserRole + 1)  # 存储原始文件名
-            if original_text is None:
-                # 如果没有存储原始文件名，从当前文本中提取
-                current_text = item.text()
-                # 移除行号前缀（支持3位数字格式）
-                match = re.match(r'^\d{3}\. (.+)', current_text)
-                if match:
-                    original_text = match.group(1)
-                else:
-                    original_text = current_text
-                item.setData(Qt.ItemDataRole.UserRole + 1, original_text)
-            
-            # 更新显示文本，添加3位数字行号
-            new_text = f"{i + 1:03d}. {original_text}"
-            item.setText(new_text)
-            
-            # 检查按行号排序是否会改变当前行的位置
-            file_path = item.data(Qt.ItemDataRole.UserRole)
-            if file_path:
-                file_name = os.path.basename(file_path)
-                # 提取文件名中的数字前缀
-                match = re.match(r'^\s*(\d+)\s*[\.-]?\s*', file_name)
-                if match:
-                    try:
-                        file_prefix = int(match.group(1))
-                        current_line_number = i + 1
-                        # 如果文件前缀与当前行号不同，标记为不同颜色
-                        if file_prefix != current_line_number:
-                            item.setBackground(Qt.GlobalColor.yellow)  # 黄色背景表示会改变位置
-                        else:
-                            item.setBackground(Qt.GlobalColor.white)   # 白色背景表示位置不变
-                    except ValueError:
-                        item.setBackground(Qt.GlobalColor.lightGray)  # 灰色背景表示无法解析前缀
-                else:
-                    item.setBackground(Qt.GlobalColor.lightGray)  # 灰色背景表示没有数字前缀
-            else:
-                item.setBackground(Qt.GlobalColor.white)
-
     def load_files(self):
-        """加载U盘中的文件"""
+        """加载U盘中的文件（后台扫描，结果分批追加到列表）"""
         if self.usb_combo.currentData() is None:
             QMessageBox.warning(self, "警告", "请先选择U盘！")
             return
             
         drive_path = self.usb_combo.currentData()
-        self.file_list.clear()
-        
+        # 切换U盘或重新加载时取消上一次尚未完成的扫描
+        self.cancel_scan()
+        if self.order_save_timer.isActive():
+            self.save_ordering_session()
+        self.ordering_key = None
+        self.file_model.clear()
+        self.update_undo_buttons()
+        if self.backup_worker is None:
+            # 后台备份还在读取U盘时不回放日志，重新加载时再处理
+            self.recover_rename_journal(drive_path)
+            self.recover_transfer_job(drive_path)
+
+        self.progress_label.setText(f"正在扫描 {drive_path} ...")
+        self.progress_label.setVisible(True)
+        self._set_scan_busy(True)
+
+        self.scan_worker = ScanWorker(drive_path, self.supported_extensions,
+                                      known_names=self.file_model.search_index.names(),
+                                      parent=self)
+        self.scan_worker.batch_ready.connect(self.on_scan_batch)
+        self.scan_worker.progress.connect(self.on_scan_progress)
+        self.scan_worker.scan_finished.connect(self.on_scan_finished)
+        self.scan_worker.scan_failed.connect(self.on_scan_failed)
+        self.scan_worker.finished.connect(self.scan_worker.deleteLater)
+        self.scan_worker.start()
+
+    def recover_rename_journal(self, drive_path):
+        """发现上次中断的重命名日志时，让用户选择继续完成或回滚"""
+        journal = RenameJournal.for_directory(drive_path)
+        if not journal.exists():
+            return
         try:
-            # 遍历U盘中的所有文件
-            for root, _, files in os.walk(drive_path):
-                for file in files:
-                    if file.lower().endswith(self.supported_extensions):
-                        full_path = os.path.join(root, file)
-                        # 获取文件大小（以MB为单位）
-                        size_mb = os.path.getsize(full_path) / (1024 * 1024)
-                        # 创建列表项
-                        item = QListWidgetItem()
-                        
-                        # 存储原始文件名（不含行号）
-                        original_display = f"{file} ({size_mb:.2f}MB)"
-                        item.setData(Qt.ItemDataRole.UserRole + 1, original_display)
-                        
-                        # 存储文件完整路径
-                        item.setData(Qt.ItemDataRole.UserRole, full_path)
-                        
-                        self.file_list.addItem(item)
-            
-            # 更新行号显示
-            self.update_line_numbers()
-            
-            if self.file_list.count() == 0:
+            steps, completed = journal.load()
+        except Exception as e:
+            QMessageBox.warning(self, "重命名日志", f"无法读取上次的重命名日志：{str(e)}")
+            return
+
+        box = QMessageBox(QMessageBox.Icon.Warning, "发现未完成的重命名",
+                          f"上次的重命名在完成 {completed}/{len(steps)} 步时被中断（例如U盘被拔出）。\n\n"
+                          "• 继续完成：按原计划完成剩余的重命名\n"
+                          "• 回滚：恢复到重命名之前的文件名",
+                          parent=self)
+        forward_btn = box.addButton("继续完成", QMessageBox.ButtonRole.AcceptRole)
+        back_btn = box.addButton("回滚", QMessageBox.ButtonRole.DestructiveRole)
+        box.addButton("暂不处理", QMessageBox.ButtonRole.RejectRole)
+        box.exec()
+        try:
+            if box.clickedButton() is forward_btn:
+                journal.roll_forward()
+            elif box.clickedButton() is back_btn:
+                journal.roll_back()
+        except Exception as e:
+            QMessageBox.critical(self, "错误", f"处理重命名日志失败：{str(e)}")
+
+    def recover_transfer_job(self, drive_path):
+        """发现该U盘上次中断的完整重写时，让用户选择继续或放弃"""
+        if self.transfer_control is not None:
+            return
+        job = TransferJob.for_directory(self.backup_dir)
+        if not job.exists():
+            return
+        try:
+            job.load()
+        except Exception as e:
+            QMessageBox.warning(self, "传输检查点", f"无法读取上次的传输进度：{str(e)}")
+            return
+        if not job.matches(drive_path, self.current_volume_key()):
+            return
+
+        if job.stage_done("clear"):
+            stage = "复制回U盘"
+        elif job.stage_done("backup"):
+            stage = "清空U盘"
+        else:
+            stage = "备份"
+        box = QMessageBox(QMessageBox.Icon.Warning, "发现未完成的传输",
+                          f"上次的完整重写（{len(job.files)} 个文件）在{stage}阶段被中断。\n\n"
+                          "• 继续：校验已复制的文件，从中断处继续\n"
+                          f"• 放弃：删除进度记录，已备份的文件保留在 {job.session_dir}",
+                          parent=self)
+        resume_btn = box.addButton("继续", QMessageBox.ButtonRole.AcceptRole)
+        discard_btn = box.addButton("放弃", QMessageBox.ButtonRole.DestructiveRole)
+        box.addButton("暂不处理", QMessageBox.ButtonRole.RejectRole)
+        box.exec()
+        if box.clickedButton() is resume_btn:
+            job.open_for_append()
+            self.progress_label.setVisible(True)
+            self.progress_bar.setVisible(True)
+            self.progress_bar.setValue(0)
+            self.run_rewrite_job(drive_path, job)
+        elif box.clickedButton() is discard_btn:
+            job.finish()
+
+    def current_volume_key(self):
+        """当前选中U盘的卷标识，未知时返回 None（不保存排序会话，也不缓存标签）"""
+        drive = self.usb_drives.get(self.usb_combo.currentData())
+        if drive is None:
+            return None
+        return self.usb_handler.volume_key(drive)
+
+    def scan_index_path(self):
+        """扫描索引数据库路径，无法创建时返回 None"""
+        try:
+            return default_index_path(self.backup_dir)
+        except OSError:
+            return None
+
+    def list_drive_media(self, drive):
+        """列出U盘中的全部媒体文件（ScanEntry）"""
+        return list(iter_media_files(drive, self.supported_extensions))
+
+    def cancel_scan(self):
+        """取消正在进行的后台扫描（包括重复文件查找）"""
+        if self.scan_worker is not None:
+            self.scan_worker.requestInterruption()
+            self.scan_worker = None
+            self._set_scan_busy(False)
+            self._startup_step_done("scan")
+        if self.duplicate_worker is not None:
+            self.duplicate_worker.requestInterruption()
+            self.duplicate_worker = None
+            self.find_duplicates_btn.setEnabled(True)
+
+    def _set_scan_busy(self, busy):
+        """扫描期间禁用依赖完整列表的操作"""
+        self.sort_by_prefix_btn.setEnabled(not busy)
+        self.sort_by_field_btn.setEnabled(not busy)
+        self.sort_by_tag_btn.setEnabled(not busy)
+        self.find_duplicates_btn.setEnabled(not busy)
+        self.rename_by_line_btn.setEnabled(not busy)
+        self.save_btn.setEnabled(not busy)
+        self.fanout_btn.setEnabled(not busy)
+
+    def on_scan_batch(self, batch, search_batch):
+        """把一批扫描结果追加到列表"""
+        if self.sender() is not self.scan_worker:
+            return  # 已取消的扫描线程发来的残留结果
+        self.file_model.append_entries(batch, search_batch)
+
+    def on_filter_changed(self, text):
+        self.file_filter.set_filter(text)
+
+    def update_filter_count(self):
+        if self.file_filter.is_filtered():
+            self.filter_count_label.setText(f"{self.file_filter.rowCount()} / {self.file_model.rowCount()}")
+        else:
+            self.filter_count_label.setText("")
+
+    def on_scan_progress(self, count, files_per_sec):
+        if self.sender() is not self.scan_worker:
+            return
+        self.progress_label.setText(f"正在扫描... 已找到 {count} 个文件（{files_per_sec:.0f} 文件/秒）")
+
+    def on_scan_finished(self, count, elapsed):
+        if self.sender() is not self.scan_worker:
+            return
+        self.scan_worker = None
+        self.file_model.finish_loading()
+        self._set_scan_busy(False)
+        self.progress_label.setVisible(False)
+
+        # 启动时自动进行的首次扫描只在状态栏显示结果，不弹出对话框
+        quiet = bool(self.startup_pending) and "scan" in self.startup_pending
+        if count == 0:
+            if quiet:
+                self.statusBar().showMessage("未找到支持的音频文件", 5000)
+            else:
                 QMessageBox.information(self, "提示", "未找到支持的音频文件！")
+        else:
+            rate = count / elapsed if elapsed > 0 else 0.0
+            message = f"已加载 {count} 个音频文件\n耗时 {elapsed:.2f} 秒（{rate:.0f} 文件/秒）"
+            if self.restore_ordering_session():
+                message += "\n\n已恢复上次尚未保存到U盘的排序（可撤销）"
+            if quiet:
+                self.statusBar().showMessage(message.replace("\n\n", "；").replace("\n", "，"), 10000)
             else:
-                QMessageBox.information(self, "成功", f"已加载 {self.file_list.count()} 个音频文件")
-                
-        except Exception as e:
-            QMessageBox.critical(self, "错误", f"加载文件失败：{str(e)}")
+                QMessageBox.information(self, "成功", message)
+        self._startup_step_done("scan")
+
+    def restore_ordering_session(self):
+        """按该U盘上次保存的排序会话重新排列列表，顺序发生变化时返回 True"""
+        drive, volume_key = self.usb_combo.currentData(), self.current_volume_key()
+        index_path = self.scan_index_path()
+        if drive is None or volume_key is None or index_path is None:
+            return False
+        self.ordering_key = (drive, volume_key)
+        try:
+            with OrderingStore(index_path) as store:
+                saved = store.load(volume_key)
+        except (OSError, sqlite3.Error) as e:
+            tracer.event("ordering.failed", error=str(e))
+            return False
+        if not saved:
+            return False
+        model = self.file_model
+        current = [os.path.relpath(model.path_of(fid), drive) for fid in range(model.file_count())]
+        order = restore_order(saved, current)
+        if order == model.order():
+            return False
+        model.set_order(order)
+        return True
+
+    def save_ordering_session(self):
+        """保存当前列表的顺序（文件表 + 排列）"""
+        self.order_save_timer.stop()
+        index_path = self.scan_index_path()
+        if self.ordering_key is None or index_path is None:
+            return
+        drive, volume_key = self.ordering_key
+        model = self.file_model
+        rel_paths = [os.path.relpath(model.path_of(fid), drive) for fid in range(model.file_count())]
+        try:
+            with OrderingStore(index_path) as store:
+                store.save(volume_key, rel_paths, model.order())
+        except (OSError, sqlite3.Error) as e:
+            tracer.event("ordering.failed", error=str(e))
+
+    def forget_ordering_session(self):
+        """排序已经写入U盘，删除保存的会话"""
+        self.order_save_timer.stop()
+        index_path = self.scan_index_path()
+        if self.ordering_key is None or index_path is None:
+            return
+        try:
+            with OrderingStore(index_path) as store:
+                store.forget(self.ordering_key[1])
+        except (OSError, sqlite3.Error) as e:
+            tracer.event("ordering.failed", error=str(e))
+
+    def on_order_changed(self):
+        self.update_undo_buttons()
+        if self.ordering_key is not None:
+            self.order_save_timer.start()
+
+    def update_undo_buttons(self):
+        history = self.file_model.history
+        self.undo_btn.setEnabled(history.can_undo())
+        self.redo_btn.setEnabled(history.can_redo())
+
+    def undo_order(self):
+        if self.undo_btn.isEnabled():
+            self.file_model.undo()
+
+    def redo_order(self):
+        if self.redo_btn.isEnabled():
+            self.file_model.redo()
+
+    def on_scan_failed(self, message):
+        if self.sender() is not self.scan_worker:
+            return
+        self.scan_worker = None
+        self._set_scan_busy(False)
+        self.progress_label.setVisible(False)
+        self._startup_step_done("scan")
+        QMessageBox.critical(self, "错误", f"加载文件失败：{message}")
 
     def sort_files_by_prefix(self):
-        """根据文件名前缀的数字对列表中的文件进行排序"""
-        if self.file_list.count() == 0:
+        """根据文件名前缀的数字对列表中的文件进行排序，无前缀的按文件名自然顺序排在最后"""
+        if self.sort_files("prefix,name"):
+            QMessageBox.information(self, "完成", "文件已按前缀序号排序。")
+
+    def sort_files_by_fields(self):
+        """按所选的字段组合（文件夹、序号、文件名、大小、修改时间）排序"""
+        if self.sort_files(self.field_sort_combo.currentData()):
+            QMessageBox.information(self, "完成", f"文件已按{self.field_sort_combo.currentText()}排序。")
+
+    def sort_files(self, spec):
+        """按 spec（见 sort_engine）重新排列列表，排好时返回 True
+
+        各字段的名次第一次使用时在后台线程中计算（5 万个文件约需零点几秒），
+        之后换用其他字段组合重新排序只需对名次做几次稳定排序。
+        """
+        model = self.file_model
+        if model.rowCount() == 0:
+            QMessageBox.information(self, "提示", "列表中没有文件可排序。")
+            return False
+        keys = model.sort_keys()
+        try:
+            self.run_task("排序", lambda progress: keys.prepare(spec))
+        except Exception as e:
+            QMessageBox.critical(self, "错误", str(e))
+            return False
+        model.set_order(keys.sort(model.order(), spec))
+        return True
+
+    def sort_files_by_tags(self):
+        """按所选的标签字段（专辑、艺术家、音轨号等）排序，标签在后台线程中读取并缓存"""
+        if self.file_model.rowCount() == 0:
             QMessageBox.information(self, "提示", "列表中没有文件可排序。")
             return
 
-        items_to_sort = []
-        for i in range(self.file_list.count()):
-            item = self.file_list.item(i)
-            original_text = item.data(Qt.ItemDataRole.UserRole + 1)
-            file_path = item.data(Qt.ItemDataRole.UserRole)
-            
-            # 从原始文件名中提取文件名部分（去掉大小写信息）
-            file_name = os.path.basename(file_path)
-            
-            # 尝试提取前缀数字
-            match = re.match(r'^\s*(\d+)\s*[\.\-]?\s*', file_name)
-            prefix_num = float('inf')  # 默认为无穷大，无前缀的排在最后
-            if match:
-                try:
-                    prefix_num = int(match.group(1))
-                except ValueError:
-                    pass
-            
-            items_to_sort.append({
-                'prefix': prefix_num, 
-                'original_text': original_text, 
-                'file_path': file_path
-            })
-
-        # 根据前缀数字排序
-        items_to_sort.sort(key=lambda x: x['prefix'])
-
-        # 清空并重新填充列表
-        self.file_list.clear()
-        for sorted_item_info in items_to_sort:
-            new_item = QListWidgetItem()
-            new_item.setData(Qt.ItemDataRole.UserRole + 1, sorted_item_info['original_text'])
-            new_item.setData(Qt.ItemDataRole.UserRole, sorted_item_info['file_path'])
-            self.file_list.addItem(new_item)
-        
-        # 更新行号显示
-        self.update_line_numbers()
-        
-        QMessageBox.information(self, "完成", "文件已按前缀序号排序。")
+        model = self.file_model
+        kind = self.tag_sort_combo.currentData()
+        drive = self.usb_combo.currentData()
+        order = model.order()
+        entries = [model.entry_of(fid) for fid in order]
+
+        def read(progress):
+            return load_tags(entries, drive, self.current_volume_key(), self.scan_index_path(),
+                             progress=lambda done, total: progress("tags", done, total))
+
+        def on_progress(stage, done, total):
+            self.progress_bar.setValue(int(done * 100 / total) if total else 100)
+            self.progress_label.setText(f"正在读取标签 {done}/{total}")
+
+        self.progress_label.setVisible(True)
+        self.progress_bar.setVisible(True)
+        self.progress_bar.setValue(0)
+        try:
+            tags = self.run_task("读取标签", read, on_progress)
+        except Exception as e:
+            QMessageBox.critical(self, "错误", str(e))
+            return
+        finally:
+            self.progress_label.setVisible(False)
+            self.progress_bar.setVisible(False)
+
+        order.sort(key=lambda fid: tag_sort_key(kind, tags.get(model.path_of(fid)), model.name_of(fid)))
+        model.set_order(order)
+
+        untagged = sum(1 for entry in entries if tags.get(entry.path, EMPTY_INFO)[:5] == EMPTY_INFO[:5])
+        message = f"文件已按{self.tag_sort_combo.currentText()}排序。"
+        if untagged:
+            message += f"\n\n{untagged} 个文件没有可用的标签，已排在最后。"
+        QMessageBox.information(self, "完成", message)
+
+    def find_duplicate_files(self):
+        """在后台查找内容相同的文件，完成后在列表中标记（列表中靠前的文件保留）"""
+        if self.file_model.rowCount() == 0:
+            QMessageBox.information(self, "提示", "列表中没有文件。")
+            return
+        model = self.file_model
+        order = model.order()
+        entries = [model.entry_of(fid) for fid in order]
+        self._duplicate_fids = {id(entry): fid for entry, fid in zip(entries, order)}
+
+        self.duplicate_worker = DuplicateWorker(entries, DUPLICATE_MAX_FILES, DUPLICATE_MAX_BYTES, self)
+        self.duplicate_worker.progress.connect(self.on_duplicate_progress)
+        self.duplicate_worker.search_finished.connect(self.on_duplicates_found)
+        self.duplicate_worker.search_failed.connect(self.on_duplicate_search_failed)
+        self.duplicate_worker.finished.connect(self.duplicate_worker.deleteLater)
+        self.find_duplicates_btn.setEnabled(False)
+        self.statusBar().showMessage("正在查找重复文件...")
+        self.duplicate_worker.start()
+
+    def on_duplicate_progress(self, files, nbytes):
+        if self.sender() is not self.duplicate_worker:
+            return
+        self.statusBar().showMessage(f"正在查找重复文件：已比较 {files} 个文件，"
+                                     f"读取 {nbytes / (1024 * 1024):.1f}MB")
+
+    def on_duplicates_found(self, report):
+        if self.sender() is not self.duplicate_worker:
+            return
+        self.duplicate_worker = None
+        self.find_duplicates_btn.setEnabled(True)
+        duplicates = {}
+        for group in report.groups:
+            kept = self._duplicate_fids[id(group[0])]
+            for entry in group[1:]:
+                duplicates[self._duplicate_fids[id(entry)]] = kept
+        self.file_model.set_duplicates(duplicates)
+        self.statusBar().showMessage(report.summary() if report.groups or not report.complete
+                                     else "没有发现重复文件", 10000)
+
+    def on_duplicate_search_failed(self, message):
+        if self.sender() is not self.duplicate_worker:
+            return
+        self.duplicate_worker = None
+        self.find_duplicates_btn.setEnabled(True)
+        self.statusBar().clearMessage()
+        QMessageBox.critical(self, "错误", f"查找重复文件失败：{message}")
 
     def rename_files_by_line_number(self):
         """按照行号重新命名U盘中的文件"""
         if self.usb_combo.currentData() is None:
             QMessageBox.warning(self, "警告", "请先选择U盘！")
             return
+
+        if self.backup_running():
+            return
             
-        if self.file_list.count() == 0:
+        if self.file_model.rowCount() == 0:
             QMessageBox.warning(self, "警告", "没有可重命名的文件！")
             return
 
@@ -359,72 +853,45 @@ class MainWindow(QMainWindow):
             QApplication.processEvents()
 
             renamed_count = 0
-            total_files = self.file_list.count()
+            total_files = self.file_model.rowCount()
             
             # 收集重命名操作
             rename_operations = []
             
-            for i in range(total_files):
-                item = self.file_list.item(i)
-                original_path = item.data(Qt.ItemDataRole.UserRole)
-                original_filename = os.path.basename(original_path)
-                directory = os.path.dirname(original_path)
-                
-                # 移除现有的数字前缀
-                match = re.match(r'^\s*(\d+)\s*[\.\-]\s*(.*)', original_filename)
-                if match:
-                    clean_filename = match.group(2).strip()
-                else:
-                    clean_filename = original_filename
-                
-                # 如果清理后文件名为空，保留原文件名
-                if not clean_filename:
-                    clean_filename = original_filename
-                
-                # 生成新的文件名（3位数字前缀）
-                new_filename = f"{i + 1:03d}. {clean_filename}"
-                new_path = os.path.join(directory, new_filename)
-                
+            # 按当前行号生成新文件名（3位数字前缀，已有的数字前缀会被替换）
+            order = self.file_model.order()
+            old_paths = [self.file_model.path_of(fid) for fid in order]
+            for fid, original_path, new_path in zip(order, old_paths, target_paths(old_paths)):
                 # 如果新文件名与原文件名不同，添加到重命名操作列表
                 if original_path != new_path:
-                    rename_operations.append((original_path, new_path, new_filename))
-            
-            # 执行重命名操作
-            for j, (old_path, new_path, new_filename) in enumerate(rename_operations):
-                try:
-                    self.progress_label.setText(f"重命名文件 ({j + 1}/{len(rename_operations)}): {os.path.basename(old_path)}")
-                    QApplication.processEvents()
-                    
-                    # 检查目标文件是否已存在
-                    if os.path.exists(new_path) and old_path != new_path:
-                        # 如果目标文件存在，先重命名为临时文件名
-                        temp_path = new_path + ".tmp_rename"
-                        os.rename(old_path, temp_path)
-                        os.rename(temp_path, new_path)
-                    else:
-                        os.rename(old_path, new_path)
-                    
-                    renamed_count += 1
-                    
-                    # 更新列表项的路径信息
-                    for k in range(self.file_list.count()):
-                        list_item = self.file_list.item(k)
-                        if list_item.data(Qt.ItemDataRole.UserRole) == old_path:
-                            list_item.setData(Qt.ItemDataRole.UserRole, new_path)
-                            # 更新显示的原始文本（包含文件大小）
-                            size_mb = os.path.getsize(new_path) / (1024 * 1024)
-                            original_display = f"{new_filename} ({size_mb:.2f}MB)"
-                            list_item.setData(Qt.ItemDataRole.UserRole + 1, original_display)
-                            break
-                    
-                except Exception as e:
-                    QMessageBox.warning(self, "重命名警告", f"重命名文件失败：{os.path.basename(old_path)}\n错误：{str(e)}")
-                
-                self.progress_bar.setValue(int((j + 1) / len(rename_operations) * 100))
-            
-            # 更新行号显示
-            self.update_line_numbers()
+                    rename_operations.append((fid, original_path, new_path))
             
+            # 一次性规划全部重命名（交换名称等循环只借用最少的临时名称），并写入日志
+            drive = self.usb_combo.currentData()
+            mapping = [(old_path, new_path) for _, old_path, new_path in rename_operations]
+
+            def on_progress(stage, done, total):
+                self.progress_label.setText(f"重命名文件 ({done}/{total})")
+                self.progress_bar.setValue(int(done / total * 100) if total else 100)
+
+            try:
+                self.run_task("重命名", lambda progress: rename_with_journal(
+                    mapping, drive, progress=lambda done, total: progress("rename", done, total)),
+                    on_progress)
+            except Exception as e:
+                QMessageBox.warning(self, "重命名警告",
+                                    f"重命名过程中断：{str(e)}\n\n"
+                                    "已保留重命名日志，重新加载U盘时可选择继续完成或回滚。")
+                self.load_files()
+                return
+
+            # 按文件编号直接更新模型，行号和颜色在视图重绘时重新计算
+            for fid, _, new_path in rename_operations:
+                self.file_model.update_file(fid, new_path)
+            self.file_model.refresh_rows()
+            self.save_ordering_session()  # 会话按相对路径记录文件
+            renamed_count = len(rename_operations)
+
             self.progress_label.setVisible(False)
             self.progress_bar.setVisible(False)
             
@@ -446,8 +913,11 @@ class MainWindow(QMainWindow):
         if self.usb_combo.currentData() is None:
             QMessageBox.warning(self, "警告", "请先选择U盘！")
             return
+
+        if self.backup_running():
+            return
             
-        if self.file_list.count() == 0:
+        if self.file_model.rowCount() == 0:
             QMessageBox.warning(self, "警告", "没有可保存的文件！")
             return
 
@@ -472,14 +942,45 @@ class MainWindow(QMainWindow):
                     return
 
         drive = self.usb_combo.currentData()
-        reply = QMessageBox.question(self, "确认操作", 
-                                   f"即将开始文件排序过程，目标U盘: {drive}\n"
-                                   f"备份目录: {self.backup_dir}\n\n"
-                                   "此操作将先备份文件，然后处理U盘。\n\n是否继续？",
-                                   QMessageBox.StandardButton.Yes | 
-                                   QMessageBox.StandardButton.No)
-        
-        if reply == QMessageBox.StandardButton.No:
+        filesystem = self.usb_drives.get(drive, {}).get('filesystem', '')
+        can_reorder = filesystem.upper() in SUPPORTED_FILESYSTEMS and self.usb_handler.raw_access_available()
+        text = (f"即将开始文件排序过程，目标U盘: {drive}\n"
+                f"备份目录: {self.backup_dir}\n\n"
+                "• 完整重写：先备份文件，然后清空U盘并按顺序重新写入\n"
+                "• 增量同步：只重命名已在U盘上的文件，仅复制新增或变化的内容"
+                "（适合按文件名排序播放的设备）\n"
+                "• 同盘快速重排：在U盘内把文件移到暂存目录再按顺序移回，不经过备份目录，"
+                "备份可在后台进行\n")
+        duplicate_count = self.file_model.duplicate_count()
+        if duplicate_count and self.exclude_duplicates_check.isChecked():
+            text += f"• 已标记 {duplicate_count} 个重复文件，完整重写和增量同步时不会写回U盘\n"
+        if can_reorder:
+            text += (f"• 原地调整顺序：直接改写 {filesystem} 目录表中的文件顺序，不复制任何文件数据"
+                     "（适合按目录顺序播放的设备，最快）\n")
+        confirm_box = QMessageBox(QMessageBox.Icon.Question, "确认操作", text + "\n是否继续？",
+                                  parent=self)
+        rewrite_btn = confirm_box.addButton("完整重写", QMessageBox.ButtonRole.YesRole)
+        sync_btn = confirm_box.addButton("增量同步", QMessageBox.ButtonRole.AcceptRole)
+        stage_btn = confirm_box.addButton("同盘快速重排", QMessageBox.ButtonRole.AcceptRole)
+        reorder_btn = None
+        if can_reorder:
+            reorder_btn = confirm_box.addButton("原地调整顺序", QMessageBox.ButtonRole.ActionRole)
+        confirm_box.addButton(QMessageBox.StandardButton.Cancel)
+        confirm_box.setDefaultButton(rewrite_btn)
+        confirm_box.exec()
+        clicked = confirm_box.clickedButton()
+        if clicked is not None and clicked is reorder_btn:
+            self.reorder_files_in_place(drive)
+            return
+        if clicked not in (rewrite_btn, sync_btn, stage_btn):
+            return
+
+        skip_duplicates = clicked is not stage_btn and self.exclude_duplicates_check.isChecked()
+        source_paths = self.file_model.paths(skip_duplicates)
+        new_names = target_names(os.path.basename(path) for path in source_paths)
+        # 在备份或删除任何文件之前确认放得下（完整重写还要先放进备份目录）
+        if not self.check_capacity(drive, new_names, self.file_model.sizes(skip_duplicates),
+                                   backup=clicked is rewrite_btn):
             return
 
         try:
@@ -491,49 +992,86 @@ class MainWindow(QMainWindow):
 
             # 收集文件信息
             files_to_process = []
-            for i in range(self.file_list.count()):
-                item = self.file_list.item(i)
-                original_path = item.data(Qt.ItemDataRole.UserRole)
-                filename = os.path.basename(original_path)
-
-                # 清理文件名
-                match = re.match(r"^\s*(\d+)\s*[\.\-]\s*(.*)", filename)
-                cleaned_filename = filename
-                if match:
-                    cleaned_filename = match.group(2).strip() 
-                
-                if not cleaned_filename:
-                    cleaned_filename = filename
-
-                new_name = f"{i+1:03d}. {cleaned_filename}"
-                backup_path = os.path.join(self.backup_dir, new_name)
+            session_dir = new_session_dir(self.backup_dir)  # 本次备份的会话子目录
+            for original_path, new_name in zip(source_paths, new_names):
+                backup_path = os.path.join(session_dir, new_name)
                 files_to_process.append({
                     'src': original_path, 
                     'backup_path': backup_path, 
                     'final_name': new_name
                 })
 
-            total_files = len(files_to_process)
+            if clicked is sync_btn:
+                self.sync_files(drive, files_to_process)
+                return
+            if clicked is stage_btn:
+                self.stage_files(drive, files_to_process)
+                return
             
-            # 备份文件到指定目录
-            self.progress_label.setText("正在备份文件...")
+            # 备份、清空U盘、复制回U盘的进度记录在备份目录的检查点中，中断后可以继续
+            job = TransferJob.for_directory(self.backup_dir)
+            job.begin(drive, self.current_volume_key(), session_dir, files_to_process)
+            self.run_rewrite_job(drive, job)
+
+        except Exception as e:
+            self.progress_label.setText(f"错误: {str(e)}")
+            QMessageBox.critical(self, "错误", f"操作失败：{str(e)}")
+        finally:
             QApplication.processEvents()
-            
-            for i, file_info in enumerate(files_to_process, 1):
-                self.progress_label.setText(f"备份文件 ({i}/{total_files}): {os.path.basename(file_info['src'])}")
+
+    def check_capacity(self, drive, names, sizes, backup=False):
+        """按簇计算写入后的占用，检查U盘（backup 为 True 时还有备份目录）的空间
+
+        U盘上原有的音频视频文件写入前会被删除，所占空间计为可用。放不下时提示原因并返回 False，
+        此时没有修改任何文件。
+        """
+        filesystem = self.usb_drives.get(drive, {}).get('filesystem', '')
+        items = list(zip(names, sizes))
+        extensions = self.supported_extensions
+
+        def plan(progress):
+            reclaim = [entry.size for entry in iter_media_files(drive, extensions)]
+            backup_volume = probe_volume(self.backup_dir) if backup else None
+            return plan_capacity(items, probe_volume(drive, filesystem), reclaim, backup_volume)
+
+        try:
+            capacity = self.run_task("检查空间", plan)
+        except Exception as e:
+            QMessageBox.critical(self, "错误", f"无法读取可用空间：{e}")
+            return False
+        if capacity.ok:
+            return True
+        QMessageBox.critical(self, "空间不足", "\n".join(capacity.problems) +
+                             f"\n\n{capacity.summary()}\n\n没有修改任何文件。")
+        return False
+
+    def run_rewrite_job(self, drive, job):
+        """执行或继续完整重写：备份 → 清空U盘 → 从备份复制回U盘
+
+        复制过程中可以暂停或取消；取消或失败时保留检查点，重新加载U盘时可以从中断处继续。
+        """
+        files_to_process = job.files_to_process(drive)
+        total_files = len(files_to_process)
+        control = self.transfer_control = TransferControl()
+        try:
+            if not job.stage_done("backup"):
+                self.progress_label.setText("正在备份文件...")
+                QApplication.processEvents()
+                os.makedirs(job.session_dir, exist_ok=True)
+                report = self.run_copy_stage("备份", job.pending_tasks("backup", drive), 0, 50,
+                                             job.bind(control, "backup"))
+                job.complete_stage("backup")
+                self.progress_label.setText(f"备份完成！已备份 {total_files} 个文件到 {job.session_dir}"
+                                            f"（{report.mb_per_s:.1f} MB/s）")
                 QApplication.processEvents()
-                shutil.copy2(file_info['src'], file_info['backup_path'])
-                self.progress_bar.setValue(int(i / total_files * 50))
 
-            # 刷新备份文件列表显示
-            self.refresh_backup_file_list()
-            
-            self.progress_label.setText(f"备份完成！已备份 {total_files} 个文件到 {self.backup_dir}")
-            QApplication.processEvents()
-            
+            if job.stage_done("clear"):
+                self.copy_files_to_usb(drive, files_to_process, 50, job)
+                return
+
             # 询问用户选择：格式化U盘还是删除U盘文件
             choice = QMessageBox.question(self, "选择操作方式", 
-                                        f"文件已成功备份到：{self.backup_dir}\n\n"
+                                        f"文件已成功备份到：{job.session_dir}\n\n"
                                         "请选择下一步操作：\n\n"
                                         "• 是(Yes)：格式化U盘（推荐，会清空所有数据）\n"
                                         "• 否(No)：仅删除U盘中的音频文件",
@@ -542,25 +1080,303 @@ class MainWindow(QMainWindow):
                                         QMessageBox.StandardButton.Cancel)
             
             if choice == QMessageBox.StandardButton.Cancel:
+                job.finish()  # U盘尚未改动，不需要继续
                 self.progress_label.setText("操作已取消")
                 self.progress_label.setVisible(False)
                 self.progress_bar.setVisible(False)
                 return
             elif choice == QMessageBox.StandardButton.Yes:
                 # 格式化U盘
-                self.format_and_copy_files(drive, files_to_process)
+                self.format_and_copy_files(drive, files_to_process, job)
             else:
                 # 删除U盘文件后复制
-                self.delete_and_copy_files(drive, files_to_process)
-                
+                self.delete_and_copy_files(drive, files_to_process, job)
         except Exception as e:
-            self.progress_label.setText(f"错误: {str(e)}")
-            QMessageBox.critical(self, "错误", f"操作失败：{str(e)}")
+            job.close()
+            if control.cancelled:
+                self.progress_label.setVisible(False)
+                self.progress_bar.setVisible(False)
+                QMessageBox.information(self, "已取消", "操作已取消，进度已保存。\n\n"
+                                                     "重新加载U盘时可以选择从中断处继续。")
+            else:
+                self.progress_label.setText(f"错误: {str(e)}")
+                QMessageBox.critical(self, "错误", f"操作失败：{str(e)}\n\n"
+                                                  "进度已保存，重新加载U盘时可以选择从中断处继续。")
         finally:
-            QApplication.processEvents()
+            self.transfer_control = None
+
+    def on_verify_copy_toggled(self, checked):
+        self.copy_engine.verify = checked
+
+    def toggle_transfer_pause(self):
+        control = self.transfer_control
+        if control is None:
+            return
+        if control.paused:
+            control.resume()
+            self.pause_btn.setText("暂停")
+        else:
+            control.pause()
+            self.pause_btn.setText("继续")
+            self.progress_label.setText(self.progress_label.text() + "（已暂停）")
+
+    def cancel_transfer(self):
+        if self.transfer_control is not None:
+            self.transfer_control.cancel()
+            self.pause_btn.setEnabled(False)
+            self.cancel_transfer_btn.setEnabled(False)
+            self.progress_label.setText("正在取消...")
+
+    def stage_files(self, drive, files_to_process):
+        """同盘快速重排：在U盘内移动文件重建顺序，数据不经过备份目录"""
+        plan = plan_staging(drive, [(file_info['src'], file_info['final_name'])
+                                    for file_info in files_to_process])
+        stage_names = {"stage": "移入暂存目录", "final": "按顺序移回"}
+
+        def on_progress(stage, done, total):
+            self.progress_label.setText(f"{stage_names.get(stage, stage)} ({done}/{total})")
+            if total:
+                offset = 0 if stage == "stage" else 50
+                self.progress_bar.setValue(offset + int(done / total * 50))
+
+        started = time.perf_counter()
+        try:
+            self.run_task("同盘快速重排",
+                          lambda progress: apply_staging(plan, self.copy_engine, progress, journal_dir=drive),
+                          on_progress)
+        except Exception as e:
+            QMessageBox.warning(self, "重排中断",
+                                f"{e}\n\n已保留操作日志，重新加载U盘时可选择继续完成或回滚。")
+            self.load_files()
+            return
+        elapsed = time.perf_counter() - started
+
+        self.progress_label.setVisible(False)
+        self.progress_bar.setVisible(False)
+        message = f"{plan.summary()}，耗时 {elapsed:.1f} 秒。"
+        self.forget_ordering_session()
+        if self.background_backup_check.isChecked():
+            self.start_background_backup([(os.path.join(drive, file_info['final_name']), file_info['backup_path'])
+                                          for file_info in files_to_process])
+            message += "\n\n正在后台备份到备份目录，进度显示在状态栏中。"
+        self.load_files()
+        QMessageBox.information(self, "完成", message)
 
-    def format_and_copy_files(self, drive, files_to_process):
+    def start_background_backup(self, pairs):
+        """在后台把文件备份到备份目录，不阻塞界面操作"""
+        for directory in {os.path.dirname(dst) for _, dst in pairs}:
+            os.makedirs(directory, exist_ok=True)
+        worker = CopyWorker(self.copy_engine, CopyEngine.make_tasks(pairs), "后台备份", self)
+        worker.progress.connect(self.on_backup_progress)
+        worker.copy_finished.connect(self.on_backup_finished)
+        worker.copy_failed.connect(self.on_backup_failed)
+        worker.finished.connect(worker.deleteLater)
+        self.backup_worker = worker
+        self._set_transfer_busy(True)
+        worker.start()
+
+    def backup_running(self):
+        """后台备份尚未完成时提示用户并返回 True（期间不能再修改U盘上的文件）"""
+        if self.backup_worker is None:
+            return False
+        QMessageBox.information(self, "提示", "后台备份尚未完成，请稍后再操作。")
+        return True
+
+    def on_backup_progress(self, done, total, done_bytes, total_bytes, name):
+        self.statusBar().showMessage(f"后台备份 ({done}/{total}): {name}")
+
+    def on_backup_finished(self, report):
+        self._backup_done()
+        self.statusBar().showMessage(f"后台备份完成：{report.files} 个文件（{report.mb_per_s:.1f} MB/s）", 10000)
+
+    def on_backup_failed(self, message):
+        self._backup_done()
+        self.statusBar().clearMessage()
+        QMessageBox.warning(self, "后台备份失败", f"备份到 {self.backup_dir} 失败：{message}")
+
+    def _backup_done(self):
+        self.backup_worker = None
+        self._set_transfer_busy(False)
+        if self.scan_worker is not None:
+            self._set_scan_busy(True)
+
+    def sync_files(self, drive, files_to_process):
+        """增量同步：只重命名内容已在U盘上的文件，仅复制新增或变化的内容"""
+        self.progress_label.setText("正在比较U盘现有文件...")
+        QApplication.processEvents()
+
+        existing = [(entry.path, entry.size) for entry in self.list_drive_media(drive)]
+        targets = [SyncTarget(file_info['final_name'], file_info['src'], file_info['src'])
+                   for file_info in files_to_process]
+        plan = plan_sync(drive, targets, existing, use_hash=self.sync_hash_check.isChecked())
+
+        reply = QMessageBox.question(self, "确认同步",
+                                     f"同步计划：{plan.summary()}\n\n是否继续？",
+                                     QMessageBox.StandardButton.Yes |
+                                     QMessageBox.StandardButton.No)
+        if reply != QMessageBox.StandardButton.Yes:
+            self.progress_label.setVisible(False)
+            self.progress_bar.setVisible(False)
+            return
+
+        stage_names = {"delete": "删除多余文件", "rename": "重命名", "copy": "复制新内容"}
+
+        def on_progress(stage, done, total):
+            self.progress_label.setText(f"{stage_names.get(stage, stage)} ({done}/{total})")
+            if total:
+                self.progress_bar.setValue(int(done / total * 100))
+
+        report = self.run_task("增量同步",
+                               lambda progress: apply_sync(plan, self.copy_engine, progress, journal_dir=drive),
+                               on_progress)
+
+        self.progress_label.setVisible(False)
+        self.progress_bar.setVisible(False)
+        self.forget_ordering_session()
+        self.load_files()
+        QMessageBox.information(self, "同步完成", f"{plan.summary()}\n"
+                                                 f"复制速度：{report.mb_per_s:.1f} MB/s")
+
+    def write_to_multiple_drives(self):
+        """把当前排好序的列表同时写入多个U盘，每个源文件只读取一次"""
+        if self.backup_running():
+            return
+        if self.file_model.rowCount() == 0:
+            QMessageBox.warning(self, "警告", "没有可写入的文件！")
+            return
+        source_drive = self.usb_combo.currentData()
+        candidates = [drive for letter, drive in self.usb_drives.items() if letter != source_drive]
+        if not candidates:
+            QMessageBox.information(self, "提示", "请插入要写入的其他U盘。")
+            return
+        select_dialog = DriveSelectDialog(candidates, self)
+        if select_dialog.exec() != QDialog.DialogCode.Accepted:
+            return
+        targets = select_dialog.selected()
+        if not targets:
+            return
+
+        skip_duplicates = self.exclude_duplicates_check.isChecked()
+        paths = self.file_model.paths(skip_duplicates)
+        names = target_names(os.path.basename(path) for path in paths)
+        items = list(zip(names, self.file_model.sizes(skip_duplicates)))
+        extensions = self.supported_extensions
+
+        def check(progress):
+            # 每个U盘上原有的音频视频文件写入前会被删除，所占空间计为可用
+            return [plan_capacity(items, probe_volume(target, self.usb_drives[target].get('filesystem', '')),
+                                  [entry.size for entry in iter_media_files(target, extensions)])
+                    for target in targets]
+
+        try:
+            plans = self.run_task("检查空间", check)
+        except Exception as e:
+            QMessageBox.critical(self, "错误", f"无法读取可用空间：{e}")
+            return
+
+        parts = None
+        if all(plan.ok for plan in plans):
+            reply = QMessageBox.question(self, "确认多盘写入",
+                                         f"将删除以下 {len(targets)} 个U盘中原有的音频视频文件，"
+                                         f"然后按当前顺序写入 {len(paths)} 个文件：\n\n" + "\n".join(targets) +
+                                         "\n\n是否继续？",
+                                         QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No)
+        else:
+            # 放不下时按顺序分段：第一个U盘装满最前面的一段，下一个U盘接着装，每个U盘从 001 重新编号
+            problems = "\n".join(problem for plan in plans for problem in plan.problems)
+            split = split_across(items, [(plan.target, plan.available) for plan in plans])
+            if not split.ok:
+                QMessageBox.critical(self, "空间不足",
+                                     f"{problems}\n\n即使按顺序分到所选的 {len(targets)} 个U盘，"
+                                     f"仍有 {split.remaining} 个文件放不下，请再选择或插入更多U盘。\n\n"
+                                     "没有修改任何文件。")
+                return
+            parts = []
+            for target, (start, end) in zip(targets, split.parts):
+                if end > start:
+                    part_paths = paths[start:end]
+                    parts.append((target, list(zip(part_paths, target_names(os.path.basename(path)
+                                                                            for path in part_paths)))))
+            ranges = [f"{target}：第 {start + 1}～{end} 个文件" for target, (start, end) in zip(targets, split.parts)
+                      if end > start]
+            reply = QMessageBox.question(self, "分盘写入",
+                                         f"{problems}\n\n当前列表不能完整写入每个U盘，可以按顺序分到以下 "
+                                         f"{len(parts)} 个U盘中：\n\n" + "\n".join(ranges) +
+                                         "\n\n将删除这些U盘中原有的音频视频文件，是否继续？",
+                                         QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No)
+            targets = [target for target, _ in parts]
+        if reply != QMessageBox.StandardButton.Yes:
+            return
+
+        def clear_drive(target):
+            # 在该U盘的写线程中执行，不影响其他U盘
+            with tracer.span("fanout.clear", target=target):
+                for entry in list(iter_media_files(target, extensions)):
+                    os.remove(entry.path)
+
+        control = TransferControl()
+        progress_dialog = FanoutProgressDialog([self.usb_drives[target] for target in targets], control, self)
+        worker = FanoutWorker(self.copy_engine, list(zip(paths, names)), targets,
+                              prepare=clear_drive, control=control, parts=parts, parent=self)
+        worker.progress.connect(progress_dialog.update_progress)
+        worker.fanout_finished.connect(progress_dialog.finish)
+        worker.fanout_failed.connect(progress_dialog.fail)
+        worker.finished.connect(worker.deleteLater)
+
+        self._set_transfer_busy(True)
+        worker.start()
+        progress_dialog.exec()
+        self._set_transfer_busy(False)
+
+    def reorder_files_in_place(self, drive):
+        """直接改写U盘 FAT/exFAT 目录表中的文件顺序，不复制文件数据"""
+        paths = self.file_model.paths()
+        backup_dir = self.backup_dir if os.path.isdir(self.backup_dir) else None
+
+        def reorder(progress):
+            # 锁定卷期间其他程序不能访问U盘，完成后卸载卷让系统重新读取目录表
+            with self.usb_handler.locked_volume(drive) as raw:
+                return reorder_paths(FatVolume(raw, writable=True), drive, paths, backup_dir)
+
+        self.progress_label.setText("正在调整目录项顺序...")
+        self.progress_label.setVisible(True)
+        QApplication.processEvents()
+        try:
+            missing = self.run_task("调整顺序", reorder)
+        except Exception as e:
+            QMessageBox.critical(self, "错误", f"{e}\n\n请关闭正在使用U盘的程序（如资源管理器窗口）后重试。")
+            return
+        finally:
+            self.progress_label.setVisible(False)
+
+        self.forget_ordering_session()
+        message = f"已按列表顺序调整U盘 {drive} 中 {len(paths) - len(missing)} 个文件的目录项顺序。"
+        if missing:
+            message += f"\n\n{len(missing)} 个文件在U盘上找不到，已保持原位置。"
+        if backup_dir:
+            message += f"\n\n原目录表已备份到：{backup_dir}"
+        QMessageBox.information(self, "完成", message)
+
+    def format_and_copy_files(self, drive, files_to_process, job):
         """格式化U盘并复制文件"""
+        # 先确认能生成 FAT32（簇大小、卷大小、文件大小），不能时不提供这个选项
+        builder = self.plan_fat_image(drive, files_to_process)
+        if isinstance(builder, str):
+            QMessageBox.information(self, "写入方式", f"无法直接生成 FAT32 文件系统：{builder}\n\n"
+                                                   "将使用系统格式化后逐个复制文件。")
+            reply = QMessageBox.StandardButton.No
+        else:
+            reply = QMessageBox.question(self, "写入方式",
+                                         "是否直接生成新的 FAT32 文件系统并整块顺序写入U盘？\n\n"
+                                         "• 是(Yes)：文件按列表顺序连续存放，大块顺序写入并回读校验，速度最快"
+                                         f"（簇大小 {builder.cluster_size // 1024}KB）\n"
+                                         "• 否(No)：使用系统格式化后逐个复制文件",
+                                         QMessageBox.StandardButton.Yes |
+                                         QMessageBox.StandardButton.No)
+        if reply == QMessageBox.StandardButton.Yes:
+            self.write_fat_image(drive, builder)
+            job.finish()
+            return
         try:
             self.progress_label.setText(f"准备格式化U盘: {drive}...")
             QApplication.processEvents()
@@ -581,55 +1397,111 @@ class MainWindow(QMainWindow):
                                    "3. 选择文件系统（推荐FAT32或exFAT）\n"
                                    "4. 点击'开始'进行格式化\n\n"
                                    "格式化完成后，点击'确定'继续复制文件。")
+            job.complete_stage("clear")
             
-            self.copy_files_to_usb(drive, files_to_process, 50)
+            self.copy_files_to_usb(drive, files_to_process, 50, job)
             
         except Exception as e:
             raise Exception(f"格式化操作失败：{str(e)}")
 
-    def delete_and_copy_files(self, drive, files_to_process):
+    def plan_fat_image(self, drive, files_to_process):
+        """为备份目录中的文件生成 FAT32 布局（不写入），不能生成时返回原因"""
+        label = self.usb_drives.get(drive, {}).get('name', '')
+        if label == '可移动磁盘':
+            label = ''
+        try:
+            total_size = self.usb_handler.volume_length(drive)
+            cluster_size = fat32_cluster_size(self.usb_handler.get_drive_info(drive).get("cluster_size"),
+                                              total_size)
+            files = image_files([(file_info['backup_path'], file_info['final_name'])
+                                 for file_info in files_to_process])
+            return FatImageBuilder(files, total_size, cluster_size, label or "NO NAME")
+        except Exception as e:
+            return str(e)
+
+    def write_fat_image(self, drive, builder):
+        """把 plan_fat_image 生成的 FAT32 文件系统整块顺序写入U盘（会清空U盘）"""
+        files = builder.files
+        stage_names = {"write": "写入U盘", "verify": "校验"}
+
+        def on_progress(stage, done_mb, total_mb):
+            self.progress_label.setText(f"{stage_names.get(stage, stage)} ({done_mb}/{total_mb} MB)")
+            if total_mb:
+                self.progress_bar.setValue(50 + int(done_mb / total_mb * 50))
+
+        def write(progress):
+            with self.usb_handler.locked_volume(drive) as raw:
+                # 隐藏扇区数为分区起始位置：优先取分区表，读不到时从原引导扇区中读取（FAT 与 exFAT 位置不同）
+                try:
+                    builder.hidden_sectors = self.usb_handler.partition_offset(drive) // SECTOR_SIZE
+                except Exception:
+                    builder.hidden_sectors = boot_hidden_sectors(raw.read(SECTOR_SIZE))
+                # 信号参数为 32 位整数，按 MB 报告进度
+                builder.write(raw, progress=lambda stage, done, total: progress(
+                    stage, done // (1024 * 1024), total // (1024 * 1024)))
+            return builder
+
+        self.progress_label.setText("正在生成 FAT32 文件系统...")
+        QApplication.processEvents()
+        started = time.perf_counter()
+        builder = self.run_task("写入U盘", write, on_progress)
+        elapsed = max(time.perf_counter() - started, 1e-6)
+        self.forget_ordering_session()
+
+        self.progress_label.setVisible(False)
+        self.progress_bar.setVisible(False)
+        QMessageBox.information(self, "成功", f"操作完成！\n\n已将 {len(files)} 个文件按排序写入U盘 {drive}\n"
+                                             f"写入速度：{builder.image_size / (1024 * 1024) / elapsed:.1f} MB/s"
+                                             "（含校验）")
+        self.load_files()
+
+    def delete_and_copy_files(self, drive, files_to_process, job):
         """删除U盘文件并复制新文件"""
         try:
             self.progress_label.setText(f"正在删除U盘 {drive} 中的音频文件...")
             QApplication.processEvents()
             
             deleted_count = 0
-            # 遍历U盘删除音频文件
-            for root, dirs, files in os.walk(drive):
-                for file in files:
-                    if file.lower().endswith(self.supported_extensions):
-                        file_path = os.path.join(root, file)
-                        try:
-                            os.remove(file_path)
-                            deleted_count += 1
-                        except Exception as e:
-                            print(f"删除文件失败 {file_path}: {e}")
+            failed_count = 0
+            # 删除U盘中的音频文件
+            with tracer.span("delete"):
+                for entry in self.list_drive_media(drive):
+                    file_path = entry.path
+                    started = time.perf_counter()
+                    try:
+                        os.remove(file_path)
+                        deleted_count += 1
+                    except Exception as e:
+                        failed_count += 1
+                        tracer.event("delete.failed", path=file_path, error=str(e))
+                    tracer.file_op("delete.file", file_path, started, time.perf_counter() - started)
             
-            self.progress_label.setText(f"已删除 {deleted_count} 个音频文件")
+            message = f"已删除 {deleted_count} 个音频文件"
+            if failed_count:
+                message += f"，{failed_count} 个删除失败（详见性能统计）"
+            self.progress_label.setText(message)
             self.progress_bar.setValue(25)
             QApplication.processEvents()
+            job.complete_stage("clear")
             
-            self.copy_files_to_usb(drive, files_to_process, 25)
+            self.copy_files_to_usb(drive, files_to_process, 25, job)
             
         except Exception as e:
             raise Exception(f"删除文件操作失败：{str(e)}")
 
-    def copy_files_to_usb(self, drive, files_to_process, start_progress):
-        """从备份目录复制文件到U盘"""
+    def copy_files_to_usb(self, drive, files_to_process, start_progress, job):
+        """从备份目录复制文件到U盘（续传时跳过已校验的文件）"""
         total_files = len(files_to_process)
         
         self.progress_label.setText("开始从备份目录复制文件到U盘...")
         QApplication.processEvents()
         
-        for i, file_info in enumerate(files_to_process, 1):
-            final_dst_on_usb = os.path.join(drive, file_info['final_name'])
-            self.progress_label.setText(f"复制到U盘 ({i}/{total_files}): {file_info['final_name']}")
-            QApplication.processEvents()
-            
-            # 从备份目录复制到U盘
-            shutil.copy2(file_info['backup_path'], final_dst_on_usb)
-            progress = start_progress + int(i / total_files * (100 - start_progress))
-            self.progress_bar.setValue(progress)
+        # 从备份目录复制到U盘，U盘上只有一个顺序写线程，保证目录项顺序与列表一致
+        copy_tasks = job.pending_tasks("copy", drive)
+        report = self.run_copy_stage("复制到U盘", copy_tasks, start_progress, 100,
+                                     job.bind(self.transfer_control, "copy"))
+        job.finish()
+        self.forget_ordering_session()
         
         self.progress_label.setText("文件复制完成！")
         self.progress_bar.setValue(100)
@@ -637,4 +1509,89 @@ class MainWindow(QMainWindow):
         
         self.progress_label.setVisible(False)
         self.progress_bar.setVisible(False)
-        QMessageBox.information(self, "成功", f"操作完成！\n\n已将 {total_files} 个文件按排序复制到U盘 {drive}")
\ No newline at end of file
+        message = (f"操作完成！\n\n已将 {total_files} 个文件按排序复制到U盘 {drive}\n"
+                   f"写入速度：{report.mb_per_s:.1f} MB/s")
+        if report.verified:
+            message += f"\n已回读校验 {report.verified} 个文件"
+            if report.mismatches:
+                message += f"，其中 {report.mismatches} 次不一致已重新复制"
+        QMessageBox.information(self, "成功", message)
+
+    def run_copy_stage(self, stage, tasks, start_progress, end_progress, control=None):
+        """在后台线程中执行一个复制阶段，期间保持界面响应，返回 StageReport
+
+        给出 control（TransferControl）时显示暂停和取消按钮。
+        复制失败或被取消时抛出异常，由调用方统一提示。
+        """
+        worker = CopyWorker(self.copy_engine, tasks, stage, self, control)
+        loop = QEventLoop()
+        result = {}
+
+        def on_progress(done, total, done_bytes, total_bytes, name):
+            elapsed = max(time.perf_counter() - started, 1e-6)
+            speed = done_bytes / (1024 * 1024) / elapsed
+            self.progress_label.setText(f"{stage} ({done}/{total}): {name}  {speed:.1f} MB/s")
+            if total_bytes:
+                fraction = done_bytes / total_bytes
+            else:
+                fraction = done / total if total else 1.0
+            self.progress_bar.setValue(start_progress + int(fraction * (end_progress - start_progress)))
+
+        worker.progress.connect(on_progress)
+        worker.copy_finished.connect(lambda report: result.setdefault('report', report))
+        worker.copy_failed.connect(lambda message: result.setdefault('error', message))
+        worker.finished.connect(loop.quit)
+        worker.finished.connect(worker.deleteLater)
+
+        self._set_transfer_busy(True)
+        self._show_transfer_controls(control is not None)
+        started = time.perf_counter()
+        worker.start()
+        loop.exec()
+        self._show_transfer_controls(False)
+        self._set_transfer_busy(False)
+
+        if 'error' in result:
+            raise Exception(f"{stage}失败：{result['error']}")
+        return result['report']
+
+    def run_task(self, name, func, on_progress=None):
+        """在后台线程中执行 func(progress)，期间保持界面响应，返回 func 的结果"""
+        worker = TaskWorker(func, self)
+        loop = QEventLoop()
+        result = {}
+        if on_progress is not None:
+            worker.progress.connect(on_progress)
+        worker.task_finished.connect(lambda value: result.setdefault('value', value))
+        worker.task_failed.connect(lambda message: result.setdefault('error', message))
+        worker.finished.connect(loop.quit)
+        worker.finished.connect(worker.deleteLater)
+
+        self._set_transfer_busy(True)
+        worker.start()
+        loop.exec()
+        self._set_transfer_busy(False)
+
+        if 'error' in result:
+            raise Exception(f"{name}失败：{result['error']}")
+        return result.get('value')
+
+    def _show_transfer_controls(self, visible):
+        self.pause_btn.setText("暂停")
+        for button in (self.pause_btn, self.cancel_transfer_btn):
+            button.setEnabled(True)
+            button.setVisible(visible)
+
+    def _set_transfer_busy(self, busy):
+        """复制过程中禁用会修改列表或U盘的操作
+
+        后台备份还在读取U盘时同样保持禁用，备份结束后（_backup_done）才恢复。
+        """
+        busy = busy or self.backup_worker is not None
+        history = self.file_model.history
+        self.undo_btn.setEnabled(not busy and history.can_undo())
+        self.redo_btn.setEnabled(not busy and history.can_redo())
+        for widget in (self.usb_combo, self.refresh_btn, self.load_btn, self.sort_by_prefix_btn,
+                       self.sort_by_field_btn, self.sort_by_tag_btn, self.rename_by_line_btn, self.save_btn, self.fanout_btn,
+                       self.choose_backup_dir_btn, self.verify_copy_check):
+            widget.setEnabled(not busy)
\ No newline at end of file
@@ -0,0 +1,85 @@
+import time
+
+from PyQt6.QtCore import QTimer
+from PyQt6.QtWidgets import (QFileDialog, QGroupBox, QHBoxLayout, QMessageBox,
+                             QPushButton, QTextEdit, QVBoxLayout)
+
+from src.core.instrumentation import tracer
+
+HEARTBEAT_MS = 100       # 界面心跳间隔
+STALL_THRESHOLD = 0.2    # 心跳延迟超过多少秒记为界面卡顿
+
+
+class StatsPanel(QGroupBox):
+    """显示各阶段耗时、计数器和慢操作，可导出为 JSON / Chrome Trace
+
+    同时用一个心跳定时器检测界面事件循环的卡顿，卡顿记录为 ui.stall。
+    """
+
+    def __init__(self, parent=None):
+        super().__init__("性能统计", parent)
+        layout = QVBoxLayout(self)
+
+        self.text = QTextEdit()
+        self.text.setReadOnly(True)
+        self.text.setMaximumHeight(200)
+        layout.addWidget(self.text)
+
+        button_layout = QHBoxLayout()
+        self.export_trace_btn = QPushButton("导出 Trace")
+        self.export_json_btn = QPushButton("导出 JSON")
+        self.clear_btn = QPushButton("清空")
+        button_layout.addWidget(self.export_trace_btn)
+        button_layout.addWidget(self.export_json_btn)
+        button_layout.addWidget(self.clear_btn)
+        layout.addLayout(button_layout)
+
+        self.export_trace_btn.clicked.connect(self.export_trace)
+        self.export_json_btn.clicked.connect(self.export_json)
+        self.clear_btn.clicked.connect(self.clear)
+
+        self._refresh_timer = QTimer(self)
+        self._refresh_timer.timeout.connect(self.refresh)
+        self._refresh_timer.start(1000)
+
+        self._last_beat = time.perf_counter()
+        self._heartbeat = QTimer(self)
+        self._heartbeat.timeout.connect(self._on_heartbeat)
+        self._heartbeat.start(HEARTBEAT_MS)
+        self.refresh()
+
+    def _on_heartbeat(self):
+        now = time.perf_counter()
+        lag = now - self._last_beat - HEARTBEAT_MS / 1000
+        self._last_beat = now
+        if lag >= STALL_THRESHOLD:
+            tracer.record("ui.stall", now - lag, lag, category="ui")
+            tracer.count("ui.stall_seconds", lag)
+
+    def refresh(self):
+        text = tracer.format_summary()
+        if text != self.text.toPlainText():
+            self.text.setPlainText(text)
+
+    def clear(self):
+        tracer.reset()
+        self.refresh()
+
+    def export_trace(self):
+        path, _ = QFileDialog.getSaveFileName(self, "导出 Trace", "udisk_trace.json",
+                                              "Chrome Trace (*.json)")
+        if path:
+            self._export(tracer.export_chrome_trace, path)
+
+    def export_json(self):
+        path, _ = QFileDialog.getSaveFileName(self, "导出统计", "udisk_stats.json", "JSON (*.json)")
+        if path:
+            self._export(tracer.export_json, path)
+
+    def _export(self, export, path):
+        try:
+            export(path)
+        except OSError as e:
+            QMessageBox.critical(self, "错误", f"导出失败：{e}")
+            return
+        QMessageBox.information(self, "导出完成", f"已导出到：{path}")
@@ -0,0 +1,176 @@
+import time
+
+from PyQt6.QtCore import QThread, pyqtSignal
+
+from src.core.duplicates import find_duplicates
+from src.core.instrumentation import tracer
+from src.core.scanner import MEDIA_EXTENSIONS, iter_media_batches
+from src.core.search_index import prepare_batch
+
+
+class ScanWorker(QThread):
+    """后台扫描U盘文件，分批把结果推送给界面
+
+    每批结果同时在本线程中建好文件名搜索索引（SearchBatch），界面线程只需合并。
+    known_names 为上一次列表已建好索引的文件名（按文件编号）：这批文件名与之相同时不再重建，
+    发出的 SearchBatch 为 None，由界面线程沿用原来的索引。
+    """
+
+    batch_ready = pyqtSignal(list, object)   # List[ScanEntry], SearchBatch 或 None
+    progress = pyqtSignal(int, float)        # 已扫描文件数, 文件/秒
+    scan_finished = pyqtSignal(int, float)   # 文件总数, 耗时(秒)
+    scan_failed = pyqtSignal(str)
+
+    def __init__(self, drive_path, extensions=MEDIA_EXTENSIONS, known_names=None, parent=None):
+        super().__init__(parent)
+        self.drive_path = drive_path
+        self.extensions = extensions
+        self.known_names = known_names
+
+    def run(self):
+        start = time.perf_counter()
+        count = 0
+        known = self.known_names
+        try:
+            for batch in iter_media_batches(self.drive_path, self.extensions,
+                                            cancelled=self.isInterruptionRequested):
+                if self.isInterruptionRequested():
+                    return
+                names = [entry.name for entry in batch]
+                if known and known[count:count + len(names)] == names:
+                    search_batch = None
+                else:
+                    known = None  # 从第一个不同的文件名开始重建
+                    search_batch = prepare_batch(names, count)
+                count += len(batch)
+                self.batch_ready.emit(batch, search_batch)
+                elapsed = time.perf_counter() - start
+                self.progress.emit(count, count / elapsed if elapsed > 0 else 0.0)
+        except Exception as e:
+            tracer.event("scan.failed", root=self.drive_path, error=str(e))
+            self.scan_failed.emit(str(e))
+            return
+        elapsed = time.perf_counter() - start
+        tracer.record("scan", start, elapsed, args={"root": self.drive_path, "files": count})
+        if not self.isInterruptionRequested():
+            self.scan_finished.emit(count, elapsed)
+
+
+class CopyWorker(QThread):
+    """在后台线程中运行复制引擎"""
+
+    progress = pyqtSignal(int, int, object, object, str)  # 已完成文件数, 总数, 已复制字节, 总字节, 当前文件
+    copy_finished = pyqtSignal(object)                     # StageReport
+    copy_failed = pyqtSignal(str)
+
+    def __init__(self, engine, tasks, stage, parent=None, control=None):
+        super().__init__(parent)
+        self.engine = engine
+        self.tasks = tasks
+        self.stage = stage
+        self.control = control  # TransferControl，用于暂停和取消
+
+    def run(self):
+        try:
+            report = self.engine.copy(self.tasks, self.stage, progress=self.progress.emit,
+                                      control=self.control)
+        except Exception as e:
+            self.copy_failed.emit(str(e))
+            return
+        self.copy_finished.emit(report)
+
+
+class TaskWorker(QThread):
+    """在后台线程中执行任意耗时函数 func(progress)"""
+
+    progress = pyqtSignal(str, int, int)  # 阶段, 已完成, 总数
+    task_finished = pyqtSignal(object)
+    task_failed = pyqtSignal(str)
+
+    def __init__(self, func, parent=None):
+        super().__init__(parent)
+        self.func = func
+
+    def run(self):
+        try:
+            result = self.func(self.progress.emit)
+        except Exception as e:
+            self.task_failed.emit(str(e))
+            return
+        self.task_finished.emit(result)
+
+
+class DriveWatchWorker(QThread):
+    """在后台等待后端报告的设备变化（Linux 的挂载表变化、测试后端的手动插拔）"""
+
+    drives_changed = pyqtSignal()
+
+    POLL_TIMEOUT = 0.5  # 每次等待的秒数，决定退出时的响应速度
+
+    def __init__(self, discovery, parent=None):
+        super().__init__(parent)
+        self.discovery = discovery
+
+    def run(self):
+        while not self.isInterruptionRequested():
+            try:
+                changed = self.discovery.wait_for_change(self.POLL_TIMEOUT)
+            except OSError as e:
+                tracer.event("discovery.watch_failed", error=str(e))
+                return
+            if changed:
+                self.drives_changed.emit()
+
+
+class DuplicateWorker(QThread):
+    """在后台查找内容相同的文件"""
+
+    progress = pyqtSignal(int, object)     # 已读取文件数, 已读取字节数
+    search_finished = pyqtSignal(object)   # DuplicateReport
+    search_failed = pyqtSignal(str)
+
+    def __init__(self, entries, max_files=None, max_bytes=None, parent=None):
+        super().__init__(parent)
+        self.entries = entries
+        self.max_files = max_files
+        self.max_bytes = max_bytes
+
+    def run(self):
+        try:
+            report = find_duplicates(self.entries, self.max_files, self.max_bytes,
+                                     progress=self.progress.emit, cancelled=self.isInterruptionRequested)
+        except Exception as e:
+            self.search_failed.emit(str(e))
+            return
+        if not self.isInterruptionRequested():
+            self.search_finished.emit(report)
+
+
+class FanoutWorker(QThread):
+    """在后台把同一组文件同时写入多个U盘；提供 parts 时改为把各自的一段依次写入各个U盘"""
+
+    progress = pyqtSignal(str, int, int, object, object)  # 目标, 已完成文件数, 总数, 已写入字节, 总字节
+    fanout_finished = pyqtSignal(object)                   # FanoutReport
+    fanout_failed = pyqtSignal(str)
+
+    def __init__(self, engine, sources, targets, prepare=None, control=None, parts=None, parent=None):
+        super().__init__(parent)
+        self.engine = engine
+        self.sources = sources
+        self.targets = targets
+        self.prepare = prepare
+        self.control = control
+        self.parts = parts  # [(目标, [(源路径, 目标文件名)])]
+
+    def run(self):
+        try:
+            if self.parts is not None:
+                report = self.engine.distribute(self.parts, "分盘写入", progress=self.progress.emit,
+                                                prepare=self.prepare, control=self.control)
+            else:
+                report = self.engine.fanout(self.sources, self.targets, "多盘写入", progress=self.progress.emit,
+                                            prepare=self.prepare, control=self.control)
+        except Exception as e:
+            self.fanout_failed.emit(str(e))
+            return
+        self.fanout_finished.emit(report)